@@ -5,6 +5,19 @@ PRODUCTION_SERVER = 'pi@piradio'
 PRODUCTION_DIR = '/home/pi/piradio'
 LOGFILES = ['/var/log/piradio.log']
 
+# The pixel sizes that the panels use each font at. These sizes are
+# compiled into bitmap fonts, so that the radio doesn't need FreeType.
+FONT_SIZES = {
+    'assets/pf_tempesta_seven.ttf': [8, 16, 32],
+    'assets/pixarrows.ttf': [10],
+    'assets/climacons.ttf': [32],
+}
+
+def compile_fonts_commands():
+    return ['python -m piradio.fonts %s %s' %
+            (filename, ' '.join(str(size) for size in sizes))
+            for filename, sizes in sorted(FONT_SIZES.items())]
+
 def production():
    """ Use production server settings """
    env.hosts = [PRODUCTION_SERVER]
@@ -14,6 +27,18 @@ def deploy():
     with cd(env['dir']):
         run('git pull')
         run("find . -name '*.pyc' | xargs --no-run-if-empty rm")
+        run('python -m piradio.assets')
+        for command in compile_fonts_commands():
+            run(command)
+
+def assets():
+    """Compile the images in assets/ into .1bpp files for fast loading"""
+    local('python -m piradio.assets')
+
+def fonts():
+    """Compile the fonts in assets/ into .bfnt bitmap fonts"""
+    for command in compile_fonts_commands():
+        local(command)
 
 def revert():
     """Revert git via reset --hard @{1}"""
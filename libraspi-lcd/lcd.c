@@ -434,6 +434,23 @@ void LCD_WriteFramebuffer(void)
 	lcd_set_xy(0,7);	for(x=0;x<LCD_WIDTH;x++)  lcd_write_data(framebuffer[x][7]);
 }
 
+//--------------------------------------------------------------------------------------------------
+// Name:      LCD_WriteFramebufferArea
+// Function:  Transfer part of the Framebuffer (RAM) to display via SPI
+//            
+// Parameter: first and last column, first and last page (8 rows per page)
+// Return:    -
+//--------------------------------------------------------------------------------------------------
+void LCD_WriteFramebufferArea(uint8 x0,uint8 x1,uint8 page0,uint8 page1)
+{
+	uint8	 x,page;
+	for(page=page0;page<=page1;page++)
+	{
+		lcd_set_xy(x0,page);
+		for(x=x0;x<=x1;x++)  lcd_write_data(framebuffer[x][page]);
+	}
+}
+
 //--------------------------------------------------------------------------------------------------
 // Name:      LCD_SetContrast
 // Function:  Kontrasteinstellung
@@ -76,5 +76,6 @@ void LCD_DrawBitmap(uint8 x0,uint8 y0,const uint8 *bmp);
 
 void LCD_Init(void);
 void LCD_WriteFramebuffer(void);
+void LCD_WriteFramebufferArea(uint8 x0,uint8 x1,uint8 page0,uint8 page1);
 
 #endif
@@ -4,6 +4,7 @@ import piradio.ui as ui
 import piradio.lcd as lcd
 import piradio.services as services
 import piradio.config as config
+import piradio.dither as dither
 from piradio.config import CONFIG
 from piradio.panels import *
 
@@ -12,6 +13,7 @@ import os
 import time
 
 UPDATE_RATE = float(config.get('update_rate_hz'))
+SURFACE_CLASS = graphics.surface_class(config.get('surface_format', 'auto'))
 
 
 class SleepTimer(object):
@@ -55,8 +57,9 @@ class RadioApp(object):
                        os.path.join(cwd, 'assets/pf_tempesta_seven.ttf'))
         fonts.register('pixarrows', os.path.join(cwd, 'assets/pixarrows.ttf'))
         fonts.register('climacons', os.path.join(cwd, 'assets/climacons.ttf'))
-        fonts.register('helvetica', os.path.join(cwd, 'assets/helvetica.ttf'))
 
+        dither.CACHE_DIR = config.get('dither_cache_dir')
+        fonts.ATLAS_DIR = config.get('font_atlas_dir')
         self.sleeptimer = SleepTimer(CONFIG['sleep_after_minutes'] * 60)
         self.framebuffer = None
         self.prev_keystates = None
@@ -86,59 +89,89 @@ class RadioApp(object):
             return self.active_panel.needs_repaint
         return False
 
-    def addpanel(self, panel_class, config):
+    def show_progress(self, text, progress):
         self.framebuffer.fill(0)
         ui.render_progressbar(self.framebuffer,
                               2, self.framebuffer.height / 2 - 8,
                               self.framebuffer.width - 2 * 2, 16,
-                              len(self.panels) / float(len(self.panel_defs)))
-        self.framebuffer.center_text(self.font, panel_class.__name__,
-                                     rop=graphics.rop_xor)
+                              progress)
+        self.framebuffer.center_text(self.font, text, rop=graphics.rop_xor)
         self.lcd_update()
         lcd.readkeys()
+
+    def addpanel(self, panel_class, config):
+        self.show_progress(panel_class.__name__,
+                           len(self.panels) / float(len(self.panel_defs)))
         logging.info('Initializing %s', panel_class.__name__)
         try:
             instance = self.broker.instantiate(panel_class, config)
             self.panels.append(instance)
-            self.backing_stores[instance] = graphics.Surface(lcd.LCD_WIDTH,
-                                                             lcd.LCD_HEIGHT)
+            self.backing_stores[instance] = SURFACE_CLASS(lcd.LCD_WIDTH,
+                                                          lcd.LCD_HEIGHT)
         except Exception as e:
             logging.error('Failed to initialize panel %s',
                           panel_class.__name__)
             logging.exception(e)
 
-    def run(self):
+    def run(self, iterations=None):
+        """Start the radio and run its main loop, forever or for the given
+        number of `iterations`.
+        """
         try:
-            self.sleeptimer.resetsleep()
-            lcd.init()
-            self.framebuffer = graphics.Surface(lcd.LCD_WIDTH, lcd.LCD_HEIGHT)
-            lcd.set_backlight_enabled(True)
-
-            self.broker.register_service(services.clock.ClockService)
-            self.broker.register_service(services.weather.WeatherService)
-            self.broker.register_service(services.podcast.PodcastService)
-            self.broker.register_service(services.audio.AudioService)
-            self.broker.register_service(services.public_transport.PublicTransportService)
-
-            for p, args in self.panel_defs:
-                self.addpanel(p, args)
-            self.activate_panel(0)
-
-            self.broker.start_bound_services()
-
-            while True:
-                services.deliver_pending_notifications()
-                self.sleeptimer.update_sleep()
-                self.trigger_key_events()
-                self.active_panel.update()
-                if self.activate_panel:
-                    if self.active_panel.paint_if_needed(self.active_panel_fb):
-                        # logging.debug('Updating LCD (active_panel)')
-                        lcd.update(self.active_panel_fb)
-                time.sleep(1.0 / UPDATE_RATE)
+            self.start()
+            self.mainloop(iterations)
         finally:
             self.broker.stop_running()
 
+    def start(self):
+        self.sleeptimer.resetsleep()
+        lcd.init(drivers=config.get('lcd_drivers'))
+        self.framebuffer = SURFACE_CLASS(lcd.LCD_WIDTH, lcd.LCD_HEIGHT)
+        lcd.set_backlight_enabled(True)
+
+        self.broker.register_service(services.clock.ClockService)
+        self.broker.register_service(services.weather.WeatherService)
+        self.broker.register_service(services.podcast.PodcastService)
+        self.broker.register_service(services.audio.AudioService)
+        self.broker.register_service(services.public_transport.PublicTransportService)
+
+        for p, args in self.panel_defs:
+            self.addpanel(p, args)
+        self.preload_fonts()
+        self.activate_panel(0)
+
+        self.broker.start_bound_services()
+
+    def mainloop(self, iterations=None, rate=None):
+        """Run `iterations` iterations of the main loop, or run forever
+        if it is None. The loop runs `rate` times per second, or at
+        UPDATE_RATE if it is None. A `rate` of float('inf') runs it as
+        fast as possible without sleeping.
+        """
+        iteration = 0
+        while iterations is None or iteration < iterations:
+            iteration += 1
+            services.deliver_pending_notifications()
+            self.sleeptimer.update_sleep()
+            self.trigger_key_events()
+            self.active_panel.update()
+            if self.activate_panel:
+                if self.active_panel.paint_if_needed(self.active_panel_fb):
+                    # logging.debug('Updating LCD (active_panel)')
+                    lcd.update(self.active_panel_fb)
+            delay = 1.0 / (UPDATE_RATE if rate is None else rate)
+            if delay:
+                time.sleep(delay)
+
+    def preload_fonts(self):
+        """Load the glyphs of all fonts that the panels use, so that they
+        don't have to be loaded when the panels are first painted.
+        """
+        loaded = fonts.loaded()
+        for i, font in enumerate(loaded):
+            self.show_progress('Loading fonts', i / float(len(loaded)))
+            font.preload()
+
     def lcd_update(self):
         # logging.debug('Updating LCD (framebuffer)')
         lcd.update(self.framebuffer)
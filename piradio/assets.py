@@ -0,0 +1,163 @@
+"""Compiled image assets.
+
+Decoding PNG images is slow on the Raspberry Pi. compile_assets()
+converts them ahead of time into files that hold the pixels in the page
+layout of graphics.PackedSurface, so that load() can map them into
+memory without decoding anything:
+
+    $ python -m piradio.assets [directory...]
+
+Every image `name.png` is compiled into `name.1bpp`, in which each
+non-zero pixel is set, and `name.dithered.1bpp`, which holds the
+dithered image.
+
+A compiled file contains the packed pages followed by a small header
+with the image size. Keeping the header at the end lets the pages start
+at offset 0, which is where mmap needs them.
+"""
+import os
+import sys
+import mmap
+import struct
+import logging
+import tempfile
+import piradio.graphics as graphics
+
+MAGIC = b'P1BP'
+VERSION = 1
+EXTENSION = '.1bpp'
+DITHERED_EXTENSION = '.dithered.1bpp'
+
+_HEADER = struct.Struct('<HH4sB')
+
+
+class MappedSurface(graphics.PackedSurface):
+    """A PackedSurface whose pages are a memory-mapped compiled asset.
+
+    The mapping is copy-on-write, so drawing into the surface never
+    changes the file.
+    """
+    def __init__(self, width, height, pages):
+        self._width = width
+        self._height = height
+        self.damage = None
+        self.pages = pages
+
+    # Indexing an mmap returns single characters instead of integers.
+    def getpixel(self, x, y):
+        return (ord(self.pages[(y >> 3) * self._width + x]) >> (y & 7)) & 1
+
+    def setpixel(self, x, y, color=1):
+        self._touch(x, y, 1, 1)
+        i = (y >> 3) * self._width + x
+        if color:
+            value = ord(self.pages[i]) | 1 << (y & 7)
+        else:
+            value = ord(self.pages[i]) & ~(1 << (y & 7)) & 0xff
+        self.pages[i] = chr(value)
+
+    def copy(self):
+        return graphics.PackedSurface(width=self.width,
+                                      height=self.height,
+                                      pages=self.pages[:])
+
+
+def compiled_filename(filename, dither=False):
+    """Return the name of the compiled version of the image `filename`."""
+    base, _ = os.path.splitext(filename)
+    return base + (DITHERED_EXTENSION if dither else EXTENSION)
+
+
+def compile_image(filename, dither=False):
+    """Compile the PNG image `filename` and return the name of the
+    compiled file.
+    """
+    surface = graphics.PackedSurface(filename=filename, dither=dither)
+    target = compiled_filename(filename, dither)
+    # Write to a temporary file first, so that the radio never maps a
+    # half-written file.
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(target) or '.',
+                                     delete=False) as f:
+        f.write(surface.pages)
+        f.write(_HEADER.pack(surface.width, surface.height, MAGIC, VERSION))
+    os.rename(f.name, target)
+    return target
+
+
+def up_to_date(filename, compiled):
+    """Return True if the file `compiled` exists and is at least as new
+    as the source file `filename`.
+    """
+    try:
+        compiled_mtime = os.path.getmtime(compiled)
+    except OSError:
+        return False
+    try:
+        return compiled_mtime >= os.path.getmtime(filename)
+    except OSError:
+        # Only the compiled file is there.
+        return True
+
+
+def compile_assets(directory='assets'):
+    """Compile all PNG images below `directory` whose compiled files are
+    missing or older than the image. Return the names of the compiled
+    files.
+    """
+    compiled = []
+    for root, _, filenames in os.walk(directory):
+        for name in sorted(filenames):
+            if not name.lower().endswith('.png'):
+                continue
+            filename = os.path.join(root, name)
+            for dither in (False, True):
+                if up_to_date(filename, compiled_filename(filename, dither)):
+                    continue
+                logging.info('Compiling %s%s', filename,
+                             ' (dithered)' if dither else '')
+                compiled.append(compile_image(filename, dither))
+    return compiled
+
+
+def load(filename):
+    """Map the compiled image `filename` into memory and return it as
+    a MappedSurface.
+    """
+    with open(filename, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size < _HEADER.size:
+            raise ValueError('%s is not a compiled image' % filename)
+        f.seek(-_HEADER.size, os.SEEK_END)
+        width, height, magic, version = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('%s is not a compiled image' % filename)
+        length = width * ((height + 7) // 8)
+        if length + _HEADER.size != size:
+            raise ValueError('%s is truncated' % filename)
+        pages = mmap.mmap(f.fileno(), length, access=mmap.ACCESS_COPY)
+    return MappedSurface(width, height, pages)
+
+
+def load_image(filename, dither=False):
+    """Return the PNG image `filename` as a Surface.
+
+    The image is mapped from its compiled version if that is up to date.
+    Otherwise it is decoded from the PNG file.
+    """
+    compiled = compiled_filename(filename, dither)
+    if up_to_date(filename, compiled):
+        try:
+            return load(compiled)
+        except (IOError, ValueError) as e:
+            logging.warning('Could not load %s: %s', compiled, e)
+    return graphics.Surface(filename=filename, dither=dither)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    for directory in sys.argv[1:] or ['assets']:
+        compile_assets(directory)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+"""Micro benchmarks for the drawing code.
+
+Run them from the project root with:
+
+    $ python -m piradio.benchmarks
+"""
+import os
+import time
+import shutil
+import timeit
+import tempfile
+import piradio.assets as assets
+import piradio.config as config
+import piradio.dither as dither
+import piradio.fonts as fonts
+import piradio.graphics as graphics
+import piradio.ui as ui
+
+
+def bitblt_pixelwise(dst, src, x, y, op):
+    """The original Surface.bitblt() that calls `op` once per pixel.
+    Used as the baseline for the raster operation benchmarks.
+    """
+    cliprect = dst.rect.clipped(graphics.Rect(x, y, src.width, src.height))
+    srcpixel = (cliprect.y - y) * src.width + cliprect.x - x
+    dstpixel = cliprect.y * dst.width + cliprect.x
+    dstpixels = dst.pixels
+    srcpixels = src.pixels
+    for _ in xrange(cliprect.height):
+        for _ in xrange(cliprect.width):
+            dstpixels[dstpixel] = op(dstpixels[dstpixel],
+                                     srcpixels[srcpixel])
+            srcpixel += 1
+            dstpixel += 1
+        srcpixel += src.width - cliprect.width
+        dstpixel += dst.width - cliprect.width
+
+
+def surface_classes():
+    classes = [graphics.Surface, graphics.PackedSurface]
+    try:
+        import piradio.npgraphics as npgraphics
+        classes.append(npgraphics.NumpySurface)
+    except ImportError:
+        pass
+    return classes
+
+
+def report(name, func, number):
+    seconds = min(timeit.repeat(func, number=number, repeat=3)) / number
+    print('%-44s %9.3f ms' % (name, seconds * 1000))
+    return seconds
+
+
+def benchmark_rops(number=20):
+    """Compare full-screen blits for every raster operation against the
+    per-pixel baseline.
+    """
+    src = graphics.Surface(filename='assets/dithertest.png', dither=True)
+    for name in ['copy', 'or', 'and', 'xor', 'invert', 'black', 'white']:
+        op = getattr(graphics, 'rop_' + name)
+        for cls in surface_classes():
+            dst = cls(128, 64)
+            report('%s.bitblt(op=rop_%s)' % (cls.__name__, name),
+                   lambda: dst.bitblt(src, 0, 0, op), number)
+        dst = graphics.Surface(128, 64)
+        report('per-pixel bitblt(op=rop_%s)' % name,
+               lambda: bitblt_pixelwise(dst, src, 0, 0, op), number)
+
+    # Raster operations from outside of graphics are called per pixel.
+    custom_op = lambda a, b: a > b
+    for cls in surface_classes():
+        dst = cls(128, 64)
+        report('%s.bitblt(op=<custom>)' % cls.__name__,
+               lambda: dst.bitblt(src, 0, 0, custom_op), number)
+    dst = graphics.Surface(128, 64)
+    report('per-pixel bitblt(op=<custom>)',
+           lambda: bitblt_pixelwise(dst, src, 0, 0, custom_op), number)
+
+    strip = graphics.Surface(filename='assets/shmup/foreground.png')
+    report('Surface.bitblt_scrolled(op=rop_or)',
+           lambda: dst.bitblt_scrolled(strip, 100, graphics.rop_or), number)
+    report('per-pixel bitblt_scrolled(op=rop_or)',
+           lambda: bitblt_pixelwise(dst, strip, -100, 0, graphics.rop_or),
+           number)
+
+
+def benchmark_dither(number=3):
+    for cls in surface_classes():
+        if cls is graphics.PackedSurface:
+            continue
+        src = cls(filename='assets/dithertest.png')
+        report('%s.dither() 128x64' % cls.__name__,
+               lambda: src.copy().dither(), number)
+
+    filename = 'assets/shmup/background.png'
+    report('dithered_image() 1280x64 uncached',
+           lambda: dither.dithered_image(filename), number)
+    dither.CACHE_DIR = tempfile.mkdtemp()
+    try:
+        dither.dithered_image(filename)
+        report('dithered_image() 1280x64 cached',
+               lambda: dither.dithered_image(filename), number)
+    finally:
+        shutil.rmtree(dither.CACHE_DIR)
+        dither.CACHE_DIR = None
+
+
+def benchmark_loading(number=3):
+    filename = 'assets/shmup/foreground.png'
+    report('Surface(filename=...) 1280x64',
+           lambda: graphics.Surface(filename=filename), number)
+    compiled = assets.compile_image(filename)
+    try:
+        report('assets.load() 1280x64',
+               lambda: assets.load(compiled), number)
+    finally:
+        os.remove(compiled)
+
+
+def benchmark_shapes(number=20):
+    shots = [(x * 3 % 120, x * 7 % 60) for x in xrange(40)]
+
+    def setpixel_shots(surface):
+        for x, y in shots:
+            for i in xrange(4):
+                surface.setpixel(x + i, y)
+
+    for cls in surface_classes():
+        surface = cls(128, 64)
+        report('%s 40 shots with setpixel()' % cls.__name__,
+               lambda: setpixel_shots(surface), number)
+        report('%s 40 shots with segments()' % cls.__name__,
+               lambda: surface.segments([(x, y, x + 3, y)
+                                         for x, y in shots]), number)
+        report('%s.fillcircle(r=30, op=rop_xor)' % cls.__name__,
+               lambda: surface.fillcircle(64, 32, 30, op=graphics.rop_xor),
+               number)
+
+
+def benchmark_lcd(number=20):
+    """Packing a frame into the framebuffer layout of libraspilcd."""
+    src = graphics.Surface(filename='assets/dithertest.png', dither=True)
+    for cls in surface_classes():
+        surface = cls(128, 64, pixels=src.pixels)
+        report('%s.page_columns() 128x64' % cls.__name__,
+               lambda: surface.page_columns(0, 128), number)
+
+
+def benchmark_fonts(number=3):
+    filename = 'assets/pf_tempesta_seven.ttf'
+
+    def load_and_render(size):
+        font = fonts.Font(filename, size)
+        for char in fonts.ATLAS_CHARACTERS:
+            font.glyph_for_character(char)
+
+    for size in (8, 16, 32):
+        report('Font(size=%i) with FreeType' % size,
+               lambda: load_and_render(size), number)
+        report('Font(size=%i).preload()' % size,
+               lambda: fonts.Font(filename, size).preload(), number)
+    compiled = fonts.compile_font(filename, [8, 16, 32])
+    try:
+        for size in (8, 16, 32):
+            report('fonts.load_compiled(size=%i)' % size,
+                   lambda: fonts.load_compiled(compiled, size), number)
+    finally:
+        os.remove(compiled)
+    fonts.ATLAS_DIR = tempfile.mkdtemp()
+    try:
+        for size in (8, 16, 32):
+            fonts.Font(filename, size)
+            report('Font(size=%i) from atlas' % size,
+                   lambda: load_and_render(size), number)
+    finally:
+        shutil.rmtree(fonts.ATLAS_DIR)
+        fonts.ATLAS_DIR = None
+
+    font = fonts.Font(filename, 8)
+    stations = ['B5 Aktuell', 'FM4', 'M94.5', 'SomaFM', 'Byte.FM']
+    surface = graphics.Surface(128, 64)
+
+    def render_list():
+        ui.render_list(surface, 2, 14, font, stations, selected_index=2)
+
+    def render_list_uncached():
+        font.textcache.clear()
+        render_list()
+
+    report('ui.render_list() uncached',
+           render_list_uncached, number * 10)
+    report('ui.render_list() cached', render_list, number * 10)
+
+    for size in (8, 32):
+        font = fonts.Font(filename, size)
+        for cls in surface_classes():
+            surface = cls(128, 64)
+            report('%s bitblt(font.render()) %ipx' % (cls.__name__, size),
+                   lambda: surface.bitblt(font.render('13:37'), 2, 2),
+                   number * 10)
+            report('%s.text() %ipx' % (cls.__name__, size),
+                   lambda: surface.text(font, 2, 2, '13:37'), number * 10)
+
+    font = fonts.Font(filename, 8)
+    title = 'Radio 2day - Die 80er und 90er und das Beste von heute'
+    marquee = ui.Marquee(font, 100, title)
+
+    def scroll_marquee():
+        marquee.offset = (marquee.offset + 1) % marquee.period
+        marquee.draw(surface, 20, 10)
+
+    for cls in surface_classes():
+        surface = cls(128, 64)
+        report('%s scrolled text()' % cls.__name__,
+               lambda: surface.text(font, 20 - marquee.offset, 10, title),
+               number * 10)
+        report('%s ui.Marquee.draw()' % cls.__name__,
+               scroll_marquee, number * 10)
+
+
+def benchmark_app(iterations=600):
+    """Run the main loop of the whole app as fast as possible with the
+    headless LCD driver, switching through panels that don't need the
+    network or an audio player.
+    """
+    import piradio.app as app
+    import piradio.lcd.headless_lcd as headless_lcd
+    config.CONFIG['lcd_drivers'] = ['piradio.lcd.headless_lcd']
+    radio = app.RadioApp()
+    radio.panel_defs = radio.read_panels([['ClockPanel', {}],
+                                          ['DitherTestPanel', {}],
+                                          ['AnimationTestPanel', {}],
+                                          ['ShootEmUpGamePanel', {}]])
+    try:
+        radio.start()
+        for panel in radio.panels:
+            name = panel.__class__.__name__
+            frames = headless_lcd.frame_count
+            start = time.time()
+            radio.mainloop(iterations, rate=float('inf'))
+            seconds = time.time() - start
+            print('%-44s %9.3f ms' % (name + ' main loop iteration',
+                                      seconds / iterations * 1000))
+            print('%-44s %9.1f' % (name + ' frames per second',
+                                   (headless_lcd.frame_count - frames) /
+                                   seconds))
+            headless_lcd.press(headless_lcd.K_RIGHT)
+    finally:
+        radio.broker.stop_running()
+
+
+def main():
+    benchmark_rops()
+    benchmark_dither()
+    benchmark_shapes()
+    benchmark_loading()
+    benchmark_lcd()
+    benchmark_fonts()
+    benchmark_app()
+
+if __name__ == '__main__':
+    main()
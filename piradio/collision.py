@@ -0,0 +1,131 @@
+"""Pixel-exact collision detection.
+
+Collision shapes are Masks that store every row of opaque pixels as an
+integer with bit x set for column x. Two masks are tested for overlap
+by shifting and ANDing these row integers, which checks a whole row at
+once. A Grid sorts many masks into cells of a uniform grid, so that
+only masks that are close to each other get compared.
+"""
+import collections
+import piradio.graphics as graphics
+
+
+class Mask(object):
+    def __init__(self, width, height, rows):
+        """Create a mask of the given size from a list of `height` row
+        integers.
+        """
+        self.width = width
+        self.height = height
+        self.rows = rows
+        # The first and last row with any opaque pixels.
+        filled = [y for y, row in enumerate(rows) if row]
+        self.top = filled[0] if filled else 0
+        self.bottom = filled[-1] + 1 if filled else 0
+
+    @staticmethod
+    def from_sprite(sprite):
+        """Return a mask of the opaque pixels of a graphics.Sprite."""
+        rows = []
+        for runs in sprite.rows:
+            row = 0
+            for x, span in runs:
+                row |= ((1 << len(span)) - 1) << x
+            rows.append(row)
+        return Mask(sprite.width, sprite.height, rows)
+
+    @staticmethod
+    def from_surface(surface):
+        """Return a mask of the non-zero pixels of `surface`."""
+        return Mask.from_sprite(graphics.Sprite(surface))
+
+    @staticmethod
+    def rect(width, height):
+        """Return a mask with all pixels of a `width` x `height`
+        rectangle set.
+        """
+        return Mask(width, height, [(1 << width) - 1] * height)
+
+    def __repr__(self):
+        return '\n'.join(''.join('#' if row >> x & 1 else '.'
+                                 for x in xrange(self.width))
+                         for row in self.rows) + '\n'
+
+    def overlaps(self, x, y, other, otherx, othery):
+        """Return True if this mask at (x, y) and `other` at
+        (otherx, othery) have an opaque pixel in common.
+        """
+        if (x >= otherx + other.width or otherx >= x + self.width):
+            return False
+        top = max(y + self.top, othery + other.top)
+        bottom = min(y + self.bottom, othery + other.bottom)
+        dx = otherx - x
+        rows, otherrows = self.rows, other.rows
+        for row in xrange(top, bottom):
+            otherrow = otherrows[row - othery]
+            # Shift the other row so that its bits line up with ours.
+            if dx >= 0:
+                otherrow <<= dx
+            else:
+                otherrow >>= -dx
+            if rows[row - y] & otherrow:
+                return True
+        return False
+
+
+class Grid(object):
+    """A uniform grid of square cells that holds masks and the items
+    they belong to.
+
+    Every mask is filed under all cells that its bounding box covers, so
+    a query only needs to test the masks that share a cell with it.
+    """
+    def __init__(self, cellsize=16):
+        self.cellsize = cellsize
+        self.cells = collections.defaultdict(list)
+
+    def clear(self):
+        self.cells.clear()
+
+    def _cells(self, mask, x, y):
+        size = self.cellsize
+        for row in xrange((y + mask.top) // size,
+                          (y + mask.bottom - 1) // size + 1):
+            for column in xrange(x // size, (x + mask.width - 1) // size + 1):
+                yield column, row
+
+    def insert(self, item, mask, x, y):
+        """Add `item` with the collision shape `mask` at (x, y)."""
+        if mask.top == mask.bottom:
+            return
+        entry = (item, mask, x, y)
+        for cell in self._cells(mask, x, y):
+            self.cells[cell].append(entry)
+
+    def query(self, mask, x, y):
+        """Return the items whose masks overlap `mask` at (x, y)."""
+        hits = []
+        seen = set()
+        for cell in self._cells(mask, x, y):
+            for item, othermask, otherx, othery in self.cells.get(cell, ()):
+                if id(item) in seen:
+                    continue
+                seen.add(id(item))
+                if mask.overlaps(x, y, othermask, otherx, othery):
+                    hits.append(item)
+        return hits
+
+    def pairs(self):
+        """Return all pairs of items in the grid whose masks overlap."""
+        hits = []
+        seen = set()
+        for entries in self.cells.itervalues():
+            for i, (item, mask, x, y) in enumerate(entries):
+                for other, othermask, otherx, othery in entries[i + 1:]:
+                    key = (id(item), id(other))
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    if mask.overlaps(x, y, othermask, otherx, othery):
+                        hits.append((item, other))
+        return hits
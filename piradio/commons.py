@@ -1,4 +1,5 @@
 import datetime
+import collections
 
 
 def clamp(v, min_value, max_value):
@@ -11,3 +12,54 @@ def clamp(v, min_value, max_value):
 def timeofday():
     """Return the current time of day formatted as a string, e.g. 13:37"""
     return str(datetime.datetime.now().strftime("%H:%M"))
+
+
+class LRUCache(object):
+    """A mapping that holds at most `maxsize` worth of values and drops
+    the least recently used ones to make room for new ones.
+
+    Every value is stored with a size, e.g. its number of bytes. The
+    `hits` and `misses` counters tell how well the cache works.
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        """Return the value for `key`, or `default` if it isn't cached."""
+        try:
+            entry = self._entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._entries[key] = entry
+        return entry[0]
+
+    def put(self, key, value, size=1):
+        """Cache `value` under `key`. Values that are larger than the
+        whole cache aren't stored.
+        """
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.size -= old[1]
+        if size > self.maxsize:
+            return
+        while self.size + size > self.maxsize:
+            _, (_, oldsize) = self._entries.popitem(last=False)
+            self.size -= oldsize
+        self._entries[key] = (value, size)
+        self.size += size
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
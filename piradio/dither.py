@@ -0,0 +1,134 @@
+"""Atkinson dithering and an on-disk cache for dithered images.
+
+Dithering a large image takes a while on the Raspberry Pi, so the result
+of dithered_image() is stored in CACHE_DIR, keyed by a hash of the image
+file and the dithering parameters. Later loads of the same image read
+the dithered pixels back from there.
+"""
+import os
+import png
+import errno
+import struct
+import hashlib
+import logging
+import tempfile
+
+# Directory for cached dither results. Caching is disabled if it's None.
+CACHE_DIR = None
+
+# Bump this whenever atkinson() changes its output, so that stale cache
+# entries are ignored.
+VERSION = 1
+
+_CACHE_MAGIC = b'DTHR'
+_CACHE_HEADER = struct.Struct('<4sHH')
+
+# Atkinson dithering spreads 1/8th of the error to these neighbours.
+_ATKINSON_NEIGHBOURS = [(1, 0), (2, 0), (-1, 1), (0, 1), (1, 1), (0, 2)]
+
+
+def atkinson(pixels, width, height, threshold=128):
+    """Atkinson-dither `pixels` in place.
+
+    `pixels` is a bytearray of `width` * `height` values in row-major
+    order. Pixels below `threshold` become 0, all others 255. Errors that
+    would spread across the image's edges are dropped.
+    Based on code by Michal Migurski:
+    http://mike.teczno.com/notes/atkinson.html
+    """
+    # Work on a copy with one column of padding on the left, two on the
+    # right and two rows at the bottom. Errors spread to the padding
+    # are never read back, which saves all bounds checks.
+    stride = width + 3
+    work = [0] * (stride * (height + 2))
+    for y in xrange(height):
+        start = y * stride + 1
+        work[start:start + width] = pixels[y * width:(y + 1) * width]
+    offsets = [dy * stride + dx for dx, dy in _ATKINSON_NEIGHBOURS]
+
+    for y in xrange(height):
+        start = y * stride + 1
+        for i in xrange(start, start + width):
+            old = work[i]
+            if old < threshold:
+                work[i] = 0
+                err = old >> 3
+            else:
+                work[i] = 255
+                err = (old - 255) >> 3
+            # Pure black and white areas don't produce any error.
+            if err:
+                for offset in offsets:
+                    v = work[i + offset] + err
+                    work[i + offset] = 0 if v < 0 else 255 if v > 255 else v
+
+    for y in xrange(height):
+        start = y * stride + 1
+        pixels[y * width:(y + 1) * width] = bytearray(
+            work[start:start + width])
+
+
+def cache_key(data, threshold=128):
+    """Return the cache key for dithering the image file contents
+    `data` with the given parameters.
+    """
+    key = hashlib.sha1(data)
+    key.update(b'atkinson-%d-%d' % (VERSION, threshold))
+    return key.hexdigest()
+
+
+def _read_cache(key):
+    try:
+        with open(os.path.join(CACHE_DIR, key), 'rb') as f:
+            data = f.read()
+    except IOError:
+        return None
+    if len(data) < _CACHE_HEADER.size:
+        return None
+    magic, width, height = _CACHE_HEADER.unpack_from(data)
+    pixels = bytearray(data[_CACHE_HEADER.size:])
+    if magic != _CACHE_MAGIC or len(pixels) != width * height:
+        return None
+    return width, height, pixels
+
+
+def _write_cache(key, width, height, pixels):
+    try:
+        os.makedirs(CACHE_DIR)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            logging.warning('Could not create dither cache %s: %s',
+                            CACHE_DIR, e)
+            return
+    try:
+        # Write to a temporary file first, so that other processes never
+        # see half-written cache entries.
+        with tempfile.NamedTemporaryFile(dir=CACHE_DIR,
+                                         delete=False) as f:
+            f.write(_CACHE_HEADER.pack(_CACHE_MAGIC, width, height))
+            f.write(pixels)
+        os.rename(f.name, os.path.join(CACHE_DIR, key))
+    except (IOError, OSError) as e:
+        logging.warning('Could not write dither cache entry %s: %s', key, e)
+
+
+def dithered_image(filename, threshold=128):
+    """Load the PNG image `filename`, dither it and return a tuple
+    (width, height, pixels) with the pixels in a bytearray.
+
+    Only the first channel of the image is used.
+    """
+    with open(filename, 'rb') as f:
+        data = f.read()
+    key = cache_key(data, threshold)
+    if CACHE_DIR:
+        cached = _read_cache(key)
+        if cached:
+            return cached
+
+    width, height, pixels, meta = png.Reader(bytes=data).read_flat()
+    pixels = bytearray(pixels[::meta['planes']])
+    atkinson(pixels, width, height, threshold)
+    if CACHE_DIR:
+        _write_cache(key, width, height, pixels)
+    return width, height, pixels
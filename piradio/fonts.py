@@ -1,8 +1,104 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+"""Fonts rendered to monochrome bitmaps.
+
+Glyphs are rendered with FreeType, which is only imported when a glyph
+is needed that isn't available pre-rendered. Fonts can be compiled at
+fixed sizes into bitmap font files that get() loads instead:
+
+    $ python -m piradio.fonts assets/pf_tempesta_seven.ttf 8 16 32
+
+compiles the font into assets/pf_tempesta_seven.bfnt.
+"""
+import piradio.assets as assets
 import piradio.graphics as graphics
-import freetype
+import piradio.commons as commons
+import os
+import sys
+import ctypes
+import errno
+import struct
+import hashlib
 import logging
+import tempfile
+
+# Directory for pre-rendered glyph atlases, see GlyphAtlas. Fonts are
+# rendered with FreeType on demand if it's None.
+ATLAS_DIR = None
+
+# Bump this whenever the atlas format or the glyph rendering changes, so
+# that stale atlases are ignored.
+ATLAS_VERSION = 2
+
+# The characters that are pre-rendered into each atlas: printable ASCII
+# and the Latin-1 supplement.
+ATLAS_CHARACTERS = u''.join(unichr(c) for c in
+                            range(32, 127) + range(160, 256))
+
+# How many bytes of measured and rendered text each font caches, see
+# Font.render_cached().
+TEXT_CACHE_SIZE = 64 * 1024
+
+# The bytes that a cached measurement takes up, mostly for the tuples
+# and the cache's bookkeeping. Rendered text counts its pixels instead.
+_DIMENSIONS_SIZE = 256
+
+# _UNPACK_BYTE[byte] holds the 8 pixels of a byte of a FreeType mono
+# bitmap, most significant bit first, as bytes of 0 and 1.
+_UNPACK_BYTE = [bytes(bytearray((byte >> bit) & 1 for bit in range(7, -1, -1)))
+                for byte in range(256)]
+
+COMPILED_EXTENSION = '.bfnt'
+
+_ATLAS_MAGIC = b'GLYA'
+# Magic, glyph count, kerning pair count.
+_ATLAS_HEADER = struct.Struct('<4sII')
+# Codepoint, width, height, top, advance_x.
+_ATLAS_GLYPH = struct.Struct('<IHHhh')
+# Left codepoint, right codepoint, offset.
+_ATLAS_KERNING = struct.Struct('<IIh')
+
+_FONT_MAGIC = b'BFNT'
+# Magic, version, number of sizes.
+_FONT_HEADER = struct.Struct('<4sBH')
+# Pixel size, length of the size's atlas.
+_FONT_SIZE = struct.Struct('<HI')
+
+
+def _freetype():
+    """Import and return the freetype module. It's only imported once a
+    glyph has to be rendered, so that fonts that are completely
+    pre-rendered work without it.
+    """
+    import freetype
+    return freetype
+
+
+def _pack_mono(pixels, width, height):
+    """Pack the unpacked `pixels` of a `width` x `height` bitmap into
+    bytes of 8 pixels each, most significant bit first. Every row starts
+    at a new byte, like in FreeType's mono bitmaps.
+    """
+    pitch = (width + 7) // 8
+    packed = bytearray(pitch * height)
+    for y in xrange(height):
+        for x in xrange(width):
+            if pixels[y * width + x]:
+                packed[y * pitch + x // 8] |= 0x80 >> (x % 8)
+    return packed
+
+
+def _unpack_mono(data, width, height, pitch):
+    """Unpack the bytes `data` of a mono bitmap with `pitch` bytes per
+    row into a bytearray with one byte per pixel.
+    """
+    # Unpack all bytes at once through the lookup table. Each row then
+    # starts at a multiple of 8 * pitch pixels, but only the first
+    # `width` of them belong to the bitmap.
+    pixels = b''.join([_UNPACK_BYTE[byte] for byte in data])
+    stride = 8 * pitch
+    return bytearray(b''.join([pixels[y * stride:y * stride + width]
+                               for y in xrange(height)]))
 
 
 class Bitmap(object):
@@ -59,6 +155,8 @@ class Glyph(object):
         # The glyph's advance width in pixels.
         self.advance_x = advance_x
 
+        self._rows = None
+
     @property
     def width(self):
         return self.bitmap.width
@@ -67,6 +165,17 @@ class Glyph(object):
     def height(self):
         return self.bitmap.height
 
+    @property
+    def rows(self):
+        """The pixels of the glyph as a list of bytes objects, one for
+        every row.
+        """
+        if self._rows is None:
+            pixels = bytes(self.bitmap.pixels)
+            self._rows = [pixels[y * self.width:(y + 1) * self.width]
+                          for y in xrange(self.height)]
+        return self._rows
+
     @staticmethod
     def from_glyphslot(slot):
         """Construct and return a Glyph object from a FreeType GlyphSlot."""
@@ -85,50 +194,187 @@ class Glyph(object):
         """Unpack a freetype FT_LOAD_TARGET_MONO glyph bitmap into a
         bytearray where each pixel is represented by a single byte.
         """
-        # Allocate a bytearray of sufficient size to hold the glyph bitmap.
-        data = bytearray(bitmap.rows * bitmap.width)
-
-        # Iterate over every byte in the glyph bitmap. Note that we're not
-        # iterating over every pixel in the resulting unpacked bitmap --
-        # we're iterating over the packed bytes in the input bitmap.
-        for y in range(bitmap.rows):
-            for byte_index in range(bitmap.pitch):
-
-                # Read the byte that contains the packed pixel data.
-                byte_value = bitmap.buffer[y * bitmap.pitch + byte_index]
+        # Every access to bitmap.buffer copies the whole buffer into a
+        # new list, so read it only once.
+        return _unpack_mono(bitmap.buffer, bitmap.width, bitmap.rows,
+                            bitmap.pitch)
 
-                # We've processed this many bits (=pixels) so far.
-                # This determines where we'll read the next batch
-                # of pixels from.
-                num_bits_done = byte_index * 8
 
-                # Pre-compute where to write the pixels that we're going
-                # to unpack from the current byte in the glyph bitmap.
-                rowstart = y * bitmap.width + byte_index * 8
+class GlyphAtlas(object):
+    """The pre-rendered glyphs and kerning pairs of a font at one size.
 
-                # Iterate over every bit (=pixel) that's still a part
-                # of the output bitmap. Sometimes we're only unpacking
-                # a fraction of a byte because glyphs may not always fit
-                # on a byte boundary. So we make sure to stop if we
-                # unpack past the current row of pixels.
-                for bit_index in range(min(8, bitmap.width - num_bits_done)):
-
-                    # Unpack the next pixel from the current glyph byte.
-                    bit = byte_value & (1 << (7 - bit_index))
+    Atlases are saved to ATLAS_DIR the first time a font is loaded. On
+    later loads the glyphs are read back from there, which is a lot
+    faster than rendering them with FreeType. Compiled bitmap fonts hold
+    an atlas for each of their sizes.
+    """
+    def __init__(self, glyphs, kerning):
+        """`glyphs` maps characters to Glyphs and `kerning` maps pairs of
+        characters to their kerning offset. Pairs that aren't in
+        `kerning` have an offset of 0.
+        """
+        self.glyphs = glyphs
+        self.kerning = kerning
 
-                    # Write the pixel to the output bytearray. We ensure
-                    # that `off` pixels have a value of 0 and `on`
-                    # pixels have a value of 1.
-                    data[rowstart + bit_index] = 1 if bit else 0
+    @staticmethod
+    def from_font(font, characters=ATLAS_CHARACTERS):
+        """Render `characters` with the FreeType face of `font`."""
+        font.preload(characters)
+        glyphs = dict((char, font.glyphcache[char]) for char in characters)
+        kerning = dict((pair, offset)
+                       for pair, offset in font.kerning.iteritems()
+                       if pair[0] in glyphs and pair[1] in glyphs)
+        return GlyphAtlas(glyphs, kerning)
+
+    def tobytes(self):
+        glyphs = sorted(self.glyphs.iteritems())
+        data = [_ATLAS_HEADER.pack(_ATLAS_MAGIC, len(glyphs),
+                                   len(self.kerning))]
+        for char, glyph in glyphs:
+            data.append(_ATLAS_GLYPH.pack(ord(char), glyph.width,
+                                          glyph.height, glyph.top,
+                                          glyph.advance_x))
+        for (left, right), offset in sorted(self.kerning.iteritems()):
+            data.append(_ATLAS_KERNING.pack(ord(left), ord(right), offset))
+        # The packed pixels of all glyphs follow each other in the order
+        # of the glyph table.
+        for _, glyph in glyphs:
+            data.append(bytes(_pack_mono(glyph.bitmap.pixels, glyph.width,
+                                         glyph.height)))
+        return b''.join(data)
 
-        return data
+    @staticmethod
+    def frombytes(data):
+        """Return the atlas saved in `data` by tobytes(). Raises a
+        ValueError if `data` isn't a valid atlas.
+        """
+        try:
+            magic, numglyphs, numpairs = _ATLAS_HEADER.unpack_from(data)
+            if magic != _ATLAS_MAGIC:
+                raise ValueError('Not a glyph atlas')
+            offset = _ATLAS_HEADER.size
+            metrics = []
+            for _ in xrange(numglyphs):
+                metrics.append(_ATLAS_GLYPH.unpack_from(data, offset))
+                offset += _ATLAS_GLYPH.size
+            kerning = {}
+            for _ in xrange(numpairs):
+                left, right, kern = _ATLAS_KERNING.unpack_from(data, offset)
+                kerning[(unichr(left), unichr(right))] = kern
+                offset += _ATLAS_KERNING.size
+        except struct.error as e:
+            raise ValueError('Broken glyph atlas: %s' % e)
+
+        glyphs = {}
+        pixels = bytearray(data[offset:])
+        offset = 0
+        for codepoint, width, height, top, advance_x in metrics:
+            pitch = (width + 7) // 8
+            end = offset + pitch * height
+            glyphs[unichr(codepoint)] = Glyph(
+                _unpack_mono(pixels[offset:end], width, height, pitch),
+                width, height, top, advance_x)
+            offset = end
+        if offset != len(pixels):
+            raise ValueError('Broken glyph atlas: wrong pixel count')
+        return GlyphAtlas(glyphs, kerning)
+
+
+def atlas_key(data, size, characters=ATLAS_CHARACTERS):
+    """Return the key of the atlas for the font file contents `data`
+    at `size` pixels.
+    """
+    key = hashlib.sha1(data)
+    key.update(b'atlas-%d-%d-' % (ATLAS_VERSION, size))
+    key.update(characters.encode('utf-8'))
+    return key.hexdigest()
+
+
+def _read_atlas(key):
+    try:
+        with open(os.path.join(ATLAS_DIR, key), 'rb') as f:
+            return GlyphAtlas.frombytes(f.read())
+    except IOError:
+        return None
+    except ValueError as e:
+        logging.warning('Ignoring glyph atlas %s: %s', key, e)
+        return None
+
+
+def _write_atlas(key, atlas):
+    try:
+        os.makedirs(ATLAS_DIR)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            logging.warning('Could not create atlas directory %s: %s',
+                            ATLAS_DIR, e)
+            return
+    try:
+        # Write to a temporary file first, so that other processes never
+        # see half-written atlases.
+        with tempfile.NamedTemporaryFile(dir=ATLAS_DIR, delete=False) as f:
+            f.write(atlas.tobytes())
+        os.rename(f.name, os.path.join(ATLAS_DIR, key))
+    except (IOError, OSError) as e:
+        logging.warning('Could not write glyph atlas %s: %s', key, e)
 
 
 class Font(object):
-    def __init__(self, filename, size):
-        self.face = freetype.Face(filename)
-        self.face.set_pixel_sizes(0, size)
+    def __init__(self, filename, size, atlas=None):
+        """Load the font file `filename` at `size` pixels. Glyphs are
+        taken from the GlyphAtlas `atlas` if it's given, or from the
+        atlas in ATLAS_DIR.
+        """
+        self.filename = filename
+        self.size = size
         self.glyphcache = {}
+        # The FreeType glyph indices of characters, see _add_kerning().
+        self._char_indices = {}
+        # The non-zero kerning offsets of all pairs of characters in the
+        # glyph cache, keyed by (left, right). It's empty for fonts
+        # without kerning, which lets text layout skip kerning entirely.
+        self.kerning = {}
+        # Text dimensions keyed by text and rendered Surfaces keyed by
+        # (text, width, height, baseline).
+        self.textcache = commons.LRUCache(TEXT_CACHE_SIZE)
+        if atlas:
+            self.use_atlas(atlas)
+        elif ATLAS_DIR:
+            self.load_atlas()
+
+    @property
+    def face(self):
+        """The FreeType face of this font's file, set to this font's size.
+        All sizes of a font file share one face, which is only opened
+        when a glyph isn't in the atlas.
+        """
+        face = _faces.get(self.filename)
+        if face is None:
+            logging.info('Opening font file %s', self.filename)
+            face = _faces[self.filename] = _freetype().Face(self.filename)
+        if _face_sizes.get(self.filename) != self.size:
+            face.set_pixel_sizes(0, self.size)
+            _face_sizes[self.filename] = self.size
+        return face
+
+    def load_atlas(self):
+        """Load the glyph atlas of this font from ATLAS_DIR, or render
+        and save it if there's none yet.
+        """
+        with open(self.filename, 'rb') as f:
+            key = atlas_key(f.read(), self.size)
+        atlas = _read_atlas(key)
+        if atlas is None:
+            logging.info('Building glyph atlas for %s-%i',
+                         self.filename, self.size)
+            atlas = GlyphAtlas.from_font(self)
+            _write_atlas(key, atlas)
+        self.use_atlas(atlas)
+
+    def use_atlas(self, atlas):
+        """Add the glyphs and kerning pairs of `atlas` to this font."""
+        self.glyphcache.update(atlas.glyphs)
+        self.kerning.update(atlas.kerning)
 
     def glyph_for_character(self, char):
         # Let FreeType load the glyph for the given character and tell
@@ -136,13 +382,78 @@ class Font(object):
         if char in self.glyphcache:
             return self.glyphcache[char]
 
-        self.face.load_char(char, freetype.FT_LOAD_RENDER |
-                            freetype.FT_LOAD_TARGET_MONO)
-        glyph = Glyph.from_glyphslot(self.face.glyph)
+        glyph = self._load_glyph(char)
+        self._add_kerning([char])
         self.glyphcache[char] = glyph
 
         return glyph
 
+    def _load_glyph(self, char):
+        freetype = _freetype()
+        self.face.load_char(char, freetype.FT_LOAD_RENDER |
+                            freetype.FT_LOAD_TARGET_MONO)
+        return Glyph.from_glyphslot(self.face.glyph)
+
+    def preload(self, characters=ATLAS_CHARACTERS):
+        """Load the glyphs of all `characters` that aren't in the glyph
+        cache yet, e.g. at startup before the font is first used.
+
+        This is faster than loading the glyphs one by one, because the
+        kerning pairs of all of them are looked up in a single pass.
+        """
+        new = []
+        for char in characters:
+            if char not in self.glyphcache and char not in new:
+                new.append(char)
+        if not new:
+            return
+        glyphs = [self._load_glyph(char) for char in new]
+        self._add_kerning(new)
+        self.glyphcache.update(zip(new, glyphs))
+
+    def _char_index(self, char):
+        index = self._char_indices.get(char)
+        if index is None:
+            index = self._char_indices[char] = self.face.get_char_index(char)
+        return index
+
+    def _add_kerning(self, chars):
+        """Add the kerning offsets of the new characters `chars` with
+        each other and with every character in the glyph cache to the
+        kerning table.
+        """
+        face = self.face
+        if not face.has_kerning:
+            return
+        # Characters that the font doesn't have are rendered with its
+        # fallback glyph, which isn't kerned.
+        new = [(char, self._char_index(char)) for char in chars]
+        new = [(char, index) for char, index in new if index]
+        old = [(char, self._char_index(char)) for char in self.glyphcache]
+        old = [(char, index) for char, index in old if index]
+        pairs = [(left, right) for left in new for right in new + old]
+        pairs.extend((left, right) for left in old for right in new)
+
+        # Face.get_kerning() looks up the glyph indices of both
+        # characters on every call, so call FreeType directly.
+        freetype = _freetype()
+        get_kerning = freetype.FT_Get_Kerning
+        ftface = face._FT_Face
+        mode = freetype.FT_KERNING_DEFAULT
+        vector = freetype.FT_Vector(0, 0)
+        vectorref = ctypes.byref(vector)
+        for (left, leftindex), (right, rightindex) in pairs:
+            error = get_kerning(ftface, leftindex, rightindex, mode,
+                                vectorref)
+            if error:
+                raise freetype.FT_Exception(error)
+            # The kerning offset is given in FreeType's 26.6 fixed point
+            # format, which means that the pixel values are multiples
+            # of 64.
+            offset = vector.x / 64
+            if offset:
+                self.kerning[(left, right)] = offset
+
     def render_character(self, char):
         glyph = self.glyph_for_character(char)
         return glyph.bitmap
@@ -157,21 +468,30 @@ class Font(object):
         fonts. In this case the glyph for "V" has a negative horizontal
         kerning offset as it is moved slightly towards the "A".
         """
-        kerning = self.face.get_kerning(previous_char, char)
-
-        # The kerning offset is given in FreeType's 26.6 fixed point
-        # format, which means that the pixel values are multiples of 64.
-        return kerning.x / 64
+        if previous_char is None:
+            return 0
+        # Loading the glyphs fills in their kerning pairs.
+        self.glyph_for_character(previous_char)
+        self.glyph_for_character(char)
+        return self.kerning.get((previous_char, char), 0)
 
     def text_dimensions(self, text):
         """Return (width, height, baseline) of `text` rendered in the
         current font.
         """
+        dimensions = self.textcache.get(text)
+        if dimensions is None:
+            dimensions = self._measure(text)
+            self.textcache.put(text, dimensions, _DIMENSIONS_SIZE)
+        return dimensions
+
+    def _measure(self, text):
         width, height, baseline = 0, 0, 0
         previous_char = None
 
         ascent = 0
         descent = 0
+        kerning = self.kerning
 
         # For each character in the text string we load its glyph bitmap
         # and update TODO
@@ -183,7 +503,8 @@ class Font(object):
             descent = max(descent, glyph.descent)
             baseline = max(baseline, glyph.descent)
 
-            kerning_x = self.kerning_offset(previous_char, char)
+            kerning_x = (kerning.get((previous_char, char), 0)
+                         if kerning else 0)
 
             # The advance width may be less than the width of the
             # glyph's bitmap. Make sure we compute the total width so
@@ -205,40 +526,129 @@ class Font(object):
         if None in (width, height, baseline):
             width, height, baseline = self.text_dimensions(text)
 
-        x, y = 0, 0
-        previous_char = None
         outbuffer = Bitmap(width, height)
+        for x, glyph in self._layout(text)[0]:
+            y = height - glyph.ascent - baseline
+            outbuffer.bitblt(glyph.bitmap, x, y)
+
+        return outbuffer
+
+    def _layout(self, text):
+        """Return a list of the glyphs of `text` and the x positions to
+        draw them at as (x, glyph) tuples, and whether the bitmaps of any
+        glyphs overlap.
+        """
+        layout = []
+        overlaps = False
+        x = 0
+        right = 0
+        previous_char = None
+        kerning = self.kerning
 
         for char in text:
+            glyph = self.glyph_for_character(char)
+
             # Adjust the glyph's drawing position if kerning information
             # in the font tells us so. This reduces extra diagonal
             # whitespace, for example in the string "AV" the bitmaps for
             # "A" and "V" overlap slightly.
-            x += self.kerning_offset(previous_char, char)
-
-            glyph = self.glyph_for_character(char)
-            y = height - glyph.ascent - baseline
-
-            outbuffer.bitblt(glyph.bitmap, x, y)
+            if kerning:
+                x += kerning.get((previous_char, char), 0)
 
+            if glyph.width:
+                overlaps = overlaps or x < right
+                right = max(right, x + glyph.width)
+            layout.append((x, glyph))
             x += glyph.advance_x
 
             previous_char = char
 
-        return outbuffer
+        return layout, overlaps
+
+    def draw_text(self, surface, x, y, text, op=graphics.rop_copy):
+        """Draw `text` into `surface` with its top-left corner at (x, y)
+        and the raster operation `op`.
+
+        This has the same result as blitting the Surface from render().
+        Text that is in the text cache is blitted from there. Otherwise,
+        unless glyphs overlap, each row of the text is put together from
+        the rows of its glyphs and blitted straight into `surface`. The
+        rows are then kept in the text cache as well, so that drawing
+        the same text again is a single blit.
+        """
+        width, height, baseline = self.text_dimensions(text)
+        key = (text, width, height, baseline)
+        rendered = self.textcache.get(key)
+        if rendered is None:
+            layout, overlaps = self._layout(text)
+            # Overlapping glyphs have to be combined pixel by pixel.
+            if overlaps:
+                rendered = self.render_cached(text, width, height, baseline)
+        if rendered is not None:
+            surface.bitblt(rendered, x, y, op)
+            return
+
+        # Stack up the rows of every glyph and of the gaps between them
+        # to columns of `height` rows, then join the columns row by row.
+        columns = []
+        right = 0
+        for glyphx, glyph in layout:
+            if not glyph.width:
+                continue
+            if glyphx > right:
+                columns.append([b'\x00' * (glyphx - right)] * height)
+            top = height - baseline - glyph.ascent
+            blank = [b'\x00' * glyph.width]
+            columns.append(blank * top + glyph.rows +
+                           blank * (height - top - glyph.height))
+            right = glyphx + glyph.width
+        columns.append([b'\x00' * (width - right)] * height)
+        rows = [b''.join(pieces) for pieces in zip(*columns)]
+        rendered = graphics.Surface.frombuffer(width, height,
+                                               bytearray(b''.join(rows)))
+        self.textcache.put(key, rendered, len(text) + width * height)
+
+        area = surface.rect.clipped(graphics.Rect(x, y, width, height))
+        if not area.width or not area.height:
+            return
+        start, end = area.x - x, area.rx - x
+        blitspan = surface._blitspan
+        for spany, row in enumerate(rows[area.y - y:area.ry - y], area.y):
+            blitspan(area.x, spany, row[start:end], op)
+        surface._touch(area.x, area.y, area.width, area.height)
 
     def text_extents(self, text):
         return self.text_dimensions(text)
 
     def render(self, text, width=None, height=None, baseline=None):
         bmp = self.render_text(text, width, height, baseline)
-        return graphics.Surface(bmp.width, bmp.height, pixels=bmp.pixels)
+        return graphics.Surface.frombuffer(bmp.width, bmp.height, bmp.pixels)
+
+    def render_cached(self, text, width=None, height=None, baseline=None):
+        """Like render(), but return the same Surface for the same
+        arguments as long as it's in the text cache. The returned Surface
+        must not be drawn into.
+        """
+        if None in (width, height, baseline):
+            width, height, baseline = self.text_dimensions(text)
+        key = (text, width, height, baseline)
+        surface = self.textcache.get(key)
+        if surface is None:
+            surface = self.render(text, width, height, baseline)
+            self.textcache.put(key, surface, len(text) + width * height)
+        return surface
 
 _registered_fonts = {}
 _loaded_fonts = {}
 
+# The FreeType faces of font files and the pixel size they're set to.
+_faces = {}
+_face_sizes = {}
+
 
 def register(name, path):
+    if not os.path.isfile(path):
+        raise IOError(errno.ENOENT, 'No such font file', path)
     _registered_fonts[name] = path
     logging.info('Registered font %s --> %s', name, path)
 
@@ -255,7 +665,88 @@ def get(name, size):
 
     logging.info('Loading font %s-%i', name, size)
 
-    fnt = Font(_registered_fonts[name], size)
+    atlas = None
+    compiled = compiled_filename(path)
+    if assets.up_to_date(path, compiled):
+        try:
+            atlas = load_compiled(compiled, size)
+        except (IOError, ValueError) as e:
+            logging.warning('Could not load %s: %s', compiled, e)
+    fnt = Font(path, size, atlas)
     _loaded_fonts[hashedname] = fnt
 
     return fnt
+
+
+def loaded():
+    """Return a list of all fonts that have been loaded with get()."""
+    return _loaded_fonts.values()
+
+
+def compiled_filename(filename):
+    """Return the name of the compiled bitmap font of the font file
+    `filename`.
+    """
+    base, _ = os.path.splitext(filename)
+    return base + COMPILED_EXTENSION
+
+
+def compile_font(filename, sizes, characters=ATLAS_CHARACTERS):
+    """Render `characters` of the font file `filename` at every pixel
+    size in `sizes` and save them as a bitmap font. Return the name of
+    the compiled file.
+    """
+    atlases = [GlyphAtlas.from_font(Font(filename, size)).tobytes()
+               for size in sizes]
+    data = [_FONT_HEADER.pack(_FONT_MAGIC, ATLAS_VERSION, len(sizes))]
+    for size, atlas in zip(sizes, atlases):
+        data.append(_FONT_SIZE.pack(size, len(atlas)))
+    data.extend(atlases)
+
+    target = compiled_filename(filename)
+    # Write to a temporary file first, so that the radio never loads a
+    # half-written file.
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(target) or '.',
+                                     delete=False) as f:
+        f.write(b''.join(data))
+    os.rename(f.name, target)
+    return target
+
+
+def load_compiled(filename, size):
+    """Return the GlyphAtlas of `size` pixels from the compiled bitmap
+    font `filename`, or None if the font wasn't compiled at that size.
+    Raises a ValueError if the file isn't a compiled font.
+    """
+    with open(filename, 'rb') as f:
+        data = f.read()
+    try:
+        magic, version, numsizes = _FONT_HEADER.unpack_from(data)
+        if magic != _FONT_MAGIC or version != ATLAS_VERSION:
+            raise ValueError('%s is not a compiled font' % filename)
+        # The atlases follow the table of sizes.
+        offset = _FONT_HEADER.size + numsizes * _FONT_SIZE.size
+        for i in xrange(numsizes):
+            atlassize, length = _FONT_SIZE.unpack_from(
+                data, _FONT_HEADER.size + i * _FONT_SIZE.size)
+            if atlassize == size:
+                break
+            offset += length
+        else:
+            return None
+    except struct.error:
+        raise ValueError('%s is truncated' % filename)
+    if offset + length > len(data):
+        raise ValueError('%s is truncated' % filename)
+    return GlyphAtlas.frombytes(data[offset:offset + length])
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 3:
+        sys.exit('Usage: python -m piradio.fonts FONTFILE SIZE [SIZE...]')
+    logging.info('Compiled %s', compile_font(sys.argv[1],
+                                             map(int, sys.argv[2:])))
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,9 @@
+import re
 import png
+import binascii
 import cStringIO as StringIO
-import piradio.commons as commons
+import piradio.dither as dithering
+import piradio.raster as raster
 
 WHITE = 0
 BLACK = 1
@@ -19,6 +22,107 @@ rop_black = lambda a, b: 0
 rop_white = lambda a, b: 1
 
 
+def _bytetable(func):
+    """Return a 256 byte translation table that maps each byte
+    value `i` to `func(i)`.
+    """
+    return bytes(bytearray(func(i) & 0xff for i in range(256)))
+
+# Translation tables for working on whole spans of packed pixels at once
+# through bytearray.translate(). _PACK_BIT[bit] turns a row of unpacked
+# pixels into the bit values for that row in a page, _UNPACK_BIT[bit]
+# does the opposite. _SET_BITS and _CLEAR_BITS set or clear a bit mask
+# in every byte of a span.
+_PACK_BIT = [_bytetable(lambda i, b=b: (1 << b) if i else 0) for b in range(8)]
+_UNPACK_BIT = [_bytetable(lambda i, b=b: (i >> b) & 1) for b in range(8)]
+_SET_BITS = [_bytetable(lambda i, m=m: i | m) for m in range(256)]
+_CLEAR_BITS = [_bytetable(lambda i, m=m: i & ~m) for m in range(256)]
+_SHIFT_LEFT = [_bytetable(lambda i, n=n: i << n) for n in range(9)]
+_SHIFT_RIGHT = [_bytetable(lambda i, n=n: i >> n) for n in range(9)]
+_NORMALIZE = _bytetable(lambda i: 1 if i else 0)
+_INVERT = _bytetable(lambda i: 0 if i else 1)
+
+
+def _span_to_int(span):
+    """Return the bytes in `span` as one big (big-endian) integer."""
+    return int(binascii.hexlify(span), 16) if span else 0
+
+
+def _int_to_span(value, length):
+    """Return `value` as a span of `length` bytes.
+    The inverse of _span_to_int().
+    """
+    if not length:
+        return b''
+    return binascii.unhexlify('%0*x' % (2 * length, value))
+
+
+def _repeat_byte(value, length):
+    """Return an integer made of `length` bytes that all equal `value`."""
+    return int('%02x' % value * length, 16) if length else 0
+
+
+def _pack_page_span(span, height, x, y, length):
+    """Return rows y...y+7 of an image `height` pixels high packed into
+    an integer in the page layout of a PackedSurface. `span(x, y,
+    length)` returns the unpacked pixels of a row. Rows outside of the
+    image are 0.
+    """
+    value = 0
+    for bit in xrange(8):
+        if 0 <= y + bit < height:
+            value |= _span_to_int(span(x, y + bit, length)
+                                  .translate(_PACK_BIT[bit]))
+    return value
+
+# Bulk versions of the raster operations above. They work on whole spans
+# of pixels that have been converted into integers by _span_to_int().
+# `ones` has every bit set that belongs to a pixel in the span.
+_BULK_ROPS = {
+    rop_nop: lambda a, b, ones: a,
+    rop_copy: lambda a, b, ones: b,
+    rop_not: lambda a, b, ones: b ^ ones,
+    rop_and: lambda a, b, ones: a & b,
+    rop_or: lambda a, b, ones: a | b,
+    rop_xor: lambda a, b, ones: a ^ b,
+    rop_black: lambda a, b, ones: 0,
+    rop_white: lambda a, b, ones: ones,
+}
+
+
+# Matches the runs of opaque pixels in a row of a sprite's mask.
+_OPAQUE_RUN = re.compile(b'[^\x00]+')
+
+
+def _rop_span(op, dst, src):
+    """Apply the raster operation `op` to the spans of unpacked pixels
+    `dst` and `src` and return the resulting span.
+
+    The raster operations from this module are run on the whole span at
+    once. rop_copy keeps the source pixel values, the other ones return
+    pixels that are either 0 or 1. Any other `op` is called once per
+    pixel.
+    """
+    if op is rop_copy:
+        return src
+    if op is rop_nop:
+        return dst
+    if op is rop_not:
+        return src.translate(_INVERT)
+    if op is rop_black:
+        return b'\x00' * len(src)
+    if op is rop_white:
+        return b'\x01' * len(src)
+    bulk = _BULK_ROPS.get(op)
+    if bulk is None:
+        return bytearray(map(op, bytearray(dst), bytearray(src)))
+    length = len(src)
+    result = bulk(_span_to_int(dst.translate(_NORMALIZE)),
+                  _span_to_int(src.translate(_NORMALIZE)),
+                  _repeat_byte(1, length))
+    return _int_to_span(result, length)
+
+
 class Rect(object):
     def __init__(self, x, y, width, height):
         self.x = x
@@ -45,6 +149,14 @@ class Rect(object):
         ry = min(self.ry, other.ry)
         return Rect(x, y, rx - x, ry - y)
 
+    def union(self, other):
+        """Return the smallest Rect that contains this and `other`."""
+        x = min(self.x, other.x)
+        y = min(self.y, other.y)
+        rx = max(self.rx, other.rx)
+        ry = max(self.ry, other.ry)
+        return Rect(x, y, rx - x, ry - y)
+
     def clipped(self, other):
         def clamp(v, min_value, max_value):
             return min(max(min_value, v), max_value)
@@ -67,10 +179,9 @@ class Surface(object):
                  pixels=None, dither=False):
         self._width = width
         self._height = height
+        self.damage = None
         if filename:
-            self.loadimage(filename)
-            if dither:
-                self.dither()
+            self.loadimage(filename, dither)
         elif pixels:
             self.pixels = bytearray(pixels)
         else:
@@ -81,10 +192,11 @@ class Surface(object):
 
     def __repr__(self):
         bstr = ''
+        pixels = self.pixels
         for i in xrange(self._height):
             rowstr = ''
             for j in xrange(self._width):
-                rowstr += '#' if self.pixels[i * self._width + j] else '.'
+                rowstr += '#' if pixels[i * self._width + j] else '.'
             bstr += rowstr + '\n'
         return bstr
 
@@ -106,7 +218,25 @@ class Surface(object):
     def rect(self):
         return Rect(0, 0, self._width, self._height)
 
+    def _touch(self, x, y, w, h):
+        """Add the given area to the region that changed since the last
+        call to flush_damage().
+        """
+        rect = self.rect.clipped(Rect(x, y, w, h))
+        if not rect.width or not rect.height:
+            return
+        self.damage = rect if self.damage is None else self.damage.union(rect)
+
+    def flush_damage(self):
+        """Return the Rect that covers all pixels that were drawn to
+        since the last call (or None if nothing was drawn) and start
+        over with an empty damage region.
+        """
+        damage, self.damage = self.damage, None
+        return damage
+
     def fill(self, color=1):
+        self._touch(0, 0, self._width, self._height)
         for i in xrange(len(self.pixels)):
             self.pixels[i] = color
 
@@ -117,38 +247,66 @@ class Surface(object):
         return self.pixels[y * self._width + x]
 
     def setpixel(self, x, y, color=1):
+        self._touch(x, y, 1, 1)
         pixel = y * self._width + x
         self.pixels[pixel] = color
 
     def vline(self, x, color=1):
+        self._touch(x, 0, 1, self._height)
         px = x
         for _ in xrange(self._height):
             self.pixels[px] = color
             px += self._width
 
     def hline(self, y, color=1):
+        self._touch(0, y, self._width, 1)
         px = y * self._width
         for _ in xrange(self._width):
             self.pixels[px] = color
             px += 1
 
+    def _span(self, x, y, length):
+        """Return `length` pixels of row `y` starting at column `x`."""
+        start = y * self._width + x
+        return self.pixels[start:start + length]
+
+    def _page_span(self, x, y, length):
+        """Return the pixels in rows y...y+7 starting at column `x`
+        packed into an integer in the page layout of a PackedSurface.
+        """
+        return _pack_page_span(self._span, self._height, x, y, length)
+
+    def _page_bytes(self, page, x, length):
+        """Return `length` columns of `page` starting at column `x` in
+        the page layout of a PackedSurface.
+        """
+        return _int_to_span(self._page_span(x, page * 8, length), length)
+
+    def page_columns(self, x, length):
+        """Return the pixels of `length` columns starting at column `x`,
+        packed one page per byte. Every column takes `numpages` bytes
+        with the top page first. This is the layout of the framebuffer
+        in libraspilcd.
+        """
+        numpages = (self.height + 7) // 8
+        columns = bytearray(length * numpages)
+        for page in xrange(numpages):
+            columns[page::numpages] = self._page_bytes(page, x, length)
+        return columns
+
     def bitblt_fast(self, src, x, y):
         """Blit without range checks, clipping and a hardwired rop_copy
         raster operation.
         """
+        self._touch(x, y, src.width, src.height)
         width = self.width
         pixels = self.pixels
-        src_width, src_height = src.width, src.height
-        src_pixels = src.pixels
-        srcpixel = 0
+        src_width = src.width
         dstpixel = y * width + x
-
-        for _ in xrange(src_height):
-            for _ in xrange(src_width):
-                pixels[dstpixel] = src_pixels[srcpixel]
-                srcpixel += 1
-                dstpixel += 1
-            dstpixel += width - src_width
+        for row in xrange(src.height):
+            pixels[dstpixel:dstpixel + src_width] = src._span(0, row,
+                                                              src_width)
+            dstpixel += width
 
     def bitblt(self, src, x=0, y=0, op=rop_copy):
         # This is the area within the current surface we want to draw in.
@@ -157,49 +315,32 @@ class Surface(object):
         # the surface.
         dstrect = Rect(x, y, src.width, src.height)
         cliprect = self.rect.clipped(dstrect)
+        self._touch(cliprect.x, cliprect.y, cliprect.width, cliprect.height)
 
-        # xoffs and yoffs are important when we clip against
+        # srcx and srcy are important when we clip against
         # the left or top edge.
-        xoffs = src.width - cliprect.width if x <= 0 else 0
-        yoffs = src.height - cliprect.height if y <= 0 else 0
+        srcx = cliprect.x - x
+        srcy = cliprect.y - y
 
-        # Copy pixels from `src` to `cliprect`.
-        dstrowwidth = cliprect.rx - cliprect.x
-        srcpixel = yoffs * src._width + xoffs
+        # Combine `src` and `cliprect` one row of pixels at a time.
+        dstrowwidth = cliprect.width
         dstpixel = cliprect.y * self._width + cliprect.x
         dstpixels = self.pixels
-        srcpixels = src.pixels
-        for _ in xrange(cliprect.ry - cliprect.y):
-            for _ in xrange(dstrowwidth):
-                dstpixels[dstpixel] = op(dstpixels[dstpixel],
-                                         srcpixels[srcpixel])
-                srcpixel += 1
-                dstpixel += 1
-            srcpixel += src._width - dstrowwidth
-            dstpixel += self._width - dstrowwidth
+        for row in xrange(cliprect.height):
+            end = dstpixel + dstrowwidth
+            dstpixels[dstpixel:end] = _rop_span(
+                op, dstpixels[dstpixel:end],
+                src._span(srcx, srcy + row, dstrowwidth))
+            dstpixel += self._width
 
     def bitblt_scrolled(self, src, offset, op=rop_copy):
-        width = self.width
-        height = self.height
-        src_width = src.width
-        srcpixel = offset
-        dstpixel = 0
-        dst_pixels = self.pixels
-        src_pixels = src.pixels
-        for _ in xrange(height):
-            for _ in xrange(width):
-                dst_pixels[dstpixel] = op(dst_pixels[dstpixel],
-                                          src_pixels[srcpixel])
-                srcpixel += 1
-                dstpixel += 1
-            srcpixel += src_width - width
+        """Blit `src` scrolled `offset` pixels to the left."""
+        self.bitblt(src, -offset, 0, op)
 
     # TODO: REFACTOR: Font rendering into Surfaces should be done
     # solely through fontlib.
     def text(self, font, x, y, text, rop=rop_copy):
-        w, h, baseline = font.text_extents(text)
-        bmp = font.render(text, w, h, baseline)
-        self.bitblt(bmp, x, y, op=rop)
+        font.draw_text(self, x, y, text, rop)
 
     def center_text(self, font, text, x=None, y=None, rop=rop_copy):
         w, h, _ = font.text_dimensions(text)
@@ -208,23 +349,122 @@ class Surface(object):
         self.text(font, x, y, text, rop)
 
     def strokerect(self, x, y, w, h, color=1):
-        for dx in xrange(x, x + w):
-            self.setpixel(dx, y, color)
-            self.setpixel(dx, y + h - 1, color)
-        for dy in xrange(y, y + h):
-            self.setpixel(x, dy, color)
-            self.setpixel(x + w - 1, dy, color)
+        self.fillrect(x, y, w, 1, color)
+        self.fillrect(x, y + h - 1, w, 1, color)
+        self.fillrect(x, y, 1, h, color)
+        self.fillrect(x + w - 1, y, 1, h, color)
 
     def fillrect(self, x, y, w, h, color=1):
-        for dy in xrange(y, y + h):
-            for dx in xrange(x, x + w):
-                self.pixels[dy * self._width + dx] = color
+        rect = self.rect.clipped(Rect(x, y, w, h))
+        self._touch(rect.x, rect.y, rect.width, rect.height)
+        row = bytearray([color]) * rect.width
+        start = rect.y * self._width + rect.x
+        for _ in xrange(rect.height):
+            self.pixels[start:start + rect.width] = row
+            start += self._width
+
+    def _fillspan(self, x, y, length, color=1, op=rop_copy):
+        """Combine `length` pixels of row `y` starting at column `x`
+        with `color` using the raster operation `op`. The span must lie
+        within the surface.
+        """
+        if op is rop_copy:
+            start = y * self._width + x
+            self.pixels[start:start + length] = bytearray([color]) * length
+        else:
+            self._blitspan(x, y, bytearray([color]) * length, op)
+
+    def _blitspan(self, x, y, span, op=rop_copy):
+        """Combine the pixels of row `y` starting at column `x` with the
+        unpacked pixels in `span` using the raster operation `op`. The
+        span must lie within the surface.
+        """
+        start = y * self._width + x
+        end = start + len(span)
+        if op is rop_copy:
+            self.pixels[start:end] = span
+        else:
+            self.pixels[start:end] = _rop_span(op, self.pixels[start:end],
+                                               span)
+
+    def _drawspans(self, spans, color=1, op=rop_copy):
+        """Draw the (x, y, length) `spans` from piradio.raster clipped
+        to the surface.
+        """
+        width, height = self._width, self._height
+        left, top, right, bottom = width, height, 0, 0
+        for x, y, length in spans:
+            if not 0 <= y < height:
+                continue
+            if x < 0:
+                length += x
+                x = 0
+            length = min(length, width - x)
+            if length <= 0:
+                continue
+            self._fillspan(x, y, length, color, op)
+            left, right = min(left, x), max(right, x + length)
+            top, bottom = min(top, y), max(bottom, y + 1)
+        if left < right:
+            self._touch(left, top, right - left, bottom - top)
+
+    def line(self, x0, y0, x1, y1, color=1, op=rop_copy):
+        """Draw a line from (x0, y0) to (x1, y1), both included."""
+        self._drawspans(raster.line_spans(x0, y0, x1, y1), color, op)
+
+    def segments(self, segments, color=1, op=rop_copy):
+        """Draw a batch of lines given as (x0, y0, x1, y1) tuples.
+        Pixels covered by more than one line are only drawn once.
+        """
+        spans = []
+        for x0, y0, x1, y1 in segments:
+            spans.extend(raster.line_spans(x0, y0, x1, y1))
+        self._drawspans(raster.merge_spans(spans), color, op)
+
+    def points(self, points, color=1, op=rop_copy):
+        """Draw a batch of pixels given as (x, y) tuples."""
+        self._drawspans(raster.point_spans(points), color, op)
+
+    def strokeellipse(self, cx, cy, rx, ry, color=1, op=rop_copy):
+        self._drawspans(raster.stroke_ellipse_spans(cx, cy, rx, ry),
+                        color, op)
+
+    def fillellipse(self, cx, cy, rx, ry, color=1, op=rop_copy):
+        self._drawspans(raster.fill_ellipse_spans(cx, cy, rx, ry),
+                        color, op)
+
+    def strokecircle(self, cx, cy, r, color=1, op=rop_copy):
+        self.strokeellipse(cx, cy, r, r, color, op)
 
-    def loadimage(self, filename):
-        reader = png.Reader(filename)
-        self._width, self._height, pixels, _ = reader.read_flat()
-        self.pixels = bytearray(px for i, px in
-                                enumerate(pixels) if i % 3 == 0)
+    def fillcircle(self, cx, cy, r, color=1, op=rop_copy):
+        self.fillellipse(cx, cy, r, r, color, op)
+
+    def strokepolygon(self, points, color=1, op=rop_copy):
+        """Draw the closed outline through the (x, y) tuples in
+        `points`.
+        """
+        self._drawspans(raster.stroke_polygon_spans(points), color, op)
+
+    def fillpolygon(self, points, color=1, op=rop_copy):
+        """Fill the polygon with the (x, y) vertices in `points`,
+        including its outline.
+        """
+        self._drawspans(raster.fill_polygon_spans(points), color, op)
+
+    def loadimage(self, filename, dither=False):
+        """Load the PNG image `filename`. If `dither` is true, the image
+        is dithered, or its dithered pixels are taken from the dither
+        cache.
+        """
+        if dither:
+            self._width, self._height, self.pixels = (
+                dithering.dithered_image(filename))
+        else:
+            reader = png.Reader(filename)
+            self._width, self._height, pixels, _ = reader.read_flat()
+            self.pixels = bytearray(px for i, px in
+                                    enumerate(pixels) if i % 3 == 0)
+        self._touch(0, 0, self._width, self._height)
 
     def as_png_image(self):
         buf = StringIO.StringIO()
@@ -238,29 +478,15 @@ class Surface(object):
             f.write(self.as_png_image())
 
     def dither(self):
-        """Return an Atkinson-dithered version of `bitmap`.
+        """Atkinson-dither the surface in place.
 
-        Each pixel in `bitmap` may take a value in [0, 255].
-        Based on code by Michal Migurski:
-        http://mike.teczno.com/notes/atkinson.html
+        Each pixel may take a value in [0, 255].
         """
-        threshold = 128*[0] + 128*[255]
-        for y in xrange(self._height):
-            for x in xrange(self._width):
-                old = self.pixels[y * self._width + x]
-                new = threshold[old]
-                err = (old - new) // 8
-                self.pixels[y * self._width + x] = new
-                for nxy in [(x+1, y), (x+2, y), (x-1, y+1),
-                            (x, y+1), (x+1, y+1), (x, y+2)]:
-                    try:
-                        px = nxy[1] * self._width + nxy[0]
-                        self.pixels[px] = commons.clamp(self.pixels[px] + err,
-                                                        0, 255)
-                    except IndexError:
-                        pass
+        self._touch(0, 0, self._width, self._height)
+        dithering.atkinson(self.pixels, self._width, self._height)
 
     def apply(self, func):
+        self._touch(0, 0, self._width, self._height)
         for i in xrange(len(self.pixels)):
             self.pixels[i] = func(self.pixels[i])
 
@@ -269,6 +495,622 @@ class Surface(object):
                               height=self.height,
                               pixels=self.pixels)
 
+    def subsurface(self, x, y, w, h):
+        """Return a SurfaceView for drawing into the given area of this
+        surface.
+        """
+        return SurfaceView(self, x, y, w, h)
+
+    @staticmethod
+    def frombuffer(width, height, pixels):
+        """Return a Surface that uses the bytearray `pixels` as its
+        pixel buffer instead of copying it.
+        """
+        surface = Surface()
+        surface._width = width
+        surface._height = height
+        surface.pixels = pixels
+        return surface
+
+
+class PackedSurface(Surface):
+    """A Surface that stores eight pixels per byte.
+
+    The pixels are laid out in pages like the display RAM of the
+    ST7565 LCD controller: every page covers 8 rows and is stored as
+    `width` consecutive bytes. Each byte holds one column of the page
+    with the top-most pixel in the least significant bit.
+
+    Pixel values are stored as single bits, so every non-zero pixel
+    reads back as 1.
+    """
+    def __init__(self, width=0, height=0, filename=None,
+                 pixels=None, dither=False, pages=None):
+        self._width = width
+        self._height = height
+        self.damage = None
+        if filename:
+            self.loadimage(filename, dither)
+        elif pages is not None:
+            self.pages = bytearray(pages)
+        else:
+            self.pages = bytearray(width * self.numpages)
+            if pixels:
+                self._pack(pixels)
+
+    def __len__(self):
+        return self._width * self._height
+
+    def __getitem__(self, key):
+        return self.getpixel(key % self._width, key // self._width)
+
+    @property
+    def numpages(self):
+        return (self._height + 7) // 8
+
+    @property
+    def pixels(self):
+        """Return a copy of the pixels unpacked into one byte per pixel.
+
+        Changing the copy doesn't change the surface, and the pixels
+        can't be replaced either. Draw with setpixel() and friends or
+        create a new surface from the changed pixels instead.
+        """
+        width = self._width
+        pixels = bytearray(width * self._height)
+        for y in xrange(self._height):
+            page = (y >> 3) * width
+            pixels[y * width:(y + 1) * width] = (
+                self.pages[page:page + width].translate(_UNPACK_BIT[y & 7]))
+        return pixels
+
+    @pixels.setter
+    def pixels(self, pixels):
+        raise AttributeError('The pixels of a PackedSurface are read-only')
+
+    def _pack(self, pixels):
+        """Pack `pixels` (one byte per pixel) into this surface's pages."""
+        width = self._width
+        pixels = bytearray(pixels)
+        for page in xrange(self.numpages):
+            value = 0
+            for bit in xrange(min(8, self._height - page * 8)):
+                row = (page * 8 + bit) * width
+                value |= _span_to_int(
+                    pixels[row:row + width].translate(_PACK_BIT[bit]))
+            self.pages[page * width:(page + 1) * width] = _int_to_span(value,
+                                                                       width)
+
+    def fill(self, color=1):
+        self._touch(0, 0, self._width, self._height)
+        self.pages[:] = (b'\xff' if color else b'\x00') * len(self.pages)
+
+    def getpixel(self, x, y):
+        return (self.pages[(y >> 3) * self._width + x] >> (y & 7)) & 1
+
+    def setpixel(self, x, y, color=1):
+        self._touch(x, y, 1, 1)
+        i = (y >> 3) * self._width + x
+        if color:
+            self.pages[i] |= 1 << (y & 7)
+        else:
+            self.pages[i] &= ~(1 << (y & 7)) & 0xff
+
+    def vline(self, x, color=1):
+        self.fillrect(x, 0, 1, self._height, color)
+
+    def hline(self, y, color=1):
+        self.fillrect(0, y, self._width, 1, color)
+
+    def fillrect(self, x, y, w, h, color=1):
+        rect = self.rect.clipped(Rect(x, y, w, h))
+        if not rect.width:
+            return
+        self._touch(rect.x, rect.y, rect.width, rect.height)
+        tables = _SET_BITS if color else _CLEAR_BITS
+        for page in xrange(rect.y >> 3, (rect.ry + 7) >> 3):
+            # Build a mask of the rows within this page that lie
+            # inside `rect` and apply it to the whole span at once.
+            top = max(rect.y - page * 8, 0)
+            bottom = min(rect.ry - page * 8, 8)
+            mask = ((1 << bottom) - 1) & ~((1 << top) - 1)
+            start = page * self._width + rect.x
+            end = start + rect.width
+            self.pages[start:end] = self.pages[start:end].translate(
+                tables[mask])
+
+    def _span(self, x, y, length):
+        start = (y >> 3) * self._width + x
+        return self.pages[start:start + length].translate(
+            _UNPACK_BIT[y & 7])
+
+    def _fillspan(self, x, y, length, color=1, op=rop_copy):
+        start = (y >> 3) * self._width + x
+        end = start + length
+        mask = 1 << (y & 7)
+        if op is rop_copy:
+            tables = _SET_BITS if color else _CLEAR_BITS
+            self.pages[start:end] = self.pages[start:end].translate(
+                tables[mask])
+            return
+        bulk = _BULK_ROPS.get(op)
+        if bulk is None:
+            self._setspan(x, y, _rop_span(op, self._span(x, y, length),
+                                          bytearray([color]) * length))
+            return
+        ones = _repeat_byte(mask, length)
+        dst = _span_to_int(self.pages[start:end])
+        result = (dst & ~ones) | (bulk(dst, ones if color else 0, ones) &
+                                  ones)
+        self.pages[start:end] = _int_to_span(result, length)
+
+    def _blitspan(self, x, y, span, op=rop_copy):
+        if op is rop_copy:
+            self._setspan(x, y, span)
+            return
+        bulk = _BULK_ROPS.get(op)
+        if bulk is None:
+            self._setspan(x, y, _rop_span(op, self._span(x, y, len(span)),
+                                          span))
+            return
+        length = len(span)
+        bit = y & 7
+        start = (y >> 3) * self._width + x
+        end = start + length
+        ones = _repeat_byte(1 << bit, length)
+        dst = _span_to_int(self.pages[start:end])
+        src = _span_to_int(span.translate(_PACK_BIT[bit]))
+        result = (dst & ~ones) | (bulk(dst, src, ones) & ones)
+        self.pages[start:end] = _int_to_span(result, length)
+
+    def _setspan(self, x, y, span):
+        """Overwrite the pixels of row `y` starting at column `x`
+        with `span`.
+        """
+        start = (y >> 3) * self._width + x
+        end = start + len(span)
+        bit = y & 7
+        self.pages[start:end] = _int_to_span(
+            _span_to_int(self.pages[start:end].translate(
+                _CLEAR_BITS[1 << bit])) |
+            _span_to_int(span.translate(_PACK_BIT[bit])), len(span))
+
+    def _page_bytes(self, page, x, length):
+        if not 0 <= page < self.numpages:
+            return b'\x00' * length
+        start = page * self._width + x
+        return self.pages[start:start + length]
+
+    def _page_span(self, x, y, length):
+        # Rows y...y+7 usually straddle two pages. Shift both of them
+        # into place and combine them.
+        page, shift = y >> 3, y & 7
+        value = _span_to_int(self._page_bytes(page, x, length).translate(
+            _SHIFT_RIGHT[shift]))
+        if shift:
+            value |= _span_to_int(self._page_bytes(page + 1, x, length)
+                                  .translate(_SHIFT_LEFT[8 - shift]))
+        return value
+
+    def bitblt_fast(self, src, x, y):
+        self.bitblt(src, x, y)
+
+    def bitblt(self, src, x=0, y=0, op=rop_copy):
+        cliprect = self.rect.clipped(Rect(x, y, src.width, src.height))
+        srcx = cliprect.x - x
+        length = cliprect.width
+        if not length:
+            return
+        self._touch(cliprect.x, cliprect.y, length, cliprect.height)
+
+        bulk = _BULK_ROPS.get(op)
+        if bulk is None:
+            # Unknown raster operations are applied row by row.
+            for dsty in xrange(cliprect.y, cliprect.ry):
+                self._setspan(cliprect.x, dsty, _rop_span(
+                    op, self._span(cliprect.x, dsty, length),
+                    src._span(srcx, dsty - y, length)))
+            return
+
+        # Otherwise combine a whole page (8 rows) at a time. `ones` masks
+        # the rows of each page that lie within `cliprect`.
+        for page in xrange(cliprect.y >> 3, (cliprect.ry + 7) >> 3):
+            top = max(cliprect.y - page * 8, 0)
+            bottom = min(cliprect.ry - page * 8, 8)
+            ones = _repeat_byte(((1 << bottom) - 1) & ~((1 << top) - 1),
+                                length)
+            start = page * self._width + cliprect.x
+            end = start + length
+            dst = _span_to_int(self.pages[start:end])
+            srcbits = src._page_span(srcx, page * 8 - y, length) & ones
+            result = (dst & ~ones) | (bulk(dst, srcbits, ones) & ones)
+            self.pages[start:end] = _int_to_span(result, length)
+
+    def loadimage(self, filename, dither=False):
+        src = Surface(filename=filename, dither=dither)
+        self._width, self._height = src.width, src.height
+        self.pages = bytearray(self._width * self.numpages)
+        self._pack(src.pixels)
+        self._touch(0, 0, self._width, self._height)
+
+    def dither(self):
+        """Packed surfaces only hold black and white pixels, so there is
+        nothing left to dither. Pass `dither=True` when loading an image
+        to dither it before it is packed.
+        """
+        raise TypeError('PackedSurface can only be dithered while loading '
+                        'an image')
+
+    def apply(self, func):
+        self._touch(0, 0, self._width, self._height)
+        self._pack(bytearray(func(px) for px in self.pixels))
+
+    def copy(self):
+        return self.__class__(width=self.width,
+                              height=self.height,
+                              pages=self.pages)
+
+
+class SurfaceView(Surface):
+    """A rectangular area of another surface that can be drawn into like
+    a surface of its own.
+
+    The view shares the pixels of its parent, so creating one is cheap.
+    Drawing operations are translated by the view's offset and clipped
+    to its area, which in turn is clipped to the parent's area. Views of
+    views refer straight to the underlying surface.
+
+    A view may hang off the edges of its parent. Its coordinates still
+    start at its own top-left corner, and `clip` holds the part of it
+    that lies within the parent. Pixels outside of `clip` read as 0 and
+    aren't drawn to.
+    """
+    def __init__(self, parent, x, y, width, height):
+        bounds = parent.rect
+        if isinstance(parent, SurfaceView):
+            bounds = Rect(parent.x + parent.clip.x, parent.y + parent.clip.y,
+                          parent.clip.width, parent.clip.height)
+            x += parent.x
+            y += parent.y
+            parent = parent.parent
+        area = bounds.clipped(Rect(x, y, width, height))
+        self.parent = parent
+        self.x = x
+        self.y = y
+        self._width = width
+        self._height = height
+        self.clip = Rect(area.x - x, area.y - y, area.width, area.height)
+        self.damage = None
+
+    def __len__(self):
+        return self._width * self._height
+
+    def __getitem__(self, key):
+        return self.getpixel(key % self._width, key // self._width)
+
+    @property
+    def pixels(self):
+        """Return a copy of the view's pixels, one byte per pixel."""
+        pixels = bytearray()
+        for y in xrange(self._height):
+            pixels += self._span(0, y, self._width)
+        return pixels
+
+    def _clipped_span(self, x, y, length):
+        """Return the columns `left` and `right` that the span of
+        `length` pixels at (x, y) covers within `clip`. `left` equals
+        `right` if the span lies outside of it.
+        """
+        clip = self.clip
+        if not clip.y <= y < clip.ry:
+            return x, x
+        left = max(x, clip.x)
+        return left, max(left, min(x + length, clip.rx))
+
+    def fill(self, color=1):
+        self.fillrect(0, 0, self._width, self._height, color)
+
+    def getpixel(self, x, y):
+        clip = self.clip
+        if clip.x <= x < clip.rx and clip.y <= y < clip.ry:
+            return self.parent.getpixel(self.x + x, self.y + y)
+        return 0
+
+    def setpixel(self, x, y, color=1):
+        clip = self.clip
+        if clip.x <= x < clip.rx and clip.y <= y < clip.ry:
+            self.parent.setpixel(self.x + x, self.y + y, color)
+
+    def vline(self, x, color=1):
+        self.fillrect(x, 0, 1, self._height, color)
+
+    def hline(self, y, color=1):
+        self.fillrect(0, y, self._width, 1, color)
+
+    def fillrect(self, x, y, w, h, color=1):
+        rect = self.clip.clipped(Rect(x, y, w, h))
+        if rect.width and rect.height:
+            self.parent.fillrect(self.x + rect.x, self.y + rect.y,
+                                 rect.width, rect.height, color)
+
+    def _touch(self, x, y, w, h):
+        rect = self.clip.clipped(Rect(x, y, w, h))
+        if rect.width and rect.height:
+            self.parent._touch(self.x + rect.x, self.y + rect.y,
+                               rect.width, rect.height)
+
+    def _span(self, x, y, length):
+        left, right = self._clipped_span(x, y, length)
+        if left == right:
+            return bytearray(length)
+        span = self.parent._span(self.x + left, self.y + y, right - left)
+        if right - left == length:
+            return span
+        return bytearray(left - x) + span + bytearray(x + length - right)
+
+    def _fillspan(self, x, y, length, color=1, op=rop_copy):
+        left, right = self._clipped_span(x, y, length)
+        if left < right:
+            self.parent._fillspan(self.x + left, self.y + y, right - left,
+                                  color, op)
+
+    def _blitspan(self, x, y, span, op=rop_copy):
+        left, right = self._clipped_span(x, y, len(span))
+        if left < right:
+            self.parent._blitspan(self.x + left, self.y + y,
+                                  span[left - x:right - x], op)
+
+    def _page_span(self, x, y, length):
+        clip = self.clip
+        left = max(x, clip.x)
+        right = min(x + length, clip.rx)
+        if left >= right:
+            return 0
+        value = self.parent._page_span(self.x + left, self.y + y,
+                                       right - left)
+        # Mask out the rows outside of `clip`.
+        rows = 0
+        for bit in xrange(8):
+            if clip.y <= y + bit < clip.ry:
+                rows |= 1 << bit
+        if rows != 0xff:
+            value &= _repeat_byte(rows, right - left)
+        return value << 8 * (x + length - right)
+
+    def bitblt_fast(self, src, x, y):
+        self.bitblt(src, x, y)
+
+    def bitblt(self, src, x=0, y=0, op=rop_copy):
+        cliprect = self.clip.clipped(Rect(x, y, src.width, src.height))
+        if not cliprect.width or not cliprect.height:
+            return
+        if (cliprect.width, cliprect.height) != (src.width, src.height):
+            src = SurfaceView(src, cliprect.x - x, cliprect.y - y,
+                              cliprect.width, cliprect.height)
+        self.parent.bitblt(src, self.x + cliprect.x, self.y + cliprect.y, op)
+
+    def dither(self):
+        surface = self.copy()
+        surface.dither()
+        self.bitblt(surface, 0, 0)
+
+    def apply(self, func):
+        surface = self.copy()
+        surface.apply(func)
+        self.bitblt(surface, 0, 0)
+
+    def copy(self):
+        return Surface(self._width, self._height, pixels=self.pixels)
+
+
+class Sprite(object):
+    """An image that is drawn only where its mask is set.
+
+    The opaque pixels are found once, when the sprite is created, and
+    stored as runs of pixels for every row. Drawing a sprite copies
+    those runs and never looks at its transparent pixels.
+    """
+    def __init__(self, image, mask=None):
+        """Create a sprite from the surface `image`. Pixels are opaque
+        where the surface `mask` of the same size is non-zero. Without a
+        mask, every non-zero pixel of `image` is opaque.
+        """
+        if mask is None:
+            mask = image
+        self.width = image.width
+        self.height = image.height
+        # rows[y] holds the (x, pixels) runs of row y.
+        self.rows = []
+        left, top, right, bottom = self.width, self.height, 0, 0
+        for y in xrange(self.height):
+            row = []
+            for match in _OPAQUE_RUN.finditer(
+                    bytes(mask._span(0, y, self.width))):
+                x, rx = match.span()
+                row.append((x, bytes(image._span(x, y, rx - x))))
+                left, right = min(left, x), max(right, rx)
+                top, bottom = min(top, y), max(bottom, y + 1)
+            self.rows.append(row)
+        self.bounds = Rect(left, top, max(right - left, 0),
+                           max(bottom - top, 0))
+
+    def _draw(self, surface, x, y, op):
+        """Draw the sprite with its top-left corner at (x, y) without
+        updating the damage region of `surface`. Return the area that
+        was drawn to.
+        """
+        area = surface.rect.clipped(Rect(x + self.bounds.x,
+                                         y + self.bounds.y,
+                                         self.bounds.width,
+                                         self.bounds.height))
+        if not area.width or not area.height:
+            return None
+        blitspan = surface._blitspan
+        if area.x == x + self.bounds.x and area.rx == x + self.bounds.rx:
+            # No runs need to be clipped.
+            for sy in xrange(area.y - y, area.ry - y):
+                for rx, span in self.rows[sy]:
+                    blitspan(x + rx, y + sy, span, op)
+            return area
+        for sy in xrange(area.y - y, area.ry - y):
+            for rx, span in self.rows[sy]:
+                start = max(x + rx, area.x)
+                end = min(x + rx + len(span), area.rx)
+                if start < end:
+                    blitspan(start, y + sy,
+                             span[start - x - rx:end - x - rx], op)
+        return area
+
+    def draw(self, surface, x, y, op=rop_copy):
+        """Draw the sprite into `surface` with its top-left corner at
+        (x, y).
+        """
+        area = self._draw(surface, x, y, op)
+        if area:
+            surface._touch(area.x, area.y, area.width, area.height)
+
+
+class RLEImage(object):
+    """A black and white image stored as runs of set pixels.
+
+    Every row is a list of (x, length) runs. The pixels between the runs
+    are transparent and take no memory at all, which suits sparse images
+    like sprites and text. Drawing an RLEImage fills its runs and skips
+    everything else. RLEImages can be added to a SpriteBatch.
+    """
+    def __init__(self, width, height, rows):
+        self.width = width
+        self.height = height
+        self.rows = rows
+        left, top, right, bottom = width, height, 0, 0
+        for y, runs in enumerate(rows):
+            if runs:
+                left = min(left, runs[0][0])
+                right = max(right, runs[-1][0] + runs[-1][1])
+                top, bottom = min(top, y), y + 1
+        self.bounds = Rect(left, top, max(right - left, 0),
+                           max(bottom - top, 0))
+
+    @staticmethod
+    def from_surface(surface):
+        """Return an RLEImage of the non-zero pixels of `surface`."""
+        rows = []
+        for y in xrange(surface.height):
+            rows.append([(start, end - start) for start, end in
+                         (match.span() for match in _OPAQUE_RUN.finditer(
+                             bytes(surface._span(0, y, surface.width))))])
+        return RLEImage(surface.width, surface.height, rows)
+
+    def __len__(self):
+        return self.width * self.height
+
+    @property
+    def pixels(self):
+        """Return the pixels unpacked into a bytearray."""
+        pixels = bytearray()
+        for y in xrange(self.height):
+            pixels += self._span(0, y, self.width)
+        return pixels
+
+    def _page_span(self, x, y, length):
+        return _pack_page_span(self._span, self.height, x, y, length)
+
+    def _span(self, x, y, length):
+        span = bytearray(length)
+        for start, runlength in self.rows[y]:
+            start, end = max(start - x, 0), min(start + runlength - x, length)
+            if start < end:
+                span[start:end] = b'\x01' * (end - start)
+        return span
+
+    def _draw(self, surface, x, y, op):
+        """Draw the image with its top-left corner at (x, y) without
+        updating the damage region of `surface`. Return the area that
+        was drawn to.
+        """
+        area = surface.rect.clipped(Rect(x + self.bounds.x,
+                                         y + self.bounds.y,
+                                         self.bounds.width,
+                                         self.bounds.height))
+        if not area.width or not area.height:
+            return None
+        fillspan = surface._fillspan
+        left, right = area.x, area.rx
+        for sy in xrange(area.y - y, area.ry - y):
+            for start, length in self.rows[sy]:
+                start += x
+                end = start + length
+                if start < left:
+                    start = left
+                if end > right:
+                    end = right
+                if start < end:
+                    fillspan(start, y + sy, end - start, 1, op)
+        return area
+
+    def draw(self, surface, x, y, op=rop_copy):
+        """Draw the set pixels of the image into `surface` with its
+        top-left corner at (x, y).
+        """
+        area = self._draw(surface, x, y, op)
+        if area:
+            surface._touch(area.x, area.y, area.width, area.height)
+
+
+class SpriteBatch(object):
+    """A list of sprites and their positions that are drawn together.
+    Sprites and RLEImages can be mixed.
+
+    The batch is drawn in the order in which the sprites were added and
+    reports a single damaged area for all of them.
+    """
+    def __init__(self):
+        self.items = []
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, sprite, x, y):
+        self.items.append((sprite, x, y))
+
+    def clear(self):
+        del self.items[:]
+
+    def draw(self, surface, op=rop_copy):
+        damage = None
+        for sprite, x, y in self.items:
+            area = sprite._draw(surface, x, y, op)
+            if area:
+                damage = area if damage is None else damage.union(area)
+        if damage:
+            surface._touch(damage.x, damage.y, damage.width, damage.height)
+
+
+SURFACE_FORMATS = {
+    'bytes': Surface,
+    'packed': PackedSurface,
+}
+
+
+def surface_class(name):
+    """Return the Surface implementation for the pixel format `name`.
+
+    "numpy" selects the NumPy based implementation in piradio.npgraphics.
+    "auto" does the same if NumPy is installed and falls back to "bytes"
+    otherwise.
+    """
+    if name in ('numpy', 'auto'):
+        try:
+            import piradio.npgraphics as npgraphics
+            return npgraphics.NumpySurface
+        except ImportError:
+            if name == 'numpy':
+                raise
+            name = 'bytes'
+    if name not in SURFACE_FORMATS:
+        raise KeyError('Unknown surface format %s' % name)
+    return SURFACE_FORMATS[name]
+
 if __name__ == '__main__':
     s = Surface(32, 32)
     print(s)
@@ -0,0 +1,121 @@
+"""Multi-line text layout.
+
+wrap_lines() breaks text into lines that fit a width in pixels, cutting
+words that are too long for a line of their own. With `maxlines`, text
+that doesn't fit is cut short and ends with an ellipsis. Layouts are
+cached per font, text, width and line limit, so that repainting the
+same text doesn't measure it again. draw() draws laid out text left,
+right or center aligned.
+"""
+import piradio.commons as commons
+import piradio.graphics as graphics
+
+LEFT = 'left'
+CENTER = 'center'
+RIGHT = 'right'
+
+ELLIPSIS = u'...'
+
+# How many layouts are cached.
+CACHE_SIZE = 128
+
+_cache = commons.LRUCache(CACHE_SIZE)
+
+
+def _fits(font, text, width):
+    return font.text_dimensions(text)[0] <= width
+
+
+def _longest_prefix(font, text, width, suffix=u''):
+    """Return the length of the longest prefix of `text` that fits into
+    `width` pixels with `suffix` appended to it.
+    """
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if _fits(font, text[:middle] + suffix, width):
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def wrap(font, text, width):
+    """Return `text` broken into lines of at most `width` pixels.
+
+    Lines are broken between words. Words that don't fit into a line of
+    their own are broken between characters.
+    """
+    lines = []
+    line = None
+    for word in text.split():
+        if line is not None and _fits(font, line + u' ' + word, width):
+            line += u' ' + word
+            continue
+        if line is not None:
+            lines.append(line)
+        # Every line takes at least one character, even if that doesn't
+        # fit, so that this always ends.
+        while not _fits(font, word, width):
+            cut = max(1, _longest_prefix(font, word, width))
+            lines.append(word[:cut])
+            word = word[cut:]
+        line = word
+    if line:
+        lines.append(line)
+    return lines
+
+
+def ellipsize(font, text, width):
+    """Return `text` ending with ELLIPSIS, cut short as far as needed to
+    fit into `width` pixels. If not even ELLIPSIS fits, as much of it as
+    fits is returned.
+    """
+    if not _fits(font, ELLIPSIS, width):
+        return ELLIPSIS[:_longest_prefix(font, ELLIPSIS, width)]
+    cut = _longest_prefix(font, text, width, ELLIPSIS)
+    return text[:cut].rstrip() + ELLIPSIS
+
+
+def wrap_lines(font, text, width, maxlines=None):
+    """Return `text` wrapped to `width` pixels as a list of
+    (line, linewidth) tuples.
+
+    If the text takes more than `maxlines` lines, only the first
+    `maxlines` are returned and the last of them ends with ELLIPSIS.
+    A `maxlines` of zero or less gives no lines at all.
+    """
+    key = (font, text, width, maxlines)
+    lines = _cache.get(key)
+    if lines is None:
+        lines = wrap(font, text, width)
+        if maxlines is not None and maxlines <= 0:
+            lines = []
+        elif maxlines is not None and len(lines) > maxlines:
+            lines = lines[:maxlines]
+            lines[-1] = ellipsize(font, lines[-1], width)
+        lines = [(line, font.text_dimensions(line)[0]) for line in lines]
+        _cache.put(key, lines)
+    return lines
+
+
+def draw(surface, font, text, x, y, width, maxlines=None, align=LEFT,
+         lineheight=None, op=graphics.rop_copy):
+    """Draw `text` wrapped to `width` pixels into `surface`. The first
+    line starts at (x, y), the next ones follow every `lineheight`
+    pixels, which defaults to the font size plus 2. Return the number
+    of lines drawn.
+    """
+    if lineheight is None:
+        lineheight = font.size + 2
+    lines = wrap_lines(font, text, width, maxlines)
+    for line, linewidth in lines:
+        if align == CENTER:
+            linex = x + (width - linewidth) / 2
+        elif align == RIGHT:
+            linex = x + width - linewidth
+        else:
+            linex = x
+        surface.bitblt(font.render_cached(line), linex, y, op)
+        y += lineheight
+    return len(lines)
@@ -31,9 +31,16 @@ keymap = [
     pygame.K_RETURN,
 ]
 
+# Maps pixel values to the palette indices of LCD_COLOR_BG and
+# LCD_COLOR_FG.
+_PALETTE_INDEX = bytes(bytearray([0] + [1] * 255))
+
 lcd = None
 screen = None
-framebuffer = [0] * (LCD_WIDTH * LCD_HEIGHT)
+# The graphics.Surface that was drawn last.
+framebuffer = None
+# The key states that are visualized on the screen.
+shown_keys = None
 
 
 def init(debug=False):
@@ -51,28 +58,43 @@ def init(debug=False):
     pygame.display.flip()
 
 
-def update(pixels):
-    time.sleep(RENDER_DELAY)
-    for y in range(LCD_HEIGHT):
-        for x in range(LCD_WIDTH):
-            pixel_color = (LCD_COLOR_FG if pixels[y*LCD_WIDTH+x]
-                           else LCD_COLOR_BG)
-            lcd.set_at((x, y), pixel_color)
-    screen.fill(LCD_COLOR_BG,
-                pygame.Rect(40, 74, LCD_WIDTH + 4, LCD_HEIGHT + 4))
-    screen.blit(lcd, (42, 76))
-    pygame.display.flip()
+def update(pixels, damage=None):
+    """Draw the graphics.Surface `pixels` to the simulated LCD. If
+    `damage` is given, only the area within that Rect is redrawn.
+    """
     global framebuffer
     framebuffer = pixels
+    time.sleep(RENDER_DELAY)
+    if damage is None:
+        damage = pygame.Rect(0, 0, LCD_WIDTH, LCD_HEIGHT)
+    else:
+        damage = pygame.Rect(damage.x, damage.y, damage.width, damage.height)
+    # Upload the damaged pixels in one go as an 8 bit surface whose
+    # palette maps them to the LCD colors.
+    indices = bytes(pixels.subsurface(damage.x, damage.y, damage.width,
+                                      damage.height).pixels)
+    area = pygame.image.fromstring(indices.translate(_PALETTE_INDEX),
+                                   damage.size, 'P')
+    area.set_palette([LCD_COLOR_BG, LCD_COLOR_FG])
+    lcd.blit(area, damage.topleft)
+    if damage.size == (LCD_WIDTH, LCD_HEIGHT):
+        # Redraw the border as well, its color depends on the backlight.
+        border = pygame.Rect(40, 74, LCD_WIDTH + 4, LCD_HEIGHT + 4)
+        screen.fill(LCD_COLOR_BG, border)
+        screen.blit(lcd, (42, 76))
+        pygame.display.update(border)
+    else:
+        screen.blit(lcd, damage.move(42, 76), damage)
+        pygame.display.update(damage.move(42, 76))
 
 
 def readkeys():
     def draw_key(key, pos):
         """Visualize key presses with black circles."""
         if keys[key]:
-            pygame.draw.circle(screen, (0, 0, 0), pos, 12)
+            return pygame.draw.circle(screen, (0, 0, 0), pos, 12)
         else:
-            pygame.draw.circle(screen, (255, 255, 255), pos, 12)
+            return pygame.draw.circle(screen, (255, 255, 255), pos, 12)
 
     for _ in pygame.event.get():
         # Eat up any events in the queue.
@@ -83,22 +105,26 @@ def readkeys():
         if pressed_keys[k]:
             keys[i] = True
 
-    if VISUALIZE_KEYPRESSES:
-        draw_key(K_LEFT, (214, 107))
-        draw_key(K_RIGHT, (307, 107))
-        draw_key(K_UP, (260, 66))
-        draw_key(K_DOWN, (260, 151))
-        draw_key(K_CENTER, (260, 109))
-        update(framebuffer)
+    # Only the keys need to be redrawn, and only if they changed. The
+    # LCD area is redrawn by update().
+    global shown_keys
+    if VISUALIZE_KEYPRESSES and keys != shown_keys:
+        shown_keys = keys
+        pygame.display.update([draw_key(K_LEFT, (214, 107)),
+                               draw_key(K_RIGHT, (307, 107)),
+                               draw_key(K_UP, (260, 66)),
+                               draw_key(K_DOWN, (260, 151)),
+                               draw_key(K_CENTER, (260, 109))])
 
     return keys
 
 
 def set_contrast(c):
     logging.debug('Setting contrast to %.2f', c)
-    LCD_COLOR_FG[0] = 127 - 158 * c
-    LCD_COLOR_FG[1] = 127 - 158 * c
-    LCD_COLOR_FG[2] = 127 - 158 * c
+    global LCD_COLOR_FG
+    LCD_COLOR_FG = (int(max(0, 127 - 158 * c)),) * 3
+    if framebuffer is not None:
+        update(framebuffer)
 
 
 def set_backlight_enabled(enabled):
@@ -108,12 +134,13 @@ def set_backlight_enabled(enabled):
         LCD_COLOR_BG = (148, 175, 204)
     else:
         LCD_COLOR_BG = (80, 120, 80)
-    update(framebuffer)
+    if framebuffer is not None:
+        update(framebuffer)
 
 
 if __name__ == '__main__':
-    import time
+    import piradio.graphics as graphics
     init()
-    update([0] * LCD_WIDTH * LCD_HEIGHT)
+    update(graphics.Surface(LCD_WIDTH, LCD_HEIGHT))
     while not True in readkeys():
         time.sleep(0.01)
@@ -0,0 +1,91 @@
+"""An LCD driver that keeps the frames in memory instead of showing them.
+
+Used for benchmarks and tests on machines without a display or the LCD
+board. The most recent frames are kept along with the time they were
+pushed at, and key presses can be scripted with press().
+"""
+import collections
+import hashlib
+import time
+import piradio.graphics as graphics
+
+LCD_WIDTH, LCD_HEIGHT = 128, 64
+NUM_PAGES = LCD_HEIGHT // 8
+
+K_LEFT = 0
+K_RIGHT = 1
+K_UP = 2
+K_DOWN = 3
+K_CENTER = 4
+
+# How many frames are kept. Older frames are dropped.
+MAX_FRAMES = 256
+
+# `pixels` holds the frame in the layout of Surface.page_columns().
+Frame = collections.namedtuple('Frame', 'time damage pixels')
+
+frames = collections.deque(maxlen=MAX_FRAMES)
+# The number of frames pushed since init(), including dropped ones.
+frame_count = 0
+backlight_enabled = False
+contrast = None
+
+# The key states that readkeys() returns next, one per call.
+_keystates = collections.deque()
+
+
+def init(debug=False):
+    global frame_count
+    frames.clear()
+    frame_count = 0
+    _keystates.clear()
+
+
+def press(*keys):
+    """Hold down `keys` for the next call to readkeys() and release them
+    on the one after.
+    """
+    _keystates.append([key in keys for key in xrange(5)])
+    _keystates.append([False] * 5)
+
+
+def readkeys():
+    if _keystates:
+        return _keystates.popleft()
+    return [False] * 5
+
+
+def update(pixels, damage=None):
+    global frame_count
+    if damage is None:
+        damage = pixels.rect
+    frames.append(Frame(time.time(), damage,
+                        bytes(pixels.page_columns(0, LCD_WIDTH))))
+    frame_count += 1
+
+
+def frame_hash(index=-1):
+    """Return the SHA-1 hex digest of the pixels of a recorded frame.
+    Equal frames have equal hashes.
+    """
+    return hashlib.sha1(frames[index].pixels).hexdigest()
+
+
+def frame_surface(index=-1):
+    """Return a recorded frame as a graphics.PackedSurface."""
+    columns = frames[index].pixels
+    pages = bytearray(len(columns))
+    for page in xrange(NUM_PAGES):
+        pages[page * LCD_WIDTH:(page + 1) * LCD_WIDTH] = columns[
+            page::NUM_PAGES]
+    return graphics.PackedSurface(LCD_WIDTH, LCD_HEIGHT, pages=pages)
+
+
+def set_contrast(c):
+    global contrast
+    contrast = c
+
+
+def set_backlight_enabled(enabled):
+    global backlight_enabled
+    backlight_enabled = enabled
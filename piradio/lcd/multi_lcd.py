@@ -2,6 +2,7 @@
 in parallel, e.g. raspi_lcd + web_lcd."""
 import importlib
 import logging
+import piradio.graphics as graphics
 
 logging.basicConfig(level=logging.DEBUG)
 
@@ -15,6 +16,13 @@ DRIVERS = [
 _DRIVERS = []
 
 LCD_WIDTH, LCD_HEIGHT = 128, 64
+NUM_PAGES = LCD_HEIGHT // 8
+
+# The surface that was pushed to the drivers last. Only its damaged
+# region needs to be compared on the next update.
+_last_surface = None
+# What the drivers show, in the layout of Surface.page_columns().
+_last_frame = None
 
 K_LEFT = 0
 K_RIGHT = 1
@@ -23,12 +31,15 @@ K_DOWN = 3
 K_CENTER = 4
 
 
-def init(debug=True):
-    for drv in DRIVERS:
+def init(debug=True, drivers=None):
+    """Load and initialize the `drivers`, a list of module names that
+    defaults to DRIVERS.
+    """
+    for drv in drivers or DRIVERS:
         try:
             _DRIVERS.append(importlib.import_module(drv))
             logging.info('Loaded LCD driver %s', drv)
-        except OSError:
+        except (OSError, ImportError):
             logging.warning('Failed to load LCD driver %s', drv)
     for drv in _DRIVERS:
         drv.init(debug)
@@ -42,9 +53,51 @@ def readkeys():
     return keys
 
 
+def _changed_rect(old, new, x):
+    """Return the Rect of the pages that differ between the
+    page_columns() `old` and `new`, which start at column `x`. Return
+    None if they are the same.
+    """
+    if old == new:
+        return None
+    pages = [page for page in xrange(NUM_PAGES)
+             if old[page::NUM_PAGES] != new[page::NUM_PAGES]]
+    columns = [column for column in xrange(len(new) // NUM_PAGES)
+               if old[column * NUM_PAGES:(column + 1) * NUM_PAGES] !=
+               new[column * NUM_PAGES:(column + 1) * NUM_PAGES]]
+    return graphics.Rect(x + columns[0], pages[0] * 8,
+                         columns[-1] - columns[0] + 1,
+                         (pages[-1] - pages[0] + 1) * 8)
+
+
 def update(pixels):
+    """Push the graphics.Surface `pixels` to all drivers.
+
+    The drivers only receive the pages that differ from the last frame
+    pushed. If the same surface was pushed last time, only the region
+    that was drawn to in the meantime is compared (see
+    Surface.flush_damage()). A different surface is compared in full.
+    Frames that don't change anything aren't pushed at all.
+    """
+    global _last_surface, _last_frame
+    damage = pixels.flush_damage()
+    if pixels is not _last_surface or _last_frame is None:
+        _last_surface = pixels
+        damage = pixels.rect
+    elif damage is None:
+        return
+    start, end = damage.x * NUM_PAGES, damage.rx * NUM_PAGES
+    frame = pixels.page_columns(damage.x, damage.width)
+    if _last_frame is None:
+        _last_frame = bytearray(len(frame))
+        changed = damage
+    else:
+        changed = _changed_rect(_last_frame[start:end], frame, damage.x)
+    _last_frame[start:end] = frame
+    if changed is None:
+        return
     for drv in _DRIVERS:
-        drv.update(pixels)
+        drv.update(pixels, changed)
 
 
 def set_contrast(c):
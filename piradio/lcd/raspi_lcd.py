@@ -25,6 +25,13 @@ KEY_DOWN = 0x10
 
 raspilcd = ctypes.cdll.LoadLibrary("./libraspilcd.so")
 buttons = ctypes.c_uint8.in_dll(raspilcd, "Button")
+# The library's framebuffer: uint8 framebuffer[LCD_WIDTH][LCD_HEIGHT/8],
+# one byte per page for every column, see Surface.page_columns().
+NUM_PAGES = LCD_HEIGHT // 8
+framebuffer = (ctypes.c_uint8 * NUM_PAGES * LCD_WIDTH).in_dll(raspilcd,
+                                                              "framebuffer")
+# Older builds of the library can only transfer the whole framebuffer.
+_write_area = getattr(raspilcd, 'LCD_WriteFramebufferArea', None)
 _KEYS = [KEY_LEFT, KEY_RIGHT, KEY_UP, KEY_DOWN, KEY_CENTER]
 
 
@@ -49,16 +56,23 @@ def _keydown(key):
     return bool(buttons.value & key)
 
 
-def update(pixels):
-    raspilcd.LCD_ClearScreen()
-    px = pixels.pixels
-    row_idx = 0
-    for y in xrange(LCD_HEIGHT):
-        for x in xrange(LCD_WIDTH):
-            if px[row_idx + x]:
-                raspilcd.LCD_PutPixel(x, y)
-        row_idx += LCD_WIDTH
-    raspilcd.LCD_WriteFramebuffer()
+def update(pixels, damage=None):
+    """Draw `pixels` to the LCD. If `damage` is given, only the pages
+    and columns within that Rect are transferred.
+    """
+    if damage is None:
+        damage = pixels.rect
+    # Copy all pages of the damaged columns straight into the library's
+    # framebuffer, which keeps them next to each other. Pages outside of
+    # the damaged area hold what's already on the LCD.
+    columns = bytes(pixels.page_columns(damage.x, damage.width))
+    ctypes.memmove(ctypes.addressof(framebuffer) + damage.x * NUM_PAGES,
+                   columns, len(columns))
+    if _write_area:
+        _write_area(damage.x, damage.rx - 1, damage.y >> 3,
+                    (damage.ry - 1) >> 3)
+    else:
+        raspilcd.LCD_WriteFramebuffer()
 
 
 def set_contrast(c):
@@ -73,14 +87,18 @@ def set_backlight_enabled(enabled):
     raspilcd.SetBacklight(enabled)
 
 if __name__ == '__main__':
+    import piradio.graphics as graphics
+    screen = graphics.Surface(LCD_WIDTH, LCD_HEIGHT)
     init()
     set_contrast(0.6)
     set_backlight_enabled(True)
     t = 1.0
     while not True in readkeys():
-        update([0] * (LCD_WIDTH * LCD_HEIGHT))
+        screen.fill(0)
+        update(screen)
         set_backlight_enabled(False)
         time.sleep(t)
-        update([1] * (LCD_WIDTH * LCD_HEIGHT))
+        screen.fill(1)
+        update(screen)
         set_backlight_enabled(True)
         time.sleep(t)
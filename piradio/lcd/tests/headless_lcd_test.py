@@ -0,0 +1,52 @@
+import mock
+import piradio.graphics as graphics
+import piradio.lcd.headless_lcd as headless_lcd
+import piradio.lcd.multi_lcd as multi_lcd
+
+
+def test_frames():
+    headless_lcd.init()
+    surf = graphics.Surface(128, 64)
+    for i in xrange(headless_lcd.MAX_FRAMES + 10):
+        surf.setpixel(i % 128, i % 64)
+        headless_lcd.update(surf)
+    assert headless_lcd.frame_count == headless_lcd.MAX_FRAMES + 10
+    assert len(headless_lcd.frames) == headless_lcd.MAX_FRAMES
+    assert headless_lcd.frame_surface().pixels == surf.pixels
+    assert headless_lcd.frames[0].time <= headless_lcd.frames[-1].time
+
+    packed = graphics.PackedSurface(128, 64, pixels=surf.pixels)
+    headless_lcd.update(packed)
+    assert headless_lcd.frame_hash() == headless_lcd.frame_hash(-2)
+    packed.setpixel(0, 0, 0)
+    headless_lcd.update(packed)
+    assert headless_lcd.frame_hash() != headless_lcd.frame_hash(-2)
+
+    headless_lcd.init()
+    assert headless_lcd.frame_count == 0
+    assert not headless_lcd.frames
+
+
+def test_scripted_keys():
+    headless_lcd.init()
+    headless_lcd.press(headless_lcd.K_UP)
+    headless_lcd.press(headless_lcd.K_LEFT, headless_lcd.K_CENTER)
+    assert headless_lcd.readkeys() == [False, False, True, False, False]
+    assert headless_lcd.readkeys() == [False] * 5
+    assert headless_lcd.readkeys() == [True, False, False, False, True]
+    assert headless_lcd.readkeys() == [False] * 5
+    assert headless_lcd.readkeys() == [False] * 5
+
+
+def test_multi_lcd_driver_selection():
+    with mock.patch.multiple(multi_lcd, _DRIVERS=[], _last_surface=None,
+                             _last_frame=None):
+        multi_lcd.init(drivers=['piradio.lcd.headless_lcd',
+                                'piradio.lcd.no_such_driver'])
+        assert multi_lcd._DRIVERS == [headless_lcd]
+        surf = graphics.Surface(128, 64)
+        multi_lcd.update(surf)
+        multi_lcd.update(surf)
+        assert headless_lcd.frame_count == 1
+        headless_lcd.press(headless_lcd.K_DOWN)
+        assert multi_lcd.readkeys()[headless_lcd.K_DOWN]
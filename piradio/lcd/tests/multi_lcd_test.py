@@ -0,0 +1,69 @@
+import mock
+import piradio.graphics as graphics
+import piradio.lcd.multi_lcd as multi_lcd
+
+
+def patch_drivers(drivers):
+    return mock.patch.multiple(multi_lcd, _DRIVERS=drivers,
+                               _last_surface=None, _last_frame=None)
+
+
+def pushed_rect(drv):
+    damage = drv.update.call_args[0][1]
+    return (damage.x, damage.y, damage.width, damage.height)
+
+
+def test_update_sends_damaged_region():
+    drv = mock.Mock()
+    with patch_drivers([drv]):
+        surf = graphics.Surface(128, 64)
+        multi_lcd.update(surf)
+        assert pushed_rect(drv) == (0, 0, 128, 64)
+
+        drv.reset_mock()
+        multi_lcd.update(surf)
+        assert not drv.update.called
+
+        # Changes are sent as whole pages.
+        surf.fillrect(3, 4, 5, 6)
+        multi_lcd.update(surf)
+        assert pushed_rect(drv) == (3, 0, 5, 16)
+
+
+def test_update_sends_changed_pages():
+    drv = mock.Mock()
+    with patch_drivers([drv]):
+        surf = graphics.Surface(128, 64)
+        multi_lcd.update(surf)
+
+        # Drawing that doesn't change any pixels isn't pushed.
+        drv.reset_mock()
+        surf.fillrect(0, 0, 128, 64, color=0)
+        multi_lcd.update(surf)
+        assert not drv.update.called
+
+        # Only the changed part of the damaged region is pushed.
+        surf.fillrect(10, 20, 30, 30, color=0)
+        surf.setpixel(15, 33)
+        multi_lcd.update(surf)
+        assert pushed_rect(drv) == (15, 32, 1, 8)
+
+
+def test_update_compares_other_surfaces():
+    drv = mock.Mock()
+    with patch_drivers([drv]):
+        surf = graphics.Surface(128, 64)
+        surf.fillrect(3, 4, 5, 6)
+        multi_lcd.update(surf)
+
+        # An identical frame from another surface isn't pushed.
+        drv.reset_mock()
+        other = graphics.PackedSurface(128, 64)
+        other.fillrect(3, 4, 5, 6)
+        multi_lcd.update(other)
+        assert not drv.update.called
+
+        other.setpixel(100, 60)
+        multi_lcd.update(surf)
+        multi_lcd.update(other)
+        assert pushed_rect(drv) == (100, 56, 1, 8)
@@ -1,3 +1,4 @@
+import collections
 import logging
 import threading
 import time
@@ -16,23 +17,69 @@ K_CENTER = 4
 
 _KEYS = [False] * 5
 _SCREEN = graphics.Surface(LCD_WIDTH, LCD_HEIGHT)
+_SCREEN_LOCK = threading.Lock()
+
+# How many frames clients can fall behind before they get the whole
+# screen again.
+MAX_DAMAGE_HISTORY = 64
+
+# The sequence number of the last frame in _SCREEN and the
+# (frame, damage) pairs of the most recent frames, oldest first.
+_FRAME = 0
+_DAMAGE_HISTORY = collections.deque(maxlen=MAX_DAMAGE_HISTORY)
 
 
 @bottle.get('/')
 def get_index():
     return """
-        <img src="/screen" width="128" height="64">
+        <canvas id="screen" width="128" height="64"></canvas>
         <a href="/keys/left">left</a>
         <a href="/keys/right">right</a>
         <a href="/keys/up">up</a>
         <a href="/keys/down">down</a>
         <a href="/keys/center">center</a>
+        <script>
+        var context = document.getElementById('screen').getContext('2d');
+        var frame = null;
+
+        function poll() {
+            var request = new XMLHttpRequest();
+            var url = '/screen/damage';
+            if (frame !== null) {
+                url += '?since=' + frame;
+            }
+            request.open('GET', url);
+            request.responseType = 'blob';
+            request.onload = function() {
+                if (request.status != 200) {
+                    setTimeout(poll, 100);
+                    return;
+                }
+                frame = request.getResponseHeader('X-Frame');
+                var rect = request.getResponseHeader('X-Damage-Rect')
+                                  .split(',');
+                var image = new Image();
+                image.onload = function() {
+                    context.drawImage(image, +rect[0], +rect[1]);
+                    URL.revokeObjectURL(image.src);
+                    setTimeout(poll, 100);
+                };
+                image.src = URL.createObjectURL(request.response);
+            };
+            request.onerror = function() {
+                setTimeout(poll, 1000);
+            };
+            request.send();
+        }
+        poll();
+        </script>
     """
 
 
 @bottle.get('/screen')
 def get_screen_image():
-    png_data = _SCREEN.as_png_image()
+    with _SCREEN_LOCK:
+        png_data = _SCREEN.as_png_image()
     headers = {
         'Content-Type': 'image/png',
         'Content-Length': len(png_data)
@@ -40,6 +87,55 @@ def get_screen_image():
     return bottle.HTTPResponse(png_data, **headers)
 
 
+def _damage_since(frame):
+    """Return the union of the damage of all frames after `frame`, or
+    None if there were none. Clients that passed no frame or fell too far
+    behind get the whole screen.
+    """
+    if frame == _FRAME:
+        return None
+    oldest = _DAMAGE_HISTORY[0][0] if _DAMAGE_HISTORY else _FRAME + 1
+    if frame is None or not oldest - 1 <= frame < _FRAME:
+        return _SCREEN.rect
+    damage = None
+    for damaged_frame, rect in _DAMAGE_HISTORY:
+        if damaged_frame > frame:
+            damage = rect if damage is None else damage.union(rect)
+    return damage
+
+
+@bottle.get('/screen/damage')
+def get_screen_damage():
+    """Return the part of the screen that changed since the frame passed
+    in the `since` query parameter as a PNG image, or the whole screen if
+    it is left out. Its position on the screen is passed in the
+    X-Damage-Rect header as "x,y,width,height" and the number of the
+    current frame, to be passed as `since` next time, in X-Frame.
+    Returns 204 (No Content) if nothing has changed.
+    """
+    try:
+        since = int(bottle.request.query.since)
+    except ValueError:
+        since = None
+    with _SCREEN_LOCK:
+        frame = _FRAME
+        damage = _damage_since(since)
+        if damage is None:
+            return bottle.HTTPResponse(status=204)
+        partial = graphics.Surface(damage.width, damage.height)
+        partial.bitblt(_SCREEN, -damage.x, -damage.y)
+    png_data = partial.as_png_image()
+    headers = {
+        'Content-Type': 'image/png',
+        'Content-Length': len(png_data),
+        'Cache-Control': 'no-cache',
+        'X-Frame': str(frame),
+        'X-Damage-Rect': '%i,%i,%i,%i' % (damage.x, damage.y,
+                                          damage.width, damage.height)
+    }
+    return bottle.HTTPResponse(png_data, **headers)
+
+
 @bottle.get('/keys/<key>')
 def get_keys(key):
     keymap = {
@@ -74,8 +170,15 @@ def readkeys():
     return keys
 
 
-def update(pixels):
-    _SCREEN.bitblt_fast(pixels, 0, 0)
+def update(pixels, damage=None):
+    global _FRAME
+    if damage is None:
+        damage = pixels.rect
+    area = pixels.subsurface(damage.x, damage.y, damage.width, damage.height)
+    with _SCREEN_LOCK:
+        _SCREEN.bitblt_fast(area, damage.x, damage.y)
+        _FRAME += 1
+        _DAMAGE_HISTORY.append((_FRAME, damage))
 
 
 def set_contrast(c):
@@ -0,0 +1,196 @@
+"""A graphics.Surface implementation that keeps its pixels in a NumPy
+array and draws with vectorized array operations.
+
+It renders exactly the same pixels as graphics.Surface. Select it with
+the "surface_format" config setting.
+"""
+import numpy
+import png
+import cStringIO as StringIO
+import piradio.dither as dithering
+import piradio.graphics as graphics
+from piradio.graphics import Rect
+
+# Vectorized versions of the raster operations in piradio.graphics.
+# `a` and `b` are boolean arrays that tell which pixels are on.
+_ARRAY_ROPS = {
+    graphics.rop_not: lambda a, b: ~b,
+    graphics.rop_and: lambda a, b: a & b,
+    graphics.rop_or: lambda a, b: a | b,
+    graphics.rop_xor: lambda a, b: a ^ b,
+    graphics.rop_black: lambda a, b: False,
+    graphics.rop_white: lambda a, b: True,
+}
+
+
+def as_array(surface):
+    """Return the pixels of `surface` as a 2D array indexed by [y, x].
+    The array shares memory with `surface` where possible.
+    """
+    if isinstance(surface, NumpySurface):
+        return surface.array
+    if isinstance(surface, graphics.SurfaceView):
+        clip = surface.clip
+        area = as_array(surface.parent)[
+            surface.y + clip.y:surface.y + clip.ry,
+            surface.x + clip.x:surface.x + clip.rx]
+        if (clip.width, clip.height) == (surface.width, surface.height):
+            return area
+        # The view hangs off the edges of its parent, which reads as 0.
+        array = numpy.zeros((surface.height, surface.width), numpy.uint8)
+        array[clip.y:clip.ry, clip.x:clip.rx] = area
+        return array
+    if type(surface) is graphics.Surface:
+        pixels = numpy.frombuffer(surface.pixels, numpy.uint8)
+    else:
+        pixels = numpy.frombuffer(bytes(surface.pixels), numpy.uint8)
+    return pixels.reshape(surface.height, surface.width)
+
+
+class NumpySurface(graphics.Surface):
+    def __init__(self, width=0, height=0, filename=None,
+                 pixels=None, dither=False, array=None):
+        self._width = width
+        self._height = height
+        self.damage = None
+        if filename:
+            self.loadimage(filename, dither)
+        elif array is not None:
+            self.array = numpy.array(array, numpy.uint8)
+            self._height, self._width = self.array.shape
+        elif pixels:
+            self.array = numpy.array(bytearray(pixels), numpy.uint8).reshape(
+                height, width)
+        else:
+            self.array = numpy.zeros((height, width), numpy.uint8)
+
+    def __len__(self):
+        return self.array.size
+
+    def __getitem__(self, key):
+        return self.array.flat[key]
+
+    @property
+    def pixels(self):
+        """Return a copy of the pixels as a bytearray.
+
+        Changing the copy doesn't change the surface, and the pixels
+        can't be replaced either. Draw with setpixel() and friends or
+        change `array` instead.
+        """
+        return bytearray(self.array.tostring())
+
+    @pixels.setter
+    def pixels(self, pixels):
+        raise AttributeError('The pixels of a NumpySurface are read-only')
+
+    def fill(self, color=1):
+        self._touch(0, 0, self._width, self._height)
+        self.array[...] = color
+
+    def getpixel(self, x, y):
+        return int(self.array[y, x])
+
+    def setpixel(self, x, y, color=1):
+        self._touch(x, y, 1, 1)
+        self.array[y, x] = color
+
+    def vline(self, x, color=1):
+        self.fillrect(x, 0, 1, self._height, color)
+
+    def hline(self, y, color=1):
+        self.fillrect(0, y, self._width, 1, color)
+
+    def fillrect(self, x, y, w, h, color=1):
+        rect = self.rect.clipped(Rect(x, y, w, h))
+        self._touch(rect.x, rect.y, rect.width, rect.height)
+        self.array[rect.y:rect.ry, rect.x:rect.rx] = color
+
+    def _span(self, x, y, length):
+        return bytearray(self.array[y, x:x + length].tostring())
+
+    def _fillspan(self, x, y, length, color=1, op=graphics.rop_copy):
+        row = self.array[y, x:x + length]
+        if op is graphics.rop_copy:
+            row[...] = color
+        elif op is graphics.rop_nop:
+            pass
+        elif op in _ARRAY_ROPS:
+            row[...] = _ARRAY_ROPS[op](row != 0, numpy.bool_(color))
+        else:
+            row[...] = numpy.frompyfunc(op, 2, 1)(row, color)
+
+    def _blitspan(self, x, y, span, op=graphics.rop_copy):
+        row = self.array[y, x:x + len(span)]
+        src = numpy.frombuffer(bytes(span), numpy.uint8)
+        if op is graphics.rop_copy:
+            row[...] = src
+        elif op is graphics.rop_nop:
+            pass
+        elif op in _ARRAY_ROPS:
+            row[...] = _ARRAY_ROPS[op](row != 0, src != 0)
+        else:
+            row[...] = numpy.frompyfunc(op, 2, 1)(row, src)
+
+    def bitblt_fast(self, src, x, y):
+        self.bitblt(src, x, y)
+
+    def bitblt(self, src, x=0, y=0, op=graphics.rop_copy):
+        cliprect = self.rect.clipped(Rect(x, y, src.width, src.height))
+        if not cliprect.width or not cliprect.height:
+            return
+        self._touch(cliprect.x, cliprect.y, cliprect.width, cliprect.height)
+        srcx, srcy = cliprect.x - x, cliprect.y - y
+        dst = self.array[cliprect.y:cliprect.ry, cliprect.x:cliprect.rx]
+        srcpixels = as_array(src)[srcy:srcy + cliprect.height,
+                                  srcx:srcx + cliprect.width]
+        if op is graphics.rop_copy:
+            dst[...] = srcpixels
+        elif op is graphics.rop_nop:
+            pass
+        elif op in _ARRAY_ROPS:
+            dst[...] = _ARRAY_ROPS[op](dst != 0, srcpixels != 0)
+        else:
+            dst[...] = numpy.frompyfunc(op, 2, 1)(dst, srcpixels)
+
+    def loadimage(self, filename, dither=False):
+        if dither:
+            self._width, self._height, pixels = dithering.dithered_image(
+                filename)
+        else:
+            reader = png.Reader(filename)
+            self._width, self._height, pixels, _ = reader.read_flat()
+            pixels = numpy.array(pixels, numpy.uint8)[::3]
+        self._touch(0, 0, self._width, self._height)
+        self.array = numpy.array(pixels, numpy.uint8).reshape(
+            self._height, self._width)
+
+    def as_png_image(self):
+        buf = StringIO.StringIO()
+        writer = png.Writer(self.width, self.height,
+                            greyscale=True, bitdepth=1)
+        writer.write_array(buf, (self.array == 0).ravel())
+        return buf.getvalue()
+
+    def dither(self):
+        """Atkinson-dither the surface in place.
+
+        This isn't vectorized. Every pixel depends on the errors of the
+        pixels before it, and array operations over the few independent
+        pixels per step are no faster than dithering.atkinson().
+        """
+        self._touch(0, 0, self._width, self._height)
+        pixels = self.pixels
+        dithering.atkinson(pixels, self._width, self._height)
+        self.array[...] = numpy.frombuffer(pixels, numpy.uint8).reshape(
+            self.array.shape)
+
+    def apply(self, func):
+        # Pixels are bytes, so `func` only has to be evaluated for each of
+        # the 256 possible values.
+        self._touch(0, 0, self._width, self._height)
+        table = numpy.array([func(i) for i in xrange(256)], numpy.uint8)
+        self.array[...] = table[self.array]
+
+    def copy(self):
+        return self.__class__(array=self.array)
@@ -1,9 +1,14 @@
 import time
 import random
 import piradio.fonts as fonts
+import piradio.layout as layout
+import piradio.lcd as lcd
 import piradio.ui as ui
 from . import base
 
+MAX_TITLE_LINES = 3
+TITLE_MARQUEE_Y = 27
+
 
 class RandomPodcastPanel(base.Panel):
     def __init__(self, podcast_service, audio_service, **config):
@@ -14,6 +19,12 @@ class RandomPodcastPanel(base.Panel):
         self.episode_url = None
         self.title = config['title']
         self.episode_title = 'Press (center) to play random episode'
+        # Titles that don't fit into MAX_TITLE_LINES lines scroll on a
+        # single one instead of being cut short.
+        self.title_marquee = ui.Marquee(self.font, lcd.LCD_WIDTH)
+        self.title_marquee.visible = False
+        # Repaint just the title when only the marquee moved.
+        self.title_only = False
         self.lastrefresh = 0
         self.audio_service = audio_service
         podcast_service.subscribe(feed_url, self.on_episodes_changed)
@@ -25,24 +36,41 @@ class RandomPodcastPanel(base.Panel):
         if not self.episodes:
             return
         self.episode_title, self.episode_url = random.choice(self.episodes)
+        self.title_marquee.visible = len(layout.wrap(
+            self.font, self.episode_title, lcd.LCD_WIDTH)) > MAX_TITLE_LINES
+        if self.title_marquee.visible:
+            self.title_marquee.set_text(self.episode_title)
 
     def update(self):
         if time.time() - self.lastrefresh > 10:
             self.lastrefresh = time.time()
             self.set_needs_repaint()
+        if self.title_marquee.update() and not self.needs_repaint:
+            self.needs_repaint = True
+            self.title_only = True
+
+    def set_needs_repaint(self):
+        super(RandomPodcastPanel, self).set_needs_repaint()
+        self.title_only = False
 
     def paint(self, surface):
+        if self.title_only:
+            self.title_only = False
+            surface.fillrect(0, TITLE_MARQUEE_Y, surface.width,
+                             self.title_marquee.height, color=0)
+            self.title_marquee.draw(surface, 0, TITLE_MARQUEE_Y)
+            return
+
         surface.fill(0)
         surface.center_text(self.font, self.title, y=2)
         surface.hline(11)
 
-        # Lame multi-line text rendering:
-        words = self.episode_title.split()
-        line1 = ' '.join(words[:len(words) / 2])
-        line2 = ' '.join(words[len(words) / 2:])
-
-        surface.center_text(self.font, line1, y=22)
-        surface.center_text(self.font, line2, y=32)
+        if self.title_marquee.visible:
+            self.title_marquee.draw(surface, 0, TITLE_MARQUEE_Y)
+        else:
+            # The marquee takes every title that needs more lines.
+            layout.draw(surface, self.font, self.episode_title, 0, 16,
+                        surface.width, align=layout.CENTER)
 
         ui.render_progressbar(surface, 0, 48, surface.width, 14,
                               self.audio_service.playback_progress)
@@ -1,8 +1,12 @@
 import piradio.fonts as fonts
 import piradio.graphics as graphics
+import piradio.lcd as lcd
 import piradio.ui as ui
 from . import base
 
+MAX_TRAINS = 4
+ROW_HEIGHT = 12
+
 
 class PublicTransportPanel(base.Panel):
     def __init__(self, public_transport_service, **config):
@@ -10,25 +14,74 @@ class PublicTransportPanel(base.Panel):
         self.station = config['station']
         self.font = fonts.get('tempesta', 8)
         self.upcoming_trains = []
+        # Destinations that don't fit scroll next to the line number.
+        # They start in the same column unless the label of their row is
+        # wider than usual.
+        self.destination_x = 4 + self.font.text_dimensions('99 U99 ')[0]
+        self.labels = []
+        self.destination_xs = []
+        self.marquees = [ui.Marquee(self.font,
+                                    lcd.LCD_WIDTH - self.destination_x)
+                         for _ in xrange(MAX_TRAINS)]
+        # Repaint just the destinations when only the marquees moved.
+        self.marquees_only = False
         self.svc = public_transport_service
         self.svc.subscribe(self.station, self.on_trains_changed)
 
     def on_trains_changed(self, trains):
-        self.upcoming_trains = trains
+        self.upcoming_trains = trains[:MAX_TRAINS]
+        self.labels = ['%s %s' % (str(train['minutes']).rjust(2, ' '),
+                                  train['line'].rjust(3, ' '))
+                       for train in self.upcoming_trains]
+        self.destination_xs = [
+            min(max(self.destination_x,
+                    4 + self.font.text_dimensions(label + ' ')[0]),
+                lcd.LCD_WIDTH)
+            for label in self.labels]
+        for i, train in enumerate(self.upcoming_trains):
+            width = lcd.LCD_WIDTH - self.destination_xs[i]
+            if self.marquees[i].width != width:
+                self.marquees[i] = ui.Marquee(self.font, width)
+            self.marquees[i].set_text(train['destination'])
+        for i, marquee in enumerate(self.marquees):
+            marquee.visible = i < len(self.upcoming_trains)
+
+    def update(self):
+        # Update every marquee, not just the ones up to the first that
+        # moved.
+        moved = any([marquee.update() for marquee in self.marquees])
+        if moved and not self.needs_repaint:
+            self.needs_repaint = True
+            self.marquees_only = True
+
+    def set_needs_repaint(self):
+        super(PublicTransportPanel, self).set_needs_repaint()
+        self.marquees_only = False
 
     def paint(self, surface):
-        def format_train(t):
-            return '%s %s %s' % (str(t['minutes']).rjust(2, ' '),
-                                 t['line'].rjust(3, ' '),
-                                 t['destination'][:16])
+        if self.marquees_only:
+            self.marquees_only = False
+            self.paint_marquees(surface)
+            return
+
         surface.fill(0)
         surface.fillrect(0, 0, surface.width, 10)
         surface.center_text(self.font, self.station, y=0, rop=graphics.rop_xor)
         surface.hline(11)
-        if self.upcoming_trains:
-            trains = map(format_train, self.upcoming_trains[:5])
-            ui.render_static_list(surface, 2, 14, self.font,
-                                  trains, minheight=12)
+        y = 14
+        for label, x, marquee in zip(self.labels, self.destination_xs,
+                                     self.marquees):
+            surface.text(self.font, 2, y + 2, label)
+            marquee.draw(surface, x, y + 2)
+            y += ROW_HEIGHT
+
+    def paint_marquees(self, surface):
+        y = 14
+        for x, marquee in zip(self.destination_xs, self.marquees):
+            surface.fillrect(x, y + 2, marquee.width, marquee.height,
+                             color=0)
+            marquee.draw(surface, x, y + 2)
+            y += ROW_HEIGHT
 
     def center_pressed(self):
         self.set_needs_repaint()
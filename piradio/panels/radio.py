@@ -1,11 +1,13 @@
 import logging
 import collections
 import piradio.fonts as fonts
+import piradio.lcd as lcd
 import piradio.ui as ui
 import piradio.commons as commons
 from . import base
 
 GLYPH_PLAYING = '0'
+STATION_X = 7
 
 
 class RadioPanel(base.Panel):
@@ -18,34 +20,61 @@ class RadioPanel(base.Panel):
         self.currstation = ''
         self.timeofday = clock_service.timeofday()
         self.audio_service = audio_service
+        # The station name scrolls between the 'playing' icon and the
+        # clock if it doesn't fit.
+        clock_width, _, _ = self.font.text_dimensions('00:00')
+        self.station_marquee = ui.Marquee(
+            self.font, lcd.LCD_WIDTH - STATION_X - clock_width - 4)
+        self.station_marquee.visible = False
+        # Clock ticks only require the status area to be repainted.
+        self.status_only = False
         clock_service.subscribe(clock_service.TIME_CHANGED_EVENT,
                                 self.on_time_changed)
 
     def on_time_changed(self, timeofday):
         self.timeofday = timeofday
-        self.set_needs_repaint()
+        if not self.needs_repaint:
+            self.needs_repaint = True
+            self.status_only = True
+
+    def set_needs_repaint(self):
+        super(RadioPanel, self).set_needs_repaint()
+        self.status_only = False
+
+    def update(self):
+        if self.station_marquee.update() and not self.needs_repaint:
+            self.needs_repaint = True
+            self.status_only = True
 
     def paint(self, surface):
+        if self.status_only:
+            self.status_only = False
+            surface.fillrect(0, 0, surface.width, 11, color=0)
+            self.paint_status(surface)
+            return
+
         # Clear the surface
         surface.fill(0)
+        self.paint_status(surface)
+
+        # Draw separator between the 'status area' and the station selector
+        surface.hline(11)
+
+        # Draw the station selector
+        ui.render_list(surface, 2, 14, self.font, self.stations.keys(),
+                       self.cy, minheight=12, maxvisible=4)
 
+    def paint_status(self, surface):
         # If necessary, draw the 'playing' icon and the
         # current station's name.
         if self.currstation:
             surface.text(self.glyph_font, -3, 0, GLYPH_PLAYING)
-            surface.text(self.font, 7, 2, self.currstation)
+            self.station_marquee.draw(surface, STATION_X, 2)
 
         # Draw the clock
         clock_width, _, _ = self.font.text_dimensions(self.timeofday)
         surface.text(self.font, surface.width - clock_width, 2, self.timeofday)
 
-        # Draw separator between the 'status area' and the station selector
-        surface.hline(11)
-
-        # Draw the station selector
-        ui.render_list(surface, 2, 14, self.font, self.stations.keys(),
-                       self.cy, minheight=12, maxvisible=4)
-
     def up_pressed(self):
         self.cy -= 1
         self.cy = commons.clamp(self.cy, 0, len(self.stations) - 1)
@@ -60,8 +89,11 @@ class RadioPanel(base.Panel):
         if self.currstation == self.stations.keys()[self.cy]:
             self.audio_service.stop_playback()
             self.currstation = ''
+            self.station_marquee.visible = False
         else:
             logging.debug('Switching station')
             self.audio_service.playstream(self.stations.values()[self.cy])
             self.currstation = self.stations.keys()[self.cy]
+            self.station_marquee.set_text(self.currstation)
+            self.station_marquee.visible = True
         self.set_needs_repaint()
@@ -1,6 +1,9 @@
 import time
+import piradio.assets as assets
+import piradio.collision as collision
 import piradio.fonts as fonts
 import piradio.graphics as graphics
+import piradio.tilemap as tilemap
 from . import base
 
 
@@ -17,37 +20,57 @@ class ShootEmUpGamePanel(base.Panel):
 
         # Load assets
         self.fps_font = fonts.get('tempesta', 8)
-        self.background_img = graphics.Surface(
-            filename='assets/shmup/background.png',
+        background_img = assets.load_image(
+            'assets/shmup/background.png',
             dither=True
         )
-        self.foreground_img = graphics.Surface(
-            filename='assets/shmup/foreground.png',
+        foreground_img = assets.load_image(
+            'assets/shmup/foreground.png',
             dither=True
         )
-        self.ship_img = graphics.Surface(
-            filename='assets/shmup/ship.png',
+        self.ship_img = assets.load_image(
+            'assets/shmup/ship.png',
         )
 
-    def update(self):
-        self.bg_scroll_offset += 1
-        self.fg_scroll_offset += 2
+        # The scrolling layers are tile maps that repeat endlessly.
+        self.background = tilemap.TileMap.from_image(background_img)
+        self.foreground = tilemap.TileMap.from_image(foreground_img)
+
+        # The ship and the shots are drawn as run-length encoded images,
+        # which skip their transparent pixels.
+        self.ship_sprite = graphics.RLEImage.from_surface(self.ship_img)
+        self.shot_sprite = graphics.RLEImage(4, 1, [[(0, 4)]])
+        self.sprites = graphics.SpriteBatch()
 
-        if (self.bg_scroll_offset >= self.background_img.width - 128 or
-            self.fg_scroll_offset >= self.foreground_img.width - 128):
-            self.bg_scroll_offset = 0
-            self.fg_scroll_offset = 0
+        # Shots that hit the terrain in the foreground are destroyed.
+        self.shot_mask = collision.Mask.rect(4, 1)
+        self.foreground_mask = collision.Mask.from_surface(foreground_img)
+
+    def update(self):
+        self.bg_scroll_offset = ((self.bg_scroll_offset + 1) %
+                                 self.background.width)
+        self.fg_scroll_offset = ((self.fg_scroll_offset + 2) %
+                                 self.foreground.width)
 
         gc_shots = []
         for shot in self.shots:
             shot[0] += 4
-            if shot[0] < 128 and shot[1] < 64:
+            if (shot[0] < 128 and shot[1] < 64 and
+                not self.hits_terrain(shot[0], shot[1])):
                 gc_shots.append(shot)
 
         self.shots = gc_shots
 
         self.set_needs_repaint()
 
+    def hits_terrain(self, x, y):
+        # The foreground repeats, so check the copy that scrolls in
+        # from the right as well.
+        terrain_x = -self.fg_scroll_offset
+        return any(self.shot_mask.overlaps(x, y, self.foreground_mask,
+                                           terrain_x + repeat, 0)
+                   for repeat in (0, self.foreground.width))
+
     def up_pressed(self):
         self.ship_y -= 1
 
@@ -61,29 +84,16 @@ class ShootEmUpGamePanel(base.Panel):
     def paint(self, surface):
         framestart = time.time()
 
-        surface.bitblt_scrolled(
-            self.background_img,
-            self.bg_scroll_offset
-        )
+        self.background.draw(surface, self.bg_scroll_offset)
 
-        surface.bitblt(
-            self.ship_img,
-            self.ship_x,
-            self.ship_y,
-            op=graphics.rop_or
-        )
+        self.sprites.clear()
+        self.sprites.add(self.ship_sprite, self.ship_x, self.ship_y)
+        for x, y in self.shots:
+            self.sprites.add(self.shot_sprite, x, y)
+        self.sprites.draw(surface)
 
-        for shot in self.shots:
-            surface.setpixel(shot[0], shot[1])
-            surface.setpixel(shot[0]+1, shot[1])
-            surface.setpixel(shot[0]+2, shot[1])
-            surface.setpixel(shot[0]+3, shot[1])
-
-        surface.bitblt_scrolled(
-            self.foreground_img,
-            self.fg_scroll_offset,
-            op=graphics.rop_or
-        )
+        self.foreground.draw(surface, self.fg_scroll_offset,
+                             op=graphics.rop_or)
 
         # surface.text(self.fps_font, 0, 0, '%.1f fps' % self.fps)
         frameend = time.time()
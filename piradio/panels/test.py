@@ -1,6 +1,6 @@
 import time
+import piradio.assets as assets
 import piradio.fonts as fonts
-import piradio.graphics as graphics
 from . import base
 
 
@@ -8,8 +8,7 @@ class DitherTestPanel(base.Panel):
     def __init__(self):
         super(DitherTestPanel, self).__init__()
         self.set_needs_repaint()
-        self.img = graphics.Surface(filename='assets/dithertest.png')
-        self.img.dither()
+        self.img = assets.load_image('assets/dithertest.png', dither=True)
 
     def paint(self, surface):
         surface.bitblt(self.img, 0, 0)
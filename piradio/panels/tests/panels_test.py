@@ -62,7 +62,6 @@ def test_init_paint_update():
                    os.path.join(cwd, 'assets/pf_tempesta_seven.ttf'))
     fonts.register('pixarrows', os.path.join(cwd, 'assets/pixarrows.ttf'))
     fonts.register('climacons', os.path.join(cwd, 'assets/climacons.ttf'))
-    fonts.register('helvetica', os.path.join(cwd, 'assets/helvetica.ttf'))
 
     broker = ServiceBroker()
     clock_mock = make_service_mock('ClockServiceMock')
@@ -85,3 +84,46 @@ def test_init_paint_update():
         pnl.paint(surf)
         pnl.update()
         monkey_test(pnl)
+
+
+def test_marquee_repaints_only_the_destination():
+    fonts.register('tempesta',
+                   os.path.join(os.getcwd(), 'assets/pf_tempesta_seven.ttf'))
+    pnl = PublicTransportPanel(mock.Mock(), station='Test')
+    destination = u'Garching-Forschungszentrum ' * 2
+    pnl.on_trains_changed([{'minutes': 3, 'line': 'U6',
+                            'destination': destination}])
+    surf = graphics.Surface(128, 64)
+    pnl.paint_if_needed(surf)
+    surf.flush_damage()
+
+    marquee = pnl.marquees[0]
+    marquee.started -= marquee.pause + 1
+    pnl.update()
+    assert pnl.needs_repaint and pnl.marquees_only
+    assert pnl.paint_if_needed(surf)
+    assert not pnl.marquees_only
+    damage = surf.flush_damage()
+    assert (damage.x, damage.y, damage.width, damage.height) == (
+        pnl.destination_x, 16, marquee.width, marquee.height)
+
+
+def test_destinations_start_after_the_line():
+    fonts.register('tempesta',
+                   os.path.join(os.getcwd(), 'assets/pf_tempesta_seven.ttf'))
+    pnl = PublicTransportPanel(mock.Mock(), station='Test')
+    pnl.on_trains_changed([
+        {'minutes': 3, 'line': 'U6', 'destination': u'Klinikum'},
+        {'minutes': 12, 'line': 'MVV X30', 'destination': u'Ostbahnhof'}])
+    assert pnl.destination_xs[0] == pnl.destination_x
+    label_right = 2 + pnl.font.text_dimensions(pnl.labels[1])[0]
+    assert pnl.destination_xs[1] > label_right
+    assert pnl.marquees[1].width == 128 - pnl.destination_xs[1]
+
+    surf = graphics.Surface(128, 64)
+    pnl.paint(surf)
+    expected = graphics.Surface(128, 12)
+    expected.text(pnl.font, 2, 2, pnl.labels[1])
+    pnl.marquees[1].draw(expected, pnl.destination_xs[1], 2)
+    row = surf.subsurface(0, 26, 128, 12)
+    assert row.pixels == expected.pixels
@@ -1,5 +1,6 @@
 import logging
 import piradio.fonts as fonts
+import piradio.layout as layout
 from . import base
 
 
@@ -38,12 +39,8 @@ class WeatherPanel(base.Panel):
         return GLYPH_FOR_ICON.get(icon, 'Y')
 
     def paint(self, surface):
-        words = self.weather_summary.split()
-        line1 = ' '.join(words[:len(words)/2])
-        line2 = ' '.join(words[len(words)/2:])
-
         surface.fill(0)
         surface.center_text(self.font_big, self.city, y=2)
-        surface.center_text(self.font, line1, y=20)
-        surface.center_text(self.font, line2, y=30)
+        layout.draw(surface, self.font, self.weather_summary, 0, 20,
+                    surface.width, maxlines=2, align=layout.CENTER)
         surface.center_text(self.climacons, self.weather_glyph, y=40)
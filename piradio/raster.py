@@ -0,0 +1,137 @@
+"""Rasterization of lines, ellipses and polygons into spans.
+
+Every function returns a list of (x, y, length) tuples, each of which
+covers `length` pixels of row `y` starting at column `x`. Surfaces draw
+these spans in bulk, see Surface.line() and friends in piradio.graphics.
+Coordinates refer to pixels, so a shape includes the pixels its
+vertices lie on.
+"""
+import math
+
+
+def merge_spans(spans):
+    """Return `spans` sorted by row and column, with overlapping and
+    adjacent spans merged into one. Every pixel is covered only once by
+    the result, which matters for raster operations like rop_xor.
+    """
+    merged = []
+    for x, y, length in sorted(spans, key=lambda span: (span[1], span[0])):
+        if merged:
+            lastx, lasty, lastlength = merged[-1]
+            if lasty == y and x <= lastx + lastlength:
+                merged[-1] = (lastx, y, max(lastlength, x + length - lastx))
+                continue
+        merged.append((x, y, length))
+    return merged
+
+
+def point_spans(points):
+    """Return the spans covering the (x, y) tuples in `points`."""
+    return merge_spans((x, y, 1) for x, y in points)
+
+
+def line_spans(x0, y0, x1, y1):
+    """Return the spans of the line from (x0, y0) to (x1, y1).
+
+    The pixels are chosen by Bresenham's algorithm. Consecutive pixels
+    on the same row are returned as a single span.
+    """
+    spans = []
+    dx, dy = abs(x1 - x0), -abs(y1 - y0)
+    sx = 1 if x0 < x1 else -1
+    sy = 1 if y0 < y1 else -1
+    err = dx + dy
+    start = x0
+    while x0 != x1 or y0 != y1:
+        e2 = 2 * err
+        nextx, nexty = x0, y0
+        if e2 >= dy:
+            err += dy
+            nextx += sx
+        if e2 <= dx:
+            err += dx
+            nexty += sy
+        if nexty != y0:
+            spans.append((min(start, x0), y0, abs(x0 - start) + 1))
+            start = nextx
+        x0, y0 = nextx, nexty
+    spans.append((min(start, x0), y0, abs(x0 - start) + 1))
+    return spans
+
+
+def _ellipse_halfwidths(rx, ry):
+    """Return the half-widths of the rows of an ellipse with the radii
+    `rx` and `ry`, starting at the center row.
+    """
+    if ry == 0:
+        return [rx]
+    return [int(rx * math.sqrt(1 - float(dy * dy) / (ry * ry)) + 0.5)
+            for dy in xrange(ry + 1)]
+
+
+def fill_ellipse_spans(cx, cy, rx, ry):
+    """Return the spans of the filled ellipse centered on (cx, cy)."""
+    spans = []
+    for dy, halfwidth in enumerate(_ellipse_halfwidths(rx, ry)):
+        spans.append((cx - halfwidth, cy - dy, 2 * halfwidth + 1))
+        if dy:
+            spans.append((cx - halfwidth, cy + dy, 2 * halfwidth + 1))
+    return merge_spans(spans)
+
+
+def stroke_ellipse_spans(cx, cy, rx, ry):
+    """Return the spans of the outline of the ellipse centered on
+    (cx, cy). The outline covers the outermost pixels of the filled
+    ellipse without any gaps.
+    """
+    spans = []
+    halfwidths = _ellipse_halfwidths(rx, ry)
+    for dy, halfwidth in enumerate(halfwidths):
+        # Each row has to reach over to where the next row further out
+        # ends, so that steep parts of the outline don't have holes.
+        outer = halfwidths[dy + 1] if dy < ry else -1
+        inner = min(outer + 1, halfwidth)
+        length = halfwidth - inner + 1
+        for y in set([cy - dy, cy + dy]):
+            spans.append((cx - halfwidth, y, length))
+            spans.append((cx + inner, y, length))
+    return merge_spans(spans)
+
+
+def stroke_polygon_spans(points):
+    """Return the spans of the closed outline through the (x, y)
+    vertices in `points`.
+    """
+    spans = []
+    for i, (x0, y0) in enumerate(points):
+        x1, y1 = points[i - 1]
+        spans.extend(line_spans(x0, y0, x1, y1))
+    return merge_spans(spans)
+
+
+def fill_polygon_spans(points):
+    """Return the spans of the polygon with the (x, y) vertices in
+    `points`, including its outline.
+
+    Self-intersecting polygons are filled with the even-odd rule.
+    """
+    if not points:
+        return []
+    spans = stroke_polygon_spans(points)
+    edges = [(points[i - 1], point) for i, point in enumerate(points)]
+    ys = [y for _, y in points]
+    for y in xrange(min(ys), max(ys)):
+        # Find where the row crosses the edges. Each edge includes its
+        # upper end but not its lower one, so that a vertex shared by
+        # two edges isn't counted twice.
+        crossings = []
+        for (x0, y0), (x1, y1) in edges:
+            if min(y0, y1) <= y < max(y0, y1):
+                crossings.append(x0 + (y - y0) * (x1 - x0) / float(y1 - y0))
+        crossings.sort()
+        for left, right in zip(crossings[::2], crossings[1::2]):
+            start = int(math.ceil(left))
+            end = int(math.floor(right))
+            if end >= start:
+                spans.append((start, y, end - start + 1))
+    return merge_spans(spans)
@@ -0,0 +1,34 @@
+import piradio.app as app
+import piradio.config as config
+import piradio.dither as dither
+import piradio.fonts as fonts
+import piradio.lcd.headless_lcd as headless_lcd
+import piradio.lcd.multi_lcd as multi_lcd
+
+
+def test_headless_mainloop(monkeypatch):
+    monkeypatch.setitem(config.CONFIG, 'lcd_drivers',
+                        ['piradio.lcd.headless_lcd'])
+    monkeypatch.setitem(config.CONFIG, 'font_atlas_dir', None)
+    monkeypatch.setitem(config.CONFIG, 'dither_cache_dir', None)
+    monkeypatch.setattr(fonts, 'ATLAS_DIR', None)
+    monkeypatch.setattr(dither, 'CACHE_DIR', None)
+    monkeypatch.setattr(multi_lcd, '_DRIVERS', [])
+    monkeypatch.setattr(multi_lcd, '_last_surface', None)
+    monkeypatch.setattr(multi_lcd, '_last_frame', None)
+
+    radio = app.RadioApp()
+    radio.panel_defs = radio.read_panels([['ClockPanel', {}],
+                                          ['DitherTestPanel', {}]])
+    try:
+        radio.start()
+        radio.mainloop(3, rate=float('inf'))
+        assert radio.active_panel is radio.panels[0]
+        headless_lcd.press(headless_lcd.K_RIGHT)
+        radio.mainloop(3, rate=float('inf'))
+    finally:
+        radio.broker.stop_running()
+    assert radio.active_panel is radio.panels[1]
+    assert headless_lcd.frame_count > 0
+    shown = radio.backing_stores[radio.panels[1]]
+    assert headless_lcd.frames[-1].pixels == shown.page_columns(0, 128)
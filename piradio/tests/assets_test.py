@@ -0,0 +1,64 @@
+import os
+import shutil
+import pytest
+import piradio.assets as assets
+import piradio.graphics as graphics
+
+
+@pytest.fixture
+def image(tmpdir):
+    filename = str(tmpdir.join('dithertest.png'))
+    shutil.copy('assets/dithertest.png', filename)
+    return filename
+
+
+def as_bits(surface):
+    return [1 if px else 0 for px in surface.pixels]
+
+
+def test_compile_and_load(image):
+    compiled = assets.compile_assets(os.path.dirname(image))
+    assert sorted(os.path.basename(f) for f in compiled) == [
+        'dithertest.1bpp', 'dithertest.dithered.1bpp']
+    assert assets.compile_assets(os.path.dirname(image)) == []
+
+    for dither in (False, True):
+        expected = graphics.Surface(filename=image, dither=dither)
+        surface = assets.load(assets.compiled_filename(image, dither))
+        assert isinstance(surface, assets.MappedSurface)
+        assert (surface.width, surface.height) == (128, 64)
+        assert as_bits(surface) == as_bits(expected)
+        dst = graphics.Surface(128, 64)
+        dst.bitblt(surface, 0, 0)
+        assert as_bits(dst) == as_bits(expected)
+
+
+def test_drawing_does_not_change_the_file(image):
+    compiled = assets.compile_image(image)
+    with open(compiled, 'rb') as f:
+        data = f.read()
+    surface = assets.load(compiled)
+    surface.setpixel(3, 9, 1)
+    surface.setpixel(4, 9, 0)
+    surface.fillrect(10, 10, 20, 20)
+    assert (surface.getpixel(3, 9), surface.getpixel(4, 9)) == (1, 0)
+    assert surface.copy().getpixel(3, 9) == 1
+    with open(compiled, 'rb') as f:
+        assert f.read() == data
+
+
+def test_load_image_falls_back_to_png(image):
+    surface = assets.load_image(image, dither=True)
+    assert not isinstance(surface, assets.MappedSurface)
+    assets.compile_image(image, dither=True)
+    surface = assets.load_image(image, dither=True)
+    assert isinstance(surface, assets.MappedSurface)
+    # Compiled files that are older than the image are ignored.
+    os.utime(image, (0, os.path.getmtime(image) + 10))
+    surface = assets.load_image(image, dither=True)
+    assert not isinstance(surface, assets.MappedSurface)
+
+
+def test_load_rejects_other_files(image):
+    with pytest.raises(ValueError):
+        assets.load(image)
@@ -0,0 +1,56 @@
+import random
+import piradio.graphics as graphics
+from piradio.collision import Mask, Grid
+
+
+def random_mask(rnd, width, height):
+    surface = graphics.Surface(width, height, pixels=[
+        rnd.random() < 0.2 for _ in xrange(width * height)])
+    return surface, Mask.from_surface(surface)
+
+
+def overlaps_reference(a, ax, ay, b, bx, by):
+    for y in xrange(a.height):
+        for x in xrange(a.width):
+            bpx, bpy = ax + x - bx, ay + y - by
+            if (a.getpixel(x, y) and 0 <= bpx < b.width and
+                    0 <= bpy < b.height and b.getpixel(bpx, bpy)):
+                return True
+    return False
+
+
+def test_mask_from_surface():
+    mask = Mask.from_surface(graphics.Surface(4, 3, pixels=[0, 0, 0, 0,
+                                                            1, 0, 2, 1,
+                                                            0, 0, 0, 0]))
+    assert mask.rows == [0, 0b1101, 0]
+    assert (mask.top, mask.bottom) == (1, 2)
+    assert repr(mask) == '....\n#.##\n....\n'
+
+
+def test_overlaps_matches_reference():
+    rnd = random.Random(1)
+    for _ in xrange(300):
+        a, amask = random_mask(rnd, rnd.randint(1, 20), rnd.randint(1, 20))
+        b, bmask = random_mask(rnd, rnd.randint(1, 70), rnd.randint(1, 20))
+        ax, ay = rnd.randint(-10, 10), rnd.randint(-10, 10)
+        bx, by = rnd.randint(-10, 10), rnd.randint(-10, 10)
+        expected = overlaps_reference(a, ax, ay, b, bx, by)
+        assert amask.overlaps(ax, ay, bmask, bx, by) == expected
+        assert bmask.overlaps(bx, by, amask, ax, ay) == expected
+
+
+def test_grid():
+    grid = Grid(cellsize=8)
+    dot = Mask.rect(1, 1)
+    box = Mask.rect(10, 10)
+    grid.insert('a', box, 0, 0)
+    grid.insert('b', box, 9, 9)
+    grid.insert('c', box, 30, 30)
+    grid.insert('empty', Mask(5, 5, [0] * 5), 0, 0)
+    assert grid.query(dot, 9, 9) == ['a', 'b']
+    assert grid.query(dot, 10, 0) == []
+    assert grid.query(dot, 35, 39) == ['c']
+    assert grid.pairs() == [('a', 'b')]
+    grid.clear()
+    assert grid.query(box, 0, 0) == []
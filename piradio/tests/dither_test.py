@@ -0,0 +1,56 @@
+import os
+import random
+import piradio.dither as dither
+
+
+def atkinson_reference(pixels, width, height):
+    """Straightforward per-pixel implementation of dither.atkinson()."""
+    for y in xrange(height):
+        for x in xrange(width):
+            old = pixels[y * width + x]
+            new = 255 if old >= 128 else 0
+            err = (old - new) // 8
+            pixels[y * width + x] = new
+            for nx, ny in [(x+1, y), (x+2, y), (x-1, y+1),
+                           (x, y+1), (x+1, y+1), (x, y+2)]:
+                if 0 <= nx < width and ny < height:
+                    px = ny * width + nx
+                    pixels[px] = min(max(pixels[px] + err, 0), 255)
+
+
+def test_atkinson_matches_reference():
+    rnd = random.Random(1)
+    for width, height in [(1, 1), (2, 3), (37, 23), (128, 64)]:
+        pixels = bytearray(rnd.randint(0, 255)
+                           for _ in xrange(width * height))
+        expected = bytearray(pixels)
+        atkinson_reference(expected, width, height)
+        dither.atkinson(pixels, width, height)
+        assert pixels == expected
+
+
+def test_dithered_image_cache(tmpdir, monkeypatch):
+    monkeypatch.setattr(dither, 'CACHE_DIR', str(tmpdir.join('cache')))
+    width, height, pixels = dither.dithered_image('assets/dithertest.png')
+    assert (width, height) == (128, 64)
+    assert len(os.listdir(dither.CACHE_DIR)) == 1
+
+    # A second load must come from the cache and not touch the image.
+    monkeypatch.setattr(dither, 'atkinson', None)
+    assert dither.dithered_image('assets/dithertest.png') == (width, height,
+                                                              pixels)
+
+
+def test_dithered_image_ignores_broken_cache_entries(tmpdir, monkeypatch):
+    monkeypatch.setattr(dither, 'CACHE_DIR', str(tmpdir))
+    expected = dither.dithered_image('assets/dithertest.png')
+    for name in os.listdir(str(tmpdir)):
+        tmpdir.join(name).write('DTHR\x01\x00')
+    assert dither.dithered_image('assets/dithertest.png') == expected
+
+
+def test_cache_key_depends_on_parameters():
+    assert dither.cache_key(b'image') == dither.cache_key(b'image')
+    assert dither.cache_key(b'image') != dither.cache_key(b'image2')
+    assert (dither.cache_key(b'image', threshold=128) !=
+            dither.cache_key(b'image', threshold=100))
@@ -0,0 +1,243 @@
+import os
+import sys
+import shutil
+import subprocess
+import mock
+import pytest
+import piradio.fonts as fonts
+import piradio.commons as commons
+import piradio.graphics as graphics
+
+FONT = 'assets/pf_tempesta_seven.ttf'
+TEXTS = [u'piradio', u'AVA Tag 13:37', u'M\xfcnchen \xbd\xb0C', u'']
+
+
+def render_all(font):
+    return [(font.text_dimensions(text), bytes(font.render_text(text).pixels))
+            for text in TEXTS]
+
+
+def without_freetype(monkeypatch):
+    def no_freetype():
+        raise AssertionError('FreeType must not be used')
+    monkeypatch.setattr(fonts, '_freetype', no_freetype)
+    monkeypatch.setattr(fonts, '_faces', {})
+
+
+@pytest.fixture
+def atlas_dir(tmpdir, monkeypatch):
+    monkeypatch.setattr(fonts, 'ATLAS_DIR', None)
+    expected = dict((size, render_all(fonts.Font(FONT, size)))
+                    for size in (8, 16))
+    monkeypatch.setattr(fonts, 'ATLAS_DIR', str(tmpdir.join('atlas')))
+    return expected
+
+
+def test_atlas_renders_like_freetype(atlas_dir, monkeypatch):
+    for size in (8, 16):
+        assert render_all(fonts.Font(FONT, size)) == atlas_dir[size]
+    assert len(os.listdir(fonts.ATLAS_DIR)) == 2
+
+    # Fonts are loaded from their atlases without FreeType.
+    without_freetype(monkeypatch)
+    for size in (8, 16):
+        assert render_all(fonts.Font(FONT, size)) == atlas_dir[size]
+
+
+def test_characters_outside_the_atlas(atlas_dir):
+    fonts.Font(FONT, 8)
+    font = fonts.Font(FONT, 8)
+    assert u'\u20ac' not in font.glyphcache
+    font.render_text(u'5\u20ac')
+    assert u'\u20ac' in font.glyphcache
+
+
+def test_broken_atlases_are_ignored(atlas_dir):
+    fonts.Font(FONT, 8)
+    for name in os.listdir(fonts.ATLAS_DIR):
+        with open(os.path.join(fonts.ATLAS_DIR, name), 'r+b') as f:
+            f.truncate(100)
+    assert render_all(fonts.Font(FONT, 8)) == atlas_dir[8]
+
+
+def test_atlas_roundtrip():
+    glyphs = {u'a': fonts.Glyph(bytearray([0, 1, 1, 0, 1, 0]), 3, 2, 5, 4),
+              u' ': fonts.Glyph(bytearray(), 0, 0, 0, 3)}
+    kerning = {(u'a', u'a'): -1}
+    atlas = fonts.GlyphAtlas.frombytes(
+        fonts.GlyphAtlas(glyphs, kerning).tobytes())
+    assert atlas.kerning == kerning
+    assert sorted(atlas.glyphs) == [u' ', u'a']
+    a = atlas.glyphs[u'a']
+    assert (a.width, a.height, a.top, a.advance_x) == (3, 2, 5, 4)
+    assert a.bitmap.pixels == glyphs[u'a'].bitmap.pixels
+    with pytest.raises(ValueError):
+        fonts.GlyphAtlas.frombytes(b'GLYA')
+    with pytest.raises(ValueError):
+        fonts.GlyphAtlas.frombytes(atlas.tobytes()[:-1])
+
+
+def test_text_cache():
+    font = fonts.Font(FONT, 8)
+    surface = font.render_cached(u'Byte.FM')
+    assert font.textcache.misses == 2
+    assert font.render_cached(u'Byte.FM') is surface
+    assert font.text_dimensions(u'Byte.FM') == (surface.width,
+                                                surface.height,
+                                                font._measure(u'Byte.FM')[2])
+    assert (font.textcache.hits, font.textcache.misses) == (3, 2)
+    assert bytes(surface.pixels) == bytes(font.render(u'Byte.FM').pixels)
+
+
+def test_drawn_text_is_cached():
+    font = fonts.Font(FONT, 8)
+    surface = graphics.Surface(128, 64)
+    surface.text(font, 2, 2, u'13:37')
+    key = (u'13:37',) + font.text_dimensions(u'13:37')
+    assert key in font.textcache
+    rendered = font.render_cached(u'13:37')
+    assert bytes(rendered.pixels) == bytes(font.render(u'13:37').pixels)
+
+    misses = font.textcache.misses
+    surface.text(font, 2, 2, u'13:37')
+    assert font.textcache.misses == misses
+
+
+def test_text_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(fonts, 'TEXT_CACHE_SIZE', 1000)
+    font = fonts.Font(FONT, 8)
+    for i in xrange(100):
+        font.render_cached(u'Station %i' % i)
+        assert font.textcache.size <= 1000
+    assert font.textcache.size > 500
+    assert u'Station 99' in font.textcache
+    assert u'Station 0' not in font.textcache
+
+
+def test_measurements_count_against_the_cache_size(monkeypatch):
+    monkeypatch.setattr(fonts, 'TEXT_CACHE_SIZE', 1000)
+    font = fonts.Font(FONT, 8)
+    for i in xrange(100):
+        font.text_dimensions(u'%i' % i)
+    assert len(font.textcache) == 1000 // fonts._DIMENSIONS_SIZE
+
+
+def test_lru_cache():
+    cache = commons.LRUCache(10)
+    cache.put('a', 1, 4)
+    cache.put('b', 2, 4)
+    assert cache.get('a') == 1
+    cache.put('c', 3, 4)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    cache.put('a', 4, 6)
+    assert (len(cache), cache.size) == (2, 10)
+    cache.put('d', 5, 11)
+    assert 'd' not in cache
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+@pytest.mark.parametrize('size', [8, 16, 32])
+def test_kerning_table(size, monkeypatch):
+    font = fonts.Font(FONT, size)
+    text = u'AVA Tag 13:37 To W.'
+    font.text_dimensions(text)
+    for left in text:
+        for right in text:
+            expected = font.face.get_kerning(left, right).x / 64
+            assert font.kerning_offset(left, right) == expected
+
+    # Measuring and rendering known characters doesn't need FreeType.
+    without_freetype(monkeypatch)
+    font.textcache.clear()
+    font.render_text(text[::-1])
+
+
+@pytest.mark.parametrize('size', [8, 32])
+def test_preload(size):
+    expected = fonts.Font(FONT, size)
+    for char in fonts.ATLAS_CHARACTERS:
+        expected.glyph_for_character(char)
+    font = fonts.Font(FONT, size)
+    font.glyph_for_character(u'T')
+    font.preload(fonts.ATLAS_CHARACTERS + u'TT')
+    assert sorted(font.glyphcache) == sorted(expected.glyphcache)
+    assert font.kerning == expected.kerning
+    for char, glyph in expected.glyphcache.iteritems():
+        assert font.glyphcache[char].bitmap.pixels == glyph.bitmap.pixels
+
+
+def test_unpack_mono_bitmap():
+    bitmap = mock.Mock(width=10, rows=2, pitch=2,
+                       buffer=[0x80, 0xff, 0x35, 0x40])
+    assert fonts.Glyph.unpack_mono_bitmap(bitmap) == bytearray(
+        [1, 0, 0, 0, 0, 0, 0, 0, 1, 1,
+         0, 0, 1, 1, 0, 1, 0, 1, 0, 1])
+
+
+def test_sizes_share_a_face():
+    small, big = fonts.Font(FONT, 8), fonts.Font(FONT, 32)
+    assert small.face is big.face
+    expected = render_all(small), render_all(big)
+    small, big = fonts.Font(FONT, 8), fonts.Font(FONT, 32)
+    # Switch between the sizes for every glyph.
+    for char in u''.join(TEXTS):
+        small.glyph_for_character(char)
+        big.glyph_for_character(char)
+    assert (render_all(small), render_all(big)) == expected
+
+
+def test_register_missing_font():
+    with pytest.raises(IOError):
+        fonts.register('missing', 'assets/missing.ttf')
+    with pytest.raises(KeyError):
+        fonts.get('missing', 8)
+
+
+@pytest.fixture
+def compiled(tmpdir, monkeypatch):
+    # Register and load the font in copies of the registries, so that
+    # it's gone along with its file after the test.
+    monkeypatch.setattr(fonts, '_registered_fonts',
+                        dict(fonts._registered_fonts))
+    monkeypatch.setattr(fonts, '_loaded_fonts', dict(fonts._loaded_fonts))
+    filename = str(tmpdir.join('tempesta.ttf'))
+    shutil.copy(FONT, filename)
+    fonts.register('compiled', filename)
+    compiled = fonts.compile_font(filename, [8, 16])
+    assert compiled == str(tmpdir.join('tempesta.bfnt'))
+    yield compiled
+    monkeypatch.undo()
+    assert not [key for key in fonts._loaded_fonts
+                if key.startswith(str(tmpdir))]
+
+
+def test_compiled_font(compiled, monkeypatch):
+    expected = render_all(fonts.Font(FONT, 16))
+    without_freetype(monkeypatch)
+    assert render_all(fonts.get('compiled', 16)) == expected
+    assert fonts.load_compiled(compiled, 32) is None
+
+
+def test_compiled_font_fallbacks(compiled, monkeypatch):
+    # Sizes that weren't compiled are rendered with FreeType.
+    assert render_all(fonts.get('compiled', 32)) == render_all(
+        fonts.Font(FONT, 32))
+    with open(compiled, 'r+b') as f:
+        f.truncate(200)
+    assert render_all(fonts.get('compiled', 8)) == render_all(
+        fonts.Font(FONT, 8))
+    with pytest.raises(ValueError):
+        fonts.load_compiled(compiled, 8)
+
+
+def test_compiled_font_without_freetype(compiled):
+    # Loading a compiled font doesn't even import freetype.
+    script = (
+        'import sys, piradio.fonts as fonts\n'
+        'fonts.register("compiled", %r)\n'
+        'fonts.get("compiled", 8).render(u"piradio")\n'
+        'assert "freetype" not in sys.modules\n'
+        % str(compiled).replace('.bfnt', '.ttf'))
+    subprocess.check_call([sys.executable, '-c', script])
+
@@ -0,0 +1,477 @@
+import random
+import pytest
+import piradio.fonts as fonts
+import piradio.graphics as graphics
+from piradio.graphics import Surface, PackedSurface
+
+# Every Surface implementation must pass the tests below and render the
+# same pixels as graphics.Surface.
+BACKENDS = [Surface, PackedSurface]
+try:
+    from piradio.npgraphics import NumpySurface
+    BACKENDS.append(NumpySurface)
+except ImportError:
+    pass
+
+ROPS = [graphics.rop_copy, graphics.rop_or, graphics.rop_and,
+        graphics.rop_xor, graphics.rop_not, graphics.rop_black,
+        graphics.rop_white, graphics.rop_nop, lambda a, b: a > b]
+
+
+def random_surface(width, height, seed, values=(0, 1)):
+    rnd = random.Random(seed)
+    return Surface(width, height,
+                   pixels=[rnd.choice(values) for _ in xrange(width * height)])
+
+
+def draw_scene(surface):
+    """Draw a bit of everything into `surface`."""
+    rnd = random.Random(4)
+    sprite = random_surface(13, 11, seed=1)
+    strip = random_surface(200, surface.height, seed=2)
+    surface.fill(0)
+    surface.bitblt_scrolled(strip, 17)
+    surface.fillrect(3, 5, 40, 13)
+    surface.fillrect(10, 9, 7, 2, color=0)
+    surface.strokerect(50, 3, 20, 30)
+    surface.hline(40)
+    surface.vline(100)
+    surface.setpixel(127, 63)
+    surface.setpixel(100, 20, color=0)
+    for op in ROPS:
+        surface.bitblt(sprite, rnd.randint(-15, 130),
+                       rnd.randint(-15, 70), op=op)
+    surface.bitblt(strip, -50, 3, op=graphics.rop_xor)
+    surface.bitblt_scrolled(strip, 33, op=graphics.rop_xor)
+    surface.line(-20, 70, 140, -5)
+    surface.segments([(5, 60, 120, 58), (60, -3, 60, 70), (0, 0, 9, 9)],
+                     op=graphics.rop_xor)
+    surface.points([(1, 1), (1, 1), (127, 0), (-1, 5)], op=graphics.rop_not)
+    surface.fillcircle(100, 30, 20, op=graphics.rop_xor)
+    surface.strokecircle(10, 60, 12)
+    surface.strokeellipse(64, 32, 70, 10, color=0)
+    surface.fillellipse(30, 20, 3, 15, op=ROPS[-1])
+    surface.fillpolygon([(10, 10), (70, 20), (30, 70), (20, 30)],
+                        op=graphics.rop_xor)
+    surface.strokepolygon([(-10, 40), (50, 45), (120, 10)],
+                          op=graphics.rop_xor)
+
+
+def bitblt_reference(dst, src, x, y, op):
+    """Straightforward per-pixel implementation of Surface.bitblt()."""
+    for sy in xrange(src.height):
+        for sx in xrange(src.width):
+            if 0 <= x + sx < dst.width and 0 <= y + sy < dst.height:
+                dst.setpixel(x + sx, y + sy,
+                             op(dst.getpixel(x + sx, y + sy),
+                                src.getpixel(sx, sy)))
+
+
+def as_bits(surface):
+    return [1 if px else 0 for px in surface.pixels]
+
+
+def assert_same_pixels(surface, expected):
+    assert (surface.width, surface.height) == (expected.width,
+                                               expected.height)
+    if isinstance(surface, PackedSurface):
+        assert as_bits(surface) == as_bits(expected)
+    else:
+        assert surface.pixels == expected.pixels
+
+
+@pytest.mark.parametrize('cls', BACKENDS)
+def test_draw_scene(cls):
+    expected = Surface(128, 64)
+    draw_scene(expected)
+    surface = cls(128, 64)
+    draw_scene(surface)
+    assert_same_pixels(surface, expected)
+    assert_same_pixels(surface.copy(), expected)
+    assert surface.as_png_image() == expected.as_png_image()
+
+
+@pytest.mark.parametrize('cls', BACKENDS)
+def test_bitblt_matches_reference(cls):
+    rnd = random.Random(5)
+    for op in ROPS:
+        for _ in xrange(10):
+            src = random_surface(rnd.randint(1, 150),
+                                 rnd.randint(1, 70), seed=rnd.random())
+            x, y = rnd.randint(-160, 140), rnd.randint(-80, 70)
+            dst = random_surface(128, 64, seed=6)
+            expected = dst.copy()
+            bitblt_reference(expected, src, x, y, op)
+            actual = cls(128, 64, pixels=dst.pixels)
+            actual.bitblt(src, x, y, op)
+            assert as_bits(actual) == as_bits(expected)
+
+
+@pytest.mark.parametrize('cls', BACKENDS)
+def test_bitblt_between_backends(cls):
+    src = cls(40, 30, pixels=random_surface(40, 30, seed=8).pixels)
+    expected = Surface(128, 64)
+    expected.bitblt(random_surface(40, 30, seed=8), 100, -3)
+    for dstcls in BACKENDS:
+        dst = dstcls(128, 64)
+        dst.bitblt(src, 100, -3)
+        assert as_bits(dst) == as_bits(expected)
+
+
+@pytest.mark.parametrize('cls', BACKENDS)
+def test_loadimage(cls):
+    src = Surface(filename='assets/shmup/ship.png')
+    surface = cls(filename='assets/shmup/ship.png')
+    assert_same_pixels(surface, src)
+
+
+@pytest.mark.parametrize('cls', BACKENDS)
+def test_dither(cls):
+    expected = Surface(filename='assets/dithertest.png', dither=True)
+    surface = cls(filename='assets/dithertest.png', dither=True)
+    assert_same_pixels(surface, expected)
+
+    if cls is not PackedSurface:
+        gray = random_surface(37, 23, seed=9, values=range(256))
+        expected = gray.copy()
+        expected.dither()
+        surface = cls(gray.width, gray.height, pixels=gray.pixels)
+        surface.dither()
+        assert_same_pixels(surface, expected)
+
+
+@pytest.mark.parametrize('cls', [cls for cls in BACKENDS
+                                 if cls is not PackedSurface])
+def test_apply(cls):
+    gray = random_surface(37, 23, seed=10, values=range(256))
+    expected = gray.copy()
+    expected.apply(lambda px: px > 100)
+    surface = cls(gray.width, gray.height, pixels=gray.pixels)
+    surface.apply(lambda px: px > 100)
+    assert_same_pixels(surface, expected)
+
+
+@pytest.mark.parametrize('cls', BACKENDS)
+def test_damage_tracking(cls):
+    surf = cls(128, 64)
+    assert surf.flush_damage() is None
+    surf.setpixel(10, 20)
+    surf.fillrect(100, 30, 28, 34)
+    damage = surf.flush_damage()
+    assert (damage.x, damage.y, damage.rx, damage.ry) == (10, 20, 128, 64)
+    assert surf.flush_damage() is None
+    surf.bitblt(random_surface(8, 8, seed=7), -4, -2)
+    damage = surf.flush_damage()
+    assert (damage.x, damage.y, damage.width, damage.height) == (0, 0, 4, 6)
+
+
+@pytest.mark.parametrize('cls', BACKENDS)
+def test_subsurface(cls):
+    parent = random_surface(200, 100, seed=11)
+    expected = parent.copy()
+    scene = Surface(128, 64)
+    draw_scene(scene)
+    expected.bitblt(scene, 30, 20)
+
+    surface = cls(200, 100, pixels=parent.pixels)
+    view = surface.subsurface(30, 20, 128, 64)
+    assert (view.width, view.height) == (128, 64)
+    draw_scene(view)
+    assert_same_pixels(surface, expected)
+    assert as_bits(view) == as_bits(scene)
+    damage = surface.flush_damage()
+    assert (damage.x, damage.y, damage.width, damage.height) == (30, 20,
+                                                                 128, 64)
+
+    # Views can be blitted from like any other surface.
+    dst = cls(128, 64)
+    dst.bitblt(view, -3, 5, op=graphics.rop_xor)
+    expected = Surface(128, 64)
+    expected.bitblt(scene, -3, 5, op=graphics.rop_xor)
+    assert as_bits(dst) == as_bits(expected)
+
+
+@pytest.mark.parametrize('cls', BACKENDS)
+def test_subsurface_clipping(cls):
+    surface = cls(128, 64)
+    view = surface.subsurface(-10, 50, 40, 40)
+    assert (view.x, view.y, view.width, view.height) == (-10, 50, 40, 40)
+    clip = view.clip
+    assert (clip.x, clip.y, clip.width, clip.height) == (10, 0, 30, 14)
+    view.fill()
+    expected = Surface(128, 64)
+    expected.fillrect(0, 50, 30, 14)
+    assert as_bits(surface) == as_bits(expected)
+
+    nested = view.subsurface(20, 5, 50, 50)
+    assert (nested.x, nested.y, nested.width, nested.height) == (10, 55,
+                                                                 50, 50)
+    clip = nested.clip
+    assert (clip.x, clip.y, clip.width, clip.height) == (0, 0, 20, 9)
+    assert nested.parent is surface
+    nested.bitblt(random_surface(20, 20, seed=12), -5, -5,
+                  op=graphics.rop_not)
+    expected.bitblt(random_surface(20, 20, seed=12).subsurface(5, 5, 20, 9),
+                    10, 55, op=graphics.rop_not)
+    assert as_bits(surface) == as_bits(expected)
+
+
+@pytest.mark.parametrize('cls', BACKENDS)
+def test_subsurface_off_the_edge(cls):
+    parent = random_surface(128, 64, seed=13)
+    surface = cls(128, 64, pixels=parent.pixels)
+    expected = parent.copy()
+
+    # Coordinates in the view start at its own top-left corner, even if
+    # that lies outside of the parent.
+    view = surface.subsurface(-10, -4, 50, 10)
+    view.setpixel(15, 4, 0)
+    view.setpixel(5, 4, 1)
+    expected.setpixel(5, 0, 0)
+    assert as_bits(surface) == as_bits(expected)
+    assert [view.getpixel(x, 4) for x in (5, 15)] == [0, 0]
+    assert view.getpixel(16, 5) == (1 if parent.getpixel(6, 1) else 0)
+
+    # Reading from the view returns 0 outside of the parent.
+    pixels = Surface(50, 10)
+    pixels.bitblt(expected, 10, 4)
+    assert as_bits(view) == as_bits(pixels)
+    dst = cls(50, 10)
+    dst.bitblt(view)
+    assert as_bits(dst) == as_bits(pixels)
+
+    view.strokerect(0, 0, 50, 10)
+    view.line(0, 9, 49, 0, op=graphics.rop_xor)
+    view.text(fonts.Font('assets/pf_tempesta_seven.ttf', 8), 3, 3,
+              '13:37', graphics.rop_xor)
+    scene = pixels.copy()
+    scene.strokerect(0, 0, 50, 10)
+    scene.line(0, 9, 49, 0, op=graphics.rop_xor)
+    scene.text(fonts.Font('assets/pf_tempesta_seven.ttf', 8), 3, 3,
+               '13:37', graphics.rop_xor)
+    expected.bitblt(scene.subsurface(10, 4, 40, 6), 0, 0)
+    assert as_bits(surface) == as_bits(expected)
+    damage = surface.flush_damage()
+    assert (damage.x, damage.y, damage.width, damage.height) == (0, 0,
+                                                                 40, 6)
+
+
+def test_frombuffer_shares_pixels():
+    pixels = bytearray(6)
+    surface = Surface.frombuffer(3, 2, pixels)
+    surface.setpixel(2, 1)
+    assert pixels == bytearray([0, 0, 0, 0, 0, 1])
+
+
+@pytest.mark.parametrize('cls', BACKENDS)
+def test_shapes_draw_every_pixel_once(cls):
+    surface = cls(128, 64)
+    shapes = [
+        lambda op: surface.strokecircle(64, 32, 30, op=op),
+        lambda op: surface.fillellipse(64, 32, 80, 20, op=op),
+        lambda op: surface.strokepolygon([(0, 0), (127, 63), (0, 63)], op=op),
+        lambda op: surface.fillpolygon([(0, 0), (127, 63), (0, 63)], op=op),
+        lambda op: surface.segments([(0, 5, 127, 5), (3, 0, 3, 63)], op=op),
+    ]
+    for shape in shapes:
+        shape(graphics.rop_xor)
+        assert any(as_bits(surface))
+        shape(graphics.rop_xor)
+        assert not any(as_bits(surface))
+
+
+def draw_sprite_reference(dst, image, mask, x, y, op):
+    for sy in xrange(image.height):
+        for sx in xrange(image.width):
+            if (mask.getpixel(sx, sy) and 0 <= x + sx < dst.width and
+                    0 <= y + sy < dst.height):
+                dst.setpixel(x + sx, y + sy,
+                             op(dst.getpixel(x + sx, y + sy),
+                                image.getpixel(sx, sy)))
+
+
+@pytest.mark.parametrize('cls', BACKENDS)
+def test_sprite_batch(cls):
+    rnd = random.Random(13)
+    dst = random_surface(128, 64, seed=14)
+    expected = dst.copy()
+    surface = cls(128, 64, pixels=dst.pixels)
+    for op in ROPS:
+        batch = graphics.SpriteBatch()
+        for _ in xrange(5):
+            image = random_surface(rnd.randint(1, 40), rnd.randint(1, 20),
+                                   seed=rnd.random())
+            mask = random_surface(image.width, image.height,
+                                  seed=rnd.random())
+            x, y = rnd.randint(-45, 130), rnd.randint(-25, 70)
+            batch.add(graphics.Sprite(image, mask), x, y)
+            draw_sprite_reference(expected, image, mask, x, y, op)
+        batch.draw(surface, op)
+        assert as_bits(surface) == as_bits(expected)
+
+
+@pytest.mark.parametrize('cls', BACKENDS)
+def test_sprite_without_mask(cls):
+    image = random_surface(30, 20, seed=15)
+    sprite = graphics.Sprite(image)
+    surface = cls(128, 64, pixels=random_surface(128, 64, seed=16).pixels)
+    expected = Surface(128, 64, pixels=surface.pixels)
+    surface.flush_damage()
+    sprite.draw(surface, 110, -5)
+    expected.bitblt(image, 110, -5, op=graphics.rop_or)
+    assert as_bits(surface) == as_bits(expected)
+    damage = surface.flush_damage()
+    assert (damage.x, damage.y, damage.rx, damage.ry) == (110, 0, 128, 15)
+
+
+def test_sprite_runs():
+    sprite = graphics.Sprite(Surface(6, 3, pixels=[0, 0, 0, 0, 0, 0,
+                                                   0, 2, 3, 0, 4, 0,
+                                                   0, 0, 0, 0, 0, 0]))
+    assert sprite.rows == [[], [(1, b'\x02\x03'), (4, b'\x04')], []]
+    bounds = sprite.bounds
+    assert (bounds.x, bounds.y, bounds.width, bounds.height) == (1, 1, 4, 1)
+    surface = Surface(6, 3)
+    graphics.Sprite(Surface(6, 3)).draw(surface, 0, 0)
+    assert surface.flush_damage() is None
+
+
+@pytest.mark.parametrize('cls', BACKENDS)
+def test_rle_image(cls):
+    rnd = random.Random(17)
+    dst = random_surface(128, 64, seed=18)
+    expected = dst.copy()
+    surface = cls(128, 64, pixels=dst.pixels)
+    for op in ROPS:
+        batch = graphics.SpriteBatch()
+        for _ in xrange(5):
+            image = random_surface(rnd.randint(1, 40), rnd.randint(1, 20),
+                                   seed=rnd.random(), values=(0, 0, 1, 7))
+            x, y = rnd.randint(-45, 130), rnd.randint(-25, 70)
+            batch.add(graphics.RLEImage.from_surface(image), x, y)
+            ones = Surface(image.width, image.height,
+                           pixels=[1] * len(image))
+            draw_sprite_reference(expected, ones, image, x, y, op)
+        batch.draw(surface, op)
+        assert as_bits(surface) == as_bits(expected)
+
+    # RLEImages can be used as the source of regular blits.
+    image = random_surface(40, 20, seed=19)
+    surface = cls(128, 64)
+    surface.bitblt(graphics.RLEImage.from_surface(image), 100, -3)
+    expected = Surface(128, 64)
+    expected.bitblt(image, 100, -3)
+    assert as_bits(surface) == as_bits(expected)
+
+
+def test_rle_image_runs():
+    image = Surface(6, 3, pixels=[0, 0, 0, 0, 0, 0,
+                                  0, 2, 3, 0, 4, 0,
+                                  1, 1, 1, 1, 1, 1])
+    rle = graphics.RLEImage.from_surface(image)
+    assert rle.rows == [[], [(1, 2), (4, 1)], [(0, 6)]]
+    bounds = rle.bounds
+    assert (bounds.x, bounds.y, bounds.width, bounds.height) == (0, 1, 6, 2)
+    assert rle.pixels == bytearray(as_bits(image))
+    surface = Surface(10, 10)
+    rle.draw(surface, 7, 8)
+    damage = surface.flush_damage()
+    assert (damage.x, damage.y, damage.width, damage.height) == (7, 9, 3, 1)
+
+
+@pytest.mark.parametrize('cls', BACKENDS)
+def test_text(cls):
+    rnd = random.Random(20)
+    dst = random_surface(128, 64, seed=21)
+    expected = dst.copy()
+    surface = cls(128, 64, pixels=dst.pixels)
+    for filename, size in [('assets/pf_tempesta_seven.ttf', 8),
+                           ('assets/pf_tempesta_seven.ttf', 32),
+                           ('assets/climacons.ttf', 16)]:
+        font = fonts.Font(filename, size)
+        for op in ROPS:
+            # The climacons glyphs of "/!" overlap.
+            for text in [u'To AVA', u'Tag 13:37', u'/!', u'cached', u'']:
+                # Drawn text is cached, so start over to draw it
+                # straight into the surface again.
+                font.textcache.clear()
+                font.render_cached(u'cached')
+                x, y = rnd.randint(-40, 120), rnd.randint(-30, 60)
+                surface.text(font, x, y, text, op)
+                expected.bitblt(font.render(text), x, y, op)
+                assert as_bits(surface) == as_bits(expected)
+
+
+def test_bitblt_keeps_source_values():
+    src = Surface(2, 1, pixels=[255, 7])
+    dst = Surface(3, 1, pixels=[0, 0, 1])
+    dst.bitblt(src, 1, 0)
+    assert list(dst.pixels) == [0, 255, 7]
+    dst.bitblt(src, 0, 0, op=graphics.rop_xor)
+    assert list(dst.pixels) == [1, 0, 7]
+
+
+def test_packed_surface_roundtrip():
+    src = random_surface(37, 21, seed=3)
+    packed = PackedSurface(src.width, src.height, pixels=src.pixels)
+    assert len(packed.pages) == 37 * 3
+    assert packed.pixels == src.pixels
+    assert all(packed.getpixel(x, y) == src.getpixel(x, y)
+               for y in xrange(src.height) for x in xrange(src.width))
+
+
+def test_packed_surface_pixels_are_read_only():
+    surf = PackedSurface(16, 8)
+    with pytest.raises(AttributeError):
+        surf.pixels = bytearray(16 * 8)
+    with pytest.raises(TypeError):
+        surf.dither()
+
+
+@pytest.mark.parametrize('cls', BACKENDS)
+def test_span_type(cls):
+    surf = cls(16, 8)
+    surf.setpixel(3, 2)
+    span = surf._span(0, 2, 16)
+    assert type(span) is bytearray
+    assert span == bytearray([0, 0, 0, 1] + [0] * 12)
+
+
+def test_numpy_surface_pixels_are_read_only():
+    npgraphics = pytest.importorskip('piradio.npgraphics')
+    surf = npgraphics.NumpySurface(16, 8)
+    with pytest.raises(AttributeError):
+        surf.pixels = bytearray(16 * 8)
+
+
+def test_packed_surface_page_layout():
+    surf = PackedSurface(128, 64)
+    surf.setpixel(5, 0)
+    surf.setpixel(5, 7)
+    surf.setpixel(6, 9)
+    assert surf.pages[5] == 0x81
+    assert surf.pages[128 + 6] == 0x02
+    assert sum(surf.pages) == 0x81 + 0x02
+
+
+@pytest.mark.parametrize('cls', BACKENDS)
+def test_page_columns(cls):
+    src = random_surface(128, 64, seed=9)
+    surf = cls(128, 64, pixels=src.pixels)
+    columns = surf.page_columns(0, 128)
+    # One byte per page for every column, like the C array
+    # uint8 framebuffer[128][8] in libraspilcd.
+    assert len(columns) == 128 * 8
+    for x in xrange(128):
+        for page in xrange(8):
+            assert columns[x * 8 + page] == sum(
+                src.getpixel(x, page * 8 + bit) << bit for bit in xrange(8))
+    assert surf.page_columns(37, 20) == columns[37 * 8:57 * 8]
+    view = surf.subsurface(37, 0, 20, 64)
+    assert view.page_columns(0, 20) == columns[37 * 8:57 * 8]
+
+
+def test_surface_class():
+    assert graphics.surface_class('bytes') is Surface
+    assert graphics.surface_class('packed') is PackedSurface
+    assert graphics.surface_class('auto') is BACKENDS[-1]
@@ -0,0 +1,83 @@
+import pytest
+import piradio.fonts as fonts
+import piradio.layout as layout
+import piradio.graphics as graphics
+
+TEXT = (u'Episode 1337: Savage Lovecast with a very long title that '
+        u'goes on and on, Donaudampfschifffahrtsgesellschaftskapitaen')
+
+
+@pytest.fixture
+def font():
+    return fonts.Font('assets/pf_tempesta_seven.ttf', 8)
+
+
+def width(font, text):
+    return font.text_dimensions(text)[0]
+
+
+@pytest.mark.parametrize('linewidth', [20, 60, 128, 1000])
+def test_wrap(font, linewidth):
+    lines = layout.wrap(font, TEXT, linewidth)
+    assert u''.join(lines).replace(u' ', u'') == TEXT.replace(u' ', u'')
+    for i, line in enumerate(lines):
+        assert width(font, line) <= linewidth
+        assert line == line.strip()
+        # Lines are only broken where the next word doesn't fit.
+        if i + 1 < len(lines):
+            nextword = lines[i + 1].split()[0]
+            if nextword in TEXT.split():
+                assert width(font, line + u' ' + nextword) > linewidth
+    if linewidth == 1000:
+        assert lines == [TEXT]
+
+
+def test_wrap_empty_text(font):
+    assert layout.wrap(font, u'', 100) == []
+    assert layout.wrap(font, u'  ', 100) == []
+
+
+def test_ellipsis(font):
+    lines = layout.wrap_lines(font, TEXT, 128, maxlines=2)
+    assert len(lines) == 2
+    assert lines[1][0].endswith(layout.ELLIPSIS)
+    for line, linewidth in lines:
+        assert linewidth == width(font, line) <= 128
+    assert layout.wrap_lines(font, u'short', 128, maxlines=2) == [
+        (u'short', width(font, u'short'))]
+
+
+@pytest.mark.parametrize('maxlines', [0, -1])
+def test_no_lines(font, maxlines):
+    assert layout.wrap_lines(font, u'abc def', 20, maxlines=maxlines) == []
+
+
+def test_ellipsis_wider_than_line(font):
+    lines = layout.wrap_lines(font, u'abc def ghi jkl', 8, maxlines=1)
+    assert len(lines) == 1
+    line, linewidth = lines[0]
+    assert layout.ELLIPSIS.startswith(line)
+    assert linewidth == width(font, line) <= 8
+    assert layout.wrap_lines(font, u'abc def', 0, maxlines=1) == [(u'', 0)]
+
+
+def test_layouts_are_cached(font):
+    lines = layout.wrap_lines(font, TEXT, 100, maxlines=3)
+    hits = layout._cache.hits
+    assert layout.wrap_lines(font, TEXT, 100, maxlines=3) is lines
+    assert layout._cache.hits == hits + 1
+
+
+@pytest.mark.parametrize('align', [layout.LEFT, layout.CENTER,
+                                   layout.RIGHT])
+def test_draw(font, align):
+    surface = graphics.Surface(128, 64)
+    assert layout.draw(surface, font, TEXT, 10, 5, 100, maxlines=3,
+                       align=align, lineheight=12) == 3
+    expected = graphics.Surface(128, 64)
+    for i, (line, linewidth) in enumerate(
+            layout.wrap_lines(font, TEXT, 100, 3)):
+        x = {layout.LEFT: 10, layout.CENTER: 10 + (100 - linewidth) / 2,
+             layout.RIGHT: 110 - linewidth}[align]
+        expected.text(font, x, 5 + 12 * i, line)
+    assert surface.pixels == expected.pixels
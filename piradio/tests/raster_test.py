@@ -0,0 +1,76 @@
+import piradio.raster as raster
+
+
+def span_pixels(spans):
+    return set((x + i, y) for x, y, length in spans for i in xrange(length))
+
+
+def bresenham_reference(x0, y0, x1, y1):
+    points = []
+    dx, dy = abs(x1 - x0), -abs(y1 - y0)
+    sx = 1 if x0 < x1 else -1
+    sy = 1 if y0 < y1 else -1
+    err = dx + dy
+    while True:
+        points.append((x0, y0))
+        if (x0, y0) == (x1, y1):
+            return set(points)
+        e2 = 2 * err
+        if e2 >= dy:
+            err += dy
+            x0 += sx
+        if e2 <= dx:
+            err += dx
+            y0 += sy
+
+
+def test_line_spans():
+    assert raster.line_spans(3, 4, 3, 4) == [(3, 4, 1)]
+    assert raster.line_spans(10, 2, 0, 2) == [(0, 2, 11)]
+    assert raster.line_spans(5, 0, 5, 2) == [(5, 0, 1), (5, 1, 1),
+                                             (5, 2, 1)]
+    for line in [(0, 0, 20, 3), (20, 3, 0, 0), (0, 10, 3, -20),
+                 (-5, 7, 30, 30), (7, 7, -7, -7)]:
+        spans = raster.line_spans(*line)
+        assert span_pixels(spans) == bresenham_reference(*line)
+        assert sum(length for _, _, length in spans) == len(
+            span_pixels(spans))
+
+
+def test_merge_spans():
+    assert raster.merge_spans([(5, 1, 2), (0, 1, 3), (3, 1, 2),
+                               (0, 0, 1), (9, 1, 1)]) == [
+        (0, 0, 1), (0, 1, 7), (9, 1, 1)]
+    assert raster.point_spans([(2, 0), (1, 0), (1, 0)]) == [(1, 0, 2)]
+
+
+def test_ellipse_spans():
+    assert raster.fill_ellipse_spans(5, 5, 0, 0) == [(5, 5, 1)]
+    assert raster.stroke_ellipse_spans(5, 5, 0, 0) == [(5, 5, 1)]
+    assert raster.fill_ellipse_spans(5, 5, 3, 0) == [(2, 5, 7)]
+    assert raster.fill_ellipse_spans(5, 5, 2, 2) == [
+        (5, 3, 1), (3, 4, 5), (3, 5, 5), (3, 6, 5), (5, 7, 1)]
+    for rx, ry in [(1, 1), (10, 10), (30, 4), (3, 25)]:
+        fill = span_pixels(raster.fill_ellipse_spans(0, 0, rx, ry))
+        outline = span_pixels(raster.stroke_ellipse_spans(0, 0, rx, ry))
+        assert outline <= fill
+        assert set((-x, -y) for x, y in fill) == fill
+        # The outline is closed: every pixel of the fill that touches a
+        # pixel outside of it is part of the outline.
+        for x, y in fill:
+            neighbours = [(x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)]
+            if any(n not in fill for n in neighbours):
+                assert (x, y) in outline
+
+
+def test_polygon_spans():
+    square = [(0, 0), (3, 0), (3, 3), (0, 3)]
+    assert raster.fill_polygon_spans(square) == [(0, y, 4) for y in
+                                                 xrange(4)]
+    assert raster.stroke_polygon_spans(square) == [
+        (0, 0, 4), (0, 1, 1), (3, 1, 1), (0, 2, 1), (3, 2, 1), (0, 3, 4)]
+    triangle = [(0, 0), (20, 10), (0, 20)]
+    fill = span_pixels(raster.fill_polygon_spans(triangle))
+    assert span_pixels(raster.stroke_polygon_spans(triangle)) <= fill
+    assert (5, 10) in fill and (15, 3) not in fill
+    assert raster.fill_polygon_spans([]) == []
@@ -0,0 +1,66 @@
+import random
+import pytest
+import piradio.graphics as graphics
+from piradio.graphics import Surface, PackedSurface
+from piradio.tilemap import TileSet, TileMap
+
+
+def random_tiles(rnd, columns, rows, variants):
+    tiles = [[rnd.randint(0, 1) for _ in xrange(64)]
+             for _ in xrange(variants - 1)] + [[0] * 64]
+    image = Surface(columns * 8, rows * 8)
+    for row in xrange(rows):
+        for column in xrange(columns):
+            image.bitblt(Surface(8, 8, pixels=rnd.choice(tiles)),
+                         column * 8, row * 8)
+    return image
+
+
+def wrapped_reference(image, x, y, width, height):
+    expected = Surface(width, height)
+    for sy in xrange(height):
+        for sx in xrange(width):
+            expected.setpixel(sx, sy, image.getpixel(
+                (x + sx) % image.width, (y + sy) % image.height))
+    return expected
+
+
+def test_tiles_are_deduplicated():
+    image = random_tiles(random.Random(1), 40, 3, variants=4)
+    tilemap = TileMap.from_image(image)
+    assert len(tilemap.tileset) <= 4
+    assert len(tilemap.indices) == 120
+    assert (tilemap.width, tilemap.height) == (320, 24)
+    assert tilemap.tileset.empty[tilemap.tileset.add(Surface(8, 8))]
+    with pytest.raises(ValueError):
+        TileMap.from_image(Surface(12, 8))
+
+
+@pytest.mark.parametrize('cls', [Surface, PackedSurface])
+def test_draw_wraps(cls):
+    image = random_tiles(random.Random(2), 20, 5, variants=10)
+    tilemap = TileMap.from_image(image)
+    for x, y in [(0, 0), (3, 1), (150, 35), (-7, -3), (1000, 0)]:
+        surface = cls(128, 64)
+        tilemap.draw(surface, x, y)
+        expected = wrapped_reference(image, x, y, 128, 64)
+        assert list(surface.pixels) == list(expected.pixels)
+
+
+def test_draw_transparent_layer():
+    image = random_tiles(random.Random(3), 32, 8, variants=3)
+    tilemap = TileMap.from_image(image)
+    surface = Surface(128, 64, pixels=[1, 0] * (64 * 64))
+    expected = surface.copy()
+    expected.bitblt(wrapped_reference(image, 77, 0, 128, 64), 0, 0,
+                    op=graphics.rop_or)
+    tilemap.draw(surface, 77, op=graphics.rop_or)
+    assert list(surface.pixels) == list(expected.pixels)
+
+
+def test_tile_cache_is_bounded():
+    image = random_tiles(random.Random(4), 64, 8, variants=100)
+    tileset = TileSet(cachesize=10)
+    tilemap = TileMap.from_image(image, tileset)
+    tilemap.draw(Surface(128, 64), 0)
+    assert len(tileset._cache) == 10
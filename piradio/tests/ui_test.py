@@ -0,0 +1,79 @@
+import pytest
+import piradio.fonts as fonts
+import piradio.graphics as graphics
+import piradio.ui as ui
+
+TEXT = 'Radio 2day - Die 80er und 90er'
+
+
+@pytest.fixture
+def font():
+    return fonts.Font('assets/pf_tempesta_seven.ttf', 8)
+
+
+def test_marquee_short_text(font):
+    marquee = ui.Marquee(font, 128, 'FM4')
+    assert not marquee.scrolls
+    for now in xrange(10):
+        assert not marquee.update(marquee.started + now)
+    surface = graphics.Surface(128, 64)
+    marquee.draw(surface, 5, 7)
+    expected = graphics.Surface(128, 64)
+    expected.text(font, 5, 7, 'FM4')
+    assert surface.pixels == expected.pixels
+
+
+def test_marquee_scrolls(font):
+    marquee = ui.Marquee(font, 60, TEXT, speed=30, pause=1)
+    assert marquee.scrolls
+    start = marquee.started
+    # The text rests at its start first.
+    assert not marquee.update(start + 0.5)
+    assert marquee.offset == 0
+    assert marquee.update(start + 2)
+    assert marquee.offset == 30
+    # Nothing to repaint if the text hasn't moved.
+    assert not marquee.update(start + 2.01)
+    # After a whole lap, the text rests at its start again.
+    lap = 1 + float(marquee.period) / 30
+    marquee.update(start + lap + 0.5)
+    assert marquee.offset == 0
+
+
+def test_marquee_invisible(font):
+    marquee = ui.Marquee(font, 60, TEXT)
+    marquee.visible = False
+    assert not marquee.update(marquee.started + 5)
+    assert marquee.offset == 0
+
+
+def test_marquee_set_text(font):
+    marquee = ui.Marquee(font, 60, TEXT)
+    marquee.update(marquee.started + 5)
+    strip = marquee.strip
+    marquee.set_text(TEXT)
+    assert marquee.strip is strip
+    assert marquee.offset != 0
+    marquee.set_text('FM4')
+    assert not marquee.scrolls
+    assert marquee.offset == 0
+
+
+@pytest.mark.parametrize('cls', [graphics.Surface, graphics.PackedSurface])
+@pytest.mark.parametrize('x', [20, -7])
+def test_marquee_draw(font, cls, x):
+    marquee = ui.Marquee(font, 60, TEXT, gap=10)
+    width = font.text_dimensions(TEXT)[0]
+    rendered = font.render(TEXT)
+    for offset in [0, 13, width - 30, width + 5, marquee.period - 1]:
+        marquee.offset = offset
+        surface = cls(128, 64)
+        surface.fill(1)
+        marquee.draw(surface, x, 30)
+        expected = graphics.Surface(60, rendered.height)
+        expected.bitblt(rendered, -offset, 0)
+        expected.bitblt(rendered, width + 10 - offset, 0)
+        screen = graphics.Surface(128, 64)
+        screen.fill(1)
+        screen.bitblt(expected, x, 30)
+        assert surface.pixels == screen.pixels
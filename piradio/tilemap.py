@@ -0,0 +1,134 @@
+"""Tile maps for wide scrolling backgrounds.
+
+A TileMap is made of a grid of indices into a TileSet. The tile set
+keeps each distinct tile only once, packed to one bit per pixel, and
+unpacks tiles into rows of pixels when they are drawn. A small cache
+holds the most recently drawn tiles. Drawing a map only looks at the
+tiles in view and wraps around its edges, so a map can be scrolled
+forever.
+"""
+import collections
+import piradio.graphics as graphics
+
+# Raster operations that leave the destination unchanged where the source
+# pixels are 0. Empty tiles can be skipped when drawing with them.
+_TRANSPARENT_ROPS = (graphics.rop_or, graphics.rop_xor, graphics.rop_nop)
+
+
+class TileSet(object):
+    def __init__(self, tilewidth=8, tileheight=8, cachesize=256):
+        self.tilewidth = tilewidth
+        self.tileheight = tileheight
+        self.cachesize = cachesize
+        # The pages of a PackedSurface for every tile.
+        self.tiles = []
+        self.empty = []
+        self._indices = {}
+        self._cache = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self.tiles)
+
+    def add(self, surface):
+        """Add the tile `surface` unless the set already contains the same
+        tile, and return its index.
+        """
+        pages = bytes(graphics.PackedSurface(self.tilewidth,
+                                             self.tileheight,
+                                             pixels=surface.pixels).pages)
+        index = self._indices.get(pages)
+        if index is None:
+            index = len(self.tiles)
+            self._indices[pages] = index
+            self.tiles.append(pages)
+            self.empty.append(not pages.strip(b'\x00'))
+        return index
+
+    def rows(self, index):
+        """Return the rows of the tile `index` as spans of unpacked
+        pixels.
+        """
+        try:
+            rows = self._cache.pop(index)
+        except KeyError:
+            tile = graphics.PackedSurface(self.tilewidth, self.tileheight,
+                                          pages=self.tiles[index])
+            rows = [bytes(tile._span(0, y, self.tilewidth))
+                    for y in xrange(self.tileheight)]
+            if len(self._cache) >= self.cachesize:
+                self._cache.popitem(last=False)
+        self._cache[index] = rows
+        return rows
+
+
+class TileMap(object):
+    def __init__(self, tileset, columns, rows, indices):
+        """Create a map of `columns` x `rows` tiles from `tileset`.
+        `indices` lists the tile indices row by row.
+        """
+        self.tileset = tileset
+        self.columns = columns
+        self.rows = rows
+        self.indices = indices
+
+    @staticmethod
+    def from_image(image, tileset=None):
+        """Cut the surface `image` into tiles and return a map of them.
+        The tiles are added to `tileset`, or to a new TileSet of 8x8
+        tiles. The image size must be a multiple of the tile size.
+        """
+        if tileset is None:
+            tileset = TileSet()
+        tilewidth, tileheight = tileset.tilewidth, tileset.tileheight
+        if image.width % tilewidth or image.height % tileheight:
+            raise ValueError('%s is not made of %ix%i tiles' %
+                             (image, tilewidth, tileheight))
+        columns = image.width // tilewidth
+        rows = image.height // tileheight
+        indices = []
+        for row in xrange(rows):
+            for column in xrange(columns):
+                indices.append(tileset.add(image.subsurface(
+                    column * tilewidth, row * tileheight,
+                    tilewidth, tileheight)))
+        return TileMap(tileset, columns, rows, indices)
+
+    @property
+    def width(self):
+        return self.columns * self.tileset.tilewidth
+
+    @property
+    def height(self):
+        return self.rows * self.tileset.tileheight
+
+    def draw(self, surface, x=0, y=0, op=graphics.rop_copy):
+        """Fill `surface` with the part of the map whose top-left corner
+        is at (x, y). The map repeats in both directions.
+        """
+        tileset = self.tileset
+        tilewidth, tileheight = tileset.tilewidth, tileset.tileheight
+        x %= self.width
+        y %= self.height
+        firstcolumn, offset = divmod(x, tilewidth)
+        numcolumns = (offset + surface.width + tilewidth - 1) // tilewidth
+        skip_empty = op in _TRANSPARENT_ROPS
+
+        tiles = None
+        tilerow = None
+        for sy in xrange(surface.height):
+            row, tiley = divmod((y + sy) % self.height, tileheight)
+            if row != tilerow:
+                tilerow = row
+                start = row * self.columns
+                indices = [self.indices[start + (firstcolumn + i) %
+                                        self.columns]
+                           for i in xrange(numcolumns)]
+                if skip_empty and all(tileset.empty[i] for i in indices):
+                    tiles = None
+                else:
+                    tiles = [tileset.rows(i) for i in indices]
+            if tiles is None:
+                continue
+            line = b''.join(tile[tiley] for tile in tiles)
+            surface._blitspan(0, sy, line[offset:offset + surface.width], op)
+        surface._touch(0, 0, surface.width, surface.height)
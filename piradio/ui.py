@@ -1,3 +1,4 @@
+import time
 import piradio.graphics as graphics
 import piradio.commons as commons
 
@@ -13,15 +14,17 @@ def render_list(surface, x, y, font, items,
     end = start + maxvisible
     selected_index -= start
 
+    # Draw the rows into a view that covers just the list.
+    view = surface.subsurface(0, y, surface.width, maxheight * maxvisible)
+    y = 0
     for i, text in enumerate(items[start:end]):
         if i == selected_index:
-            surface.fillrect(0, y, surface.width, maxheight)
+            view.fillrect(0, y, view.width, maxheight)
 
         textwidth, textheight, baseline = font.text_extents(text)
-        textbitmap = font.render(text, width=textwidth, height=textheight,
-                                 baseline=baseline)
+        textbitmap = font.render_cached(text)
         top_offset = (maxheight - textheight + baseline) / 2
-        surface.bitblt(textbitmap, x, y + top_offset, op=graphics.rop_xor)
+        view.bitblt(textbitmap, x, y + top_offset, op=graphics.rop_xor)
 
         y += maxheight
 
@@ -32,17 +35,96 @@ def render_static_list(surface, x, y, font, items, minheight=-1, maxvisible=4):
     maxheight = max(minheight, maxheight)
     start = max(0, min(maxvisible + 1, len(items) - maxvisible))
     end = start + maxvisible
+    view = surface.subsurface(0, y, surface.width, maxheight * maxvisible)
+    y = 0
     for text in items[start:end]:
         textwidth, textheight, baseline = font.text_extents(text)
-        textbitmap = font.render(text, width=textwidth, height=textheight,
-                                 baseline=baseline)
+        textbitmap = font.render_cached(text)
         top_offset = (maxheight - textheight) / 2
-        surface.bitblt(textbitmap, x, y + top_offset, op=graphics.rop_xor)
+        view.bitblt(textbitmap, x, y + top_offset, op=graphics.rop_xor)
         y += maxheight
 
 
 def render_progressbar(surface, x, y, w, h, progress):
     """Draw a progress bar widget into the given surface."""
-    surface.strokerect(x, y, w, h)
+    view = surface.subsurface(x, y, w, h)
+    view.strokerect(0, 0, w, h)
     bar_width = int((w - 4) * commons.clamp(progress, 0, 1))
-    surface.fillrect(x + 2, y + 2, bar_width, h - 4)
+    view.fillrect(2, 2, bar_width, h - 4)
+
+
+class Marquee(object):
+    """A line of text that scrolls from right to left if it is wider than
+    the space it is drawn into.
+
+    The text is rendered only once, into a strip that holds it twice,
+    `gap` pixels apart. Every frame is then a single blit of the strip,
+    offset by how far it has scrolled and clipped to `width` pixels, so
+    the text wraps around without gaps. Each time the text has come
+    around, it rests for `pause` seconds.
+    """
+    def __init__(self, font, width, text=u'', speed=30, gap=24, pause=1.5):
+        """Create a marquee `width` pixels wide that scrolls `speed`
+        pixels per second.
+        """
+        self.font = font
+        self.width = width
+        self.speed = speed
+        self.gap = gap
+        self.pause = pause
+        # Invisible marquees don't scroll and never ask to be repainted.
+        self.visible = True
+        self.text = None
+        self.set_text(text)
+
+    @property
+    def scrolls(self):
+        return self.period > 0
+
+    def set_text(self, text):
+        """Show `text`. The strip is only rendered again if the text
+        differs from the current one.
+        """
+        if text == self.text:
+            return
+        self.text = text
+        textwidth, self.height, _ = self.font.text_dimensions(text)
+        if textwidth <= self.width:
+            self.period = 0
+            self.strip = self.font.render_cached(text)
+        else:
+            self.period = textwidth + self.gap
+            rendered = self.font.render(text)
+            self.strip = graphics.Surface(self.period + self.width,
+                                          self.height)
+            self.strip.bitblt(rendered, 0, 0)
+            self.strip.bitblt(rendered, self.period, 0)
+        self.restart()
+
+    def restart(self, now=None):
+        """Scroll back to the start of the text."""
+        self.started = time.time() if now is None else now
+        self.offset = 0
+
+    def update(self, now=None):
+        """Advance the text to where it should be at time `now`. Return
+        True if it moved and the marquee has to be repainted.
+        """
+        if not self.visible or not self.scrolls:
+            return False
+        if now is None:
+            now = time.time()
+        lap = self.pause + float(self.period) / self.speed
+        elapsed = (now - self.started) % lap - self.pause
+        offset = int(max(elapsed, 0) * self.speed) % self.period
+        if offset == self.offset:
+            return False
+        self.offset = offset
+        return True
+
+    def draw(self, surface, x, y, op=graphics.rop_copy):
+        """Draw the visible part of the text with its top-left corner at
+        (x, y) into `surface`.
+        """
+        view = surface.subsurface(x, y, self.width, self.height)
+        view.bitblt(self.strip, -self.offset, 0, op)